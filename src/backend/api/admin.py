@@ -58,10 +58,17 @@ class NutritionStatsInline(
     )
 
 
+class IngredientAliasInline(
+    admin.TabularInline[models.IngredientAlias, models.IngredientAlias]
+):
+    model = models.IngredientAlias
+    extra = 0
+
+
 @register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin[models.Ingredient]):
     list_display = ("name", "nutrition_stats_inline")
-    inlines = [NutritionStatsInline]  # type: ignore
+    inlines = [NutritionStatsInline, IngredientAliasInline]  # type: ignore
 
     @admin.display(description="Nutrition Stats")
     def nutrition_stats_inline(self, obj: models.Ingredient) -> str:
@@ -0,0 +1,133 @@
+"""
+Recipe and meal plan totals computed in SQL, mirroring calculateRecipeNutrition /
+calculateRecipeCost in frontend/src/utils/calculations.ts and buildShoppingList in
+frontend/src/utils/shoppingList.ts, so clients don't have to download every
+recipe, ingredient and price to add them up.
+"""
+
+from typing import Any, Iterable
+
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from . import models
+
+# the per-unit NutritionStats columns that are summed, in model order
+NUTRITION_FIELDS = [
+    field.name
+    for field in models.NutritionStats._meta.fields
+    if field.name not in ("id", "ingredient", "base_unit")
+]
+
+# query parameter values accepted by `?with=`
+TOTALS = ("nutrition", "cost")
+
+
+def unit_cost(prefix: str = "") -> Coalesce:
+    """Cost per base unit of `{prefix}ingredient`: the scraped price, else the estimate."""
+    return Coalesce(
+        F(f"{prefix}ingredient__scraper__cached_price"),
+        F(f"{prefix}ingredient__estimated_cost"),
+        output_field=FloatField(),
+    )
+
+
+def unknown_cost(prefix: str = "") -> Q:
+    return Q(
+        **{
+            f"{prefix}ingredient__scraper__cached_price__isnull": True,
+            f"{prefix}ingredient__estimated_cost__isnull": True,
+        }
+    )
+
+
+def _total(expression: Any) -> Coalesce:
+    return Coalesce(Sum(expression), Value(0.0), output_field=FloatField())
+
+
+def recipe_totals(recipe_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    """
+    Nutrition and cost totals (and per-serving values) for each recipe, in one
+    grouped query. Missing nutrition values count as 0, like the frontend does.
+    """
+    prefix = "ingredients_list__"
+    rows = (
+        models.Recipe.objects.filter(pk__in=list(recipe_ids))
+        .values("id", "servings")
+        .annotate(
+            **{
+                name: _total(
+                    F(f"{prefix}quantity")
+                    * F(f"{prefix}ingredient__nutrition_stats__{name}")
+                )
+                for name in NUTRITION_FIELDS
+            },
+            cost_total=_total(F(f"{prefix}quantity") * unit_cost(prefix)),
+            unknown_costs=Count(f"{prefix}id", filter=unknown_cost(prefix)),
+        )
+        .order_by()
+    )
+    return {row["id"]: _format(row) for row in rows}
+
+
+def _format(row: dict[str, Any]) -> dict[str, Any]:
+    servings = row["servings"]
+    nutrition_total = {name: row[name] for name in NUTRITION_FIELDS}
+    return {
+        "recipe": row["id"],
+        "servings": servings,
+        "nutrition": {
+            "total": nutrition_total,
+            "per_serving": {
+                name: value / (servings or 1) for name, value in nutrition_total.items()
+            },
+        },
+        "cost": {
+            "total": row["cost_total"],
+            "per_serving": row["cost_total"] / servings if servings > 0 else 0.0,
+            "partially_unknown": row["unknown_costs"] > 0,
+        },
+    }
+
+
+def shopping_list() -> list[dict[str, Any]]:
+    """
+    What to buy for the whole meal plan, in one grouped query: every planned recipe's
+    ingredients scaled by entry servings / recipe servings, merged per ingredient,
+    minus the quantity on hand. Only ingredients with something left to buy are returned.
+    """
+    ingredient = "recipe__ingredients_list__ingredient"
+    scale = F("servings") * 1.0 / Coalesce(NullIf(F("recipe__servings"), 0), 1)
+    rows = (
+        models.MealPlanEntry.objects.filter(recipe__ingredients_list__isnull=False)
+        .values(
+            ingredient=F(ingredient),
+            name=F(f"{ingredient}__name"),
+            unit=F(f"{ingredient}__nutrition_stats__base_unit"),
+            on_hand=Coalesce(F(f"{ingredient}__on_hand__quantity"), Value(0.0)),
+            price_per_unit=F(f"{ingredient}__scraper__cached_price"),
+            source=F(f"{ingredient}__scraper__cached_source"),
+            source_url=F(f"{ingredient}__scraper__cached_source__url"),
+        )
+        .annotate(
+            needed=Sum(
+                F("recipe__ingredients_list__quantity") * scale,
+                output_field=FloatField(),
+            ),
+        )
+        .annotate(quantity=F("needed") - F("on_hand"))
+        .filter(quantity__gt=0)
+        .order_by("name", "ingredient")
+    )
+    return [
+        {
+            **row,
+            "unit": row["unit"] or models.IngredientUnit.KILOGRAM,
+            "cost": (
+                row["quantity"] * row["price_per_unit"]
+                if row["price_per_unit"] is not None
+                else None
+            ),
+        }
+        for row in rows
+    ]
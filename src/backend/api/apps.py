@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self) -> None:
+        import api.signals  # type: ignore #noqa: F401 # import for signal handlers, not directly used
+        from api import instrumentation
+
+        instrumentation.install()
@@ -0,0 +1,576 @@
+"""
+Reproducible backend benchmarks, run by `manage.py run_benchmarks`.
+
+`seed` fills an empty database with deterministic synthetic data at a given
+scale, then `run` measures latency, query count and payload size of every
+endpoint registered in api/urls.py (plus the interesting query-string and action
+variants), the recipe_loader stages against the recorded pages in
+scraper/fixtures/recipe_pages, ingredient-line parsing over a large synthetic
+corpus, and JSON-LD extraction (time and peak memory,
+against a full BeautifulSoup parse) on those and the product pages. Results are
+plain JSON so runs from different commits can be diffed.
+"""
+
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ingredient_store.models import OnHandIngredient
+from scraper import models as scraper_models
+from scraper import json_ld, nlp
+from scraper.recipe_loader import IngredientMatcher, StageOne, StageThree, StageTwo
+
+from . import http_cache, models, rollups, search
+
+FIXTURES_DIR = Path(__file__).resolve().parents[1] / "scraper" / "fixtures"
+RECIPE_PAGES_DIR = FIXTURES_DIR / "recipe_pages"
+PRODUCT_PAGES_DIR = FIXTURES_DIR / "product_pages"
+# markup repeated into the recorded pages to bring them up to Scale.page_kb
+FILLER = (
+    b'<div class="product-tile"><a href="/p/item"><img src="/img/item.jpg" alt="Item" '
+    b'loading="lazy"></a><h3 class="name">Item</h3><span class="price">$4.99</span>'
+    b'<button class="add-to-cart" data-sku="1000">Add</button></div>\n'
+)
+
+QUALIFIERS = [
+    "fresh",
+    "dried",
+    "smoked",
+    "red",
+    "green",
+    "organic",
+    "roasted",
+    "raw",
+    "frozen",
+    "whole",
+]
+FOODS = [
+    "onion",
+    "garlic",
+    "rice",
+    "lentils",
+    "tomato",
+    "chicken",
+    "spinach",
+    "carrot",
+    "oats",
+    "butter",
+    "yogurt",
+    "basil",
+    "beans",
+    "potato",
+    "salmon",
+    "tofu",
+    "pepper",
+    "flour",
+    "milk",
+    "apple",
+]
+FORMS = ["", "chopped", "ground", "sliced", "canned", "paste", "powder", "fillet"]
+
+
+@dataclass
+class Scale:
+    ingredients: int = 2000
+    recipes: int = 500
+    ingredients_per_recipe: int = 8
+    sources_per_ingredient: int = 2
+    plan_entries: int = 28
+    confirmable_recipes: int = 50
+    # size the recorded pages are padded to for the JSON-LD benchmark, 0 keeps them as recorded
+    page_kb: int = 1000
+    # ingredient lines parsed by the line parser benchmark
+    ingredient_lines: int = 100000
+
+
+def _ingredient_name(rng: random.Random, i: int) -> str:
+    words = [rng.choice(QUALIFIERS), rng.choice(FOODS), rng.choice(FORMS)]
+    return " ".join(word for word in words if word) + f" {i}"
+
+
+def seed(scale: Scale, seed: int = 0) -> dict[str, int]:
+    """
+    Insert synthetic data (bulk, no signals) and refresh what signals would have
+    maintained. Sources carry cached prices, so nothing is scraped.
+    """
+    rng = random.Random(seed)
+    ingredients = models.Ingredient.objects.bulk_create(
+        models.Ingredient(
+            name=_ingredient_name(rng, i),
+            estimated_cost=round(rng.uniform(0.5, 20), 2) if i % 3 else None,
+        )
+        for i in range(scale.ingredients)
+    )
+    models.NutritionStats.objects.bulk_create(
+        models.NutritionStats(
+            ingredient=ingredient,
+            kcal_per_unit=rng.uniform(100, 9000),
+            protein_grams_per_unit=rng.uniform(0, 300),
+            fat_saturated_grams_per_unit=rng.uniform(0, 100),
+            carbohydrate_sugar_grams_per_unit=rng.uniform(0, 500),
+            sodium_milligrams_per_unit=rng.uniform(0, 5000),
+        )
+        for ingredient in ingredients
+    )
+    OnHandIngredient.objects.bulk_create(
+        OnHandIngredient(ingredient=ingredient, quantity=rng.uniform(0, 2))
+        for ingredient in ingredients[::4]
+    )
+    scrapers = scraper_models.Scraper.objects.bulk_create(
+        scraper_models.Scraper(ingredient=ingredient) for ingredient in ingredients
+    )
+    sources = scraper_models.Source.objects.bulk_create(
+        scraper_models.Source(
+            scraper=scraper,
+            url=f"https://shop{n}.example.test/p/{scraper.ingredient_id}",  # type: ignore[attr-defined]
+            quantity=1,
+            cached_price=round(rng.uniform(0.5, 30), 2),
+        )
+        for scraper in scrapers
+        for n in range(scale.sources_per_ingredient)
+    )
+    cheapest: dict[int, scraper_models.Source] = {}
+    for source in sources:
+        current = cheapest.get(source.scraper_id)  # type: ignore[attr-defined]
+        if current is None or source.cached_price < current.cached_price:  # type: ignore[operator]
+            cheapest[source.scraper_id] = source  # type: ignore[attr-defined]
+    for scraper in scrapers:
+        if scraper.pk in cheapest:
+            scraper.cached_source = cheapest[scraper.pk]
+            scraper.cached_price = cheapest[scraper.pk].cached_price
+    scraper_models.Scraper.objects.bulk_update(
+        scrapers, ["cached_source", "cached_price"]
+    )
+
+    tags = models.RecipeTag.objects.bulk_create(
+        models.RecipeTag(name=name)
+        for name in ["quick", "vegetarian", "high protein", "budget", "meal prep"]
+    )
+    recipes = models.Recipe.objects.bulk_create(
+        models.Recipe(
+            name=f"{rng.choice(QUALIFIERS)} {rng.choice(FOODS)} bowl {i}",
+            servings=rng.randint(1, 6),
+            prep_time_minutes=rng.randint(5, 30),
+            cook_time_minutes=rng.randint(0, 90),
+        )
+        for i in range(scale.recipes)
+    )
+    per_recipe = min(scale.ingredients_per_recipe, len(ingredients))
+    models.RecipeIngredient.objects.bulk_create(
+        models.RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredient,
+            quantity=round(rng.uniform(0.01, 0.5), 3),
+        )
+        for recipe in recipes
+        for ingredient in rng.sample(ingredients, per_recipe)
+    )
+    models.RecipeStep.objects.bulk_create(
+        models.RecipeStep(recipe=recipe, step_number=n, description=f"Step {n}")
+        for recipe in recipes
+        for n in range(1, 5)
+    )
+    models.Recipe.tags.through.objects.bulk_create(
+        models.Recipe.tags.through(recipe=recipe, recipetag=tag)
+        for recipe in recipes
+        for tag in rng.sample(tags, 2)
+    )
+    cells = [
+        (day, slot)
+        for day in models.DayOfWeek.values
+        for slot in models.MealSlot.values
+    ]
+    plan_entries = models.MealPlanEntry.objects.bulk_create(
+        models.MealPlanEntry(
+            recipe=rng.choice(recipes),
+            day=cells[i % len(cells)][0],
+            slot=cells[i % len(cells)][1],
+            servings=rng.randint(1, 4),
+        )
+        for i in range(scale.plan_entries if recipes else 0)
+    )
+
+    confirmable = scraper_models.ConfirmableRecipe.objects.bulk_create(
+        scraper_models.ConfirmableRecipe(
+            name=f"imported {rng.choice(FOODS)} {i}",
+            source_url=f"https://recipes.example.test/{i}",
+            servings=4,
+        )
+        for i in range(scale.confirmable_recipes)
+    )
+    scraper_models.ConfirmableRecipeIngredient.objects.bulk_create(
+        scraper_models.ConfirmableRecipeIngredient(
+            confirmable_recipe=recipe,
+            source_text=f"1 cup {ingredient.name}",
+            quantity=0.2,
+            best_guess_ingredient=ingredient,
+            confidence=0.9,
+        )
+        for recipe in confirmable
+        for ingredient in rng.sample(ingredients, per_recipe)
+    )
+    scraper_models.ConfirmableRecipeStep.objects.bulk_create(
+        scraper_models.ConfirmableRecipeStep(
+            confirmable_recipe=recipe, step_number=n, description=f"Step {n}"
+        )
+        for recipe in confirmable
+        for n in range(1, 4)
+    )
+
+    search.rebuild()
+    rollups.rebuild_all()
+    http_cache.bump(
+        http_cache.INGREDIENTS,
+        http_cache.NUTRITION_STATS,
+        http_cache.ON_HAND,
+        http_cache.SCRAPERS,
+    )
+    IngredientMatcher.bump_catalog_version()
+    return {
+        "ingredients": len(ingredients),
+        "sources": len(sources),
+        "recipes": len(recipes),
+        "recipe_ingredients": len(recipes) * per_recipe,
+        "plan_entries": len(plan_entries),
+        "confirmable_recipes": len(confirmable),
+    }
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> tuple[dict[str, Any], Any]:
+    """Run `fn` `repeat` times (after an untimed `setup` each time). Returns stats and the last result."""
+    timings: list[float] = []
+    result: Any = None
+    queries = 0
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            result = fn() if setup is None else fn(argument)  # type: ignore[call-arg]
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(captured.captured_queries)
+    return {
+        "ms": {
+            "min": round(min(timings), 3),
+            "median": round(statistics.median(timings), 3),
+            "max": round(max(timings), 3),
+        },
+        "queries": queries,
+    }, result
+
+
+def endpoint_cases() -> list[tuple[str, str, Optional[dict[str, Any]]]]:
+    """(method, path, body): list and detail of every registered viewset, then the notable variants."""
+    from .urls import router
+
+    cases: list[tuple[str, str, Optional[dict[str, Any]]]] = []
+    for prefix, viewset, _ in router.registry:
+        cases.append(("GET", f"/api/{prefix}/", None))
+        first = viewset.queryset.order_by("pk").values_list("pk", flat=True).first()  # type: ignore[attr-defined]
+        if first is not None:
+            cases.append(("GET", f"/api/{prefix}/{first}/", None))
+
+    recipe = models.Recipe.objects.order_by("pk").values_list("pk", flat=True).first()
+    cases += [
+        ("GET", "/api/recipes/?with=nutrition,cost", None),
+        (
+            "GET",
+            "/api/recipes/?ordering=cost_per_serving&kcal_per_serving_max=800",
+            None,
+        ),
+        ("GET", "/api/recipes/?cursor=&limit=100", None),
+        ("GET", "/api/recipes/?fields=id,name", None),
+        ("GET", "/api/ingredients/?fields=id,name", None),
+        ("GET", "/api/ingredients/?search=smoked onion", None),
+        ("GET", "/api/ingredients/search/?q=smoked onion", None),
+        ("GET", "/api/meal-plan-entries/shopping-list/", None),
+        (
+            "POST",
+            "/api/meal-plan-entries/optimize/",
+            {
+                "targets": {"kcal_per_unit": 2000, "protein_grams_per_unit": 90},
+                "budget": 150,
+                "save": False,
+            },
+        ),
+    ]
+    if recipe is not None:
+        cases.append(("GET", f"/api/recipes/{recipe}/nutrition/", None))
+    return cases
+
+
+def bench_endpoints(repeat: int) -> list[dict[str, Any]]:
+    client = APIClient()
+    results = []
+    for method, path, body in endpoint_cases():
+
+        def request(_: object = None) -> Any:
+            if method == "GET":
+                return client.get(path)
+            return client.post(path, body, format="json")
+
+        # cold: the response cache is emptied before every run
+        stats, response = measure(request, repeat, setup=cache.clear)
+        results.append(
+            {
+                "name": f"{method} {path}",
+                "status": response.status_code,
+                "bytes": len(response.content),
+                **stats,
+            }
+        )
+    return results
+
+
+def _matcher_unavailable() -> Optional[str]:
+    try:
+        missing = nlp.missing_resources()
+    except ImportError:
+        return "nltk is not installed"
+    if missing:
+        return f"missing NLTK data ({', '.join(missing)}), run `manage.py prepare_nlp`"
+    return None
+
+
+def bench_recipe_loader(repeat: int) -> list[dict[str, Any]]:
+    """stage one on every recorded page, then (with NLTK data) matching, saving drafts and confirming."""
+    results: list[dict[str, Any]] = []
+    skipped = _matcher_unavailable()
+    for page in sorted(RECIPE_PAGES_DIR.glob("*.html")):
+        content = page.read_bytes()
+        stats, stage_one = measure(lambda: StageOne.parse_recipe_page(content), repeat)
+        results.append(
+            {"name": f"stage_one {page.name}", "bytes": len(content), **stats}
+        )
+        if stage_one.recipe_data is None:
+            continue
+        fetched = stage_one.recipe_data
+        if skipped:
+            results.append({"name": f"stage_two {page.name}", "skipped": skipped})
+            continue
+
+        # first use builds (or loads) the shared index, measured separately from matching
+        stats, _ = measure(IngredientMatcher.shared, 1)
+        results.append({"name": "matcher index warm-up", **stats})
+        stats, drafts = measure(
+            lambda: StageTwo.load_recipes_stage_two([fetched]), repeat
+        )
+        results.append(
+            {
+                "name": f"stage_two {page.name}",
+                "lines": len(fetched.ingredients),
+                **stats,
+            }
+        )
+        stats, _ = measure(
+            lambda: StageTwo.save_recipe_drafts_as_confirmable_recipes(
+                [(drafts[0], f"https://recipes.example.test/{page.stem}")]
+            ),
+            repeat,
+        )
+        results.append({"name": f"save_draft {page.name}", **stats})
+        stats, _ = measure(
+            StageThree.save_confirmable_recipe_as_actual_recipe,
+            repeat,
+            setup=lambda: StageTwo.save_recipe_drafts_as_confirmable_recipes(
+                [(drafts[0], None)]
+            )[0],
+        )
+        results.append({"name": f"stage_three {page.name}", **stats})
+    return results
+
+
+def bench_matcher(repeat: int) -> list[dict[str, Any]]:
+    """Matching every ingredient line of the recorded pages in one batch against the seeded catalog."""
+    skipped = _matcher_unavailable()
+    if skipped:
+        return [{"name": "match_ingredients", "skipped": skipped}]
+    lines = [
+        line
+        for page in sorted(RECIPE_PAGES_DIR.glob("*.html"))
+        for result in [StageOne.parse_recipe_page(page.read_bytes())]
+        if result.recipe_data is not None
+        for line in result.recipe_data.ingredients
+    ]
+    matcher = IngredientMatcher.shared()
+    results = []
+    for name, batch in [("match_ingredient", lines[:1]), ("match_ingredients", lines)]:
+        stats, _ = measure(lambda: StageTwo.match_ingredients(batch, matcher), repeat)
+        results.append({"name": name, "lines": len(batch), **stats})
+    return results
+
+
+def ingredient_line_corpus(size: int, seed: int = 0) -> list[str]:
+    """`size` ingredient lines in the shapes recipe sites use, deterministic for a seed."""
+    rng = random.Random(seed)
+    amounts = [
+        "1",
+        "2",
+        "0.5",
+        "1/2",
+        "1 1/2",
+        "½",
+        "1½",
+        "2-3",
+        "2 to 3",
+        "250",
+        "1,5",
+    ]
+    units = ["", "g", "kg", "ml", "l", "tsp", "tbsp.", "cups", "lb", "oz", "pieces"]
+    lines = []
+    for _ in range(size):
+        food = " ".join(
+            word
+            for word in (rng.choice(QUALIFIERS), rng.choice(FOODS), rng.choice(FORMS))
+            if word
+        )
+        shape = rng.random()
+        if shape < 0.1:
+            lines.append(
+                f"{rng.choice(['1', '2'])} ({rng.randint(8, 28)} oz) can {food}"
+            )
+        elif shape < 0.2:
+            lines.append(f"{food}, to taste")
+        else:
+            unit = rng.choice(units)
+            lines.append(
+                f"{rng.choice(amounts)} {unit}{' ' if unit else ''}{food}, chopped"
+            )
+    return lines
+
+
+def bench_ingredient_lines(repeat: int, size: int) -> list[dict[str, Any]]:
+    """StageTwo.parse_ingredient_line over `size` synthetic lines."""
+    lines = ingredient_line_corpus(size)
+    stats, _ = measure(
+        lambda: [StageTwo.parse_ingredient_line(line) for line in lines], repeat
+    )
+    per_line_us = stats["ms"]["median"] * 1000 / max(len(lines), 1)
+    return [
+        {
+            "name": "parse_ingredient_line",
+            "lines": len(lines),
+            "us_per_line": round(per_line_us, 3),
+            **stats,
+        }
+    ]
+
+
+def peak_memory_kb(fn: Callable[[], Any]) -> float:
+    """Peak Python heap allocated while running `fn`, in KiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def _pad(content: bytes, size: int) -> bytes:
+    """`content` with filler markup right after <body>, so every script after it sits behind `size` bytes of page."""
+    missing = size - len(content)
+    if missing <= 0:
+        return content
+    at = content.find(b">", content.lower().find(b"<body")) + 1
+    return content[:at] + FILLER * (missing // len(FILLER) + 1) + content[at:]
+
+
+def _soup_blocks(content: bytes) -> list[Any]:
+    # what the scrapers did before json_ld: parse the whole page
+    from bs4 import BeautifulSoup
+
+    decoded = []
+    for script in BeautifulSoup(content, "html.parser").find_all(
+        "script", type="application/ld+json"
+    ):
+        try:
+            decoded.append(json.loads(script.get_text()))
+        except ValueError:
+            continue
+    return decoded
+
+
+def bench_json_ld(repeat: int, page_kb: int) -> list[dict[str, Any]]:
+    """json_ld.blocks against a full BeautifulSoup parse, on every recorded page as recorded and padded to `page_kb`."""
+    pages = sorted(RECIPE_PAGES_DIR.glob("*.html")) + sorted(
+        PRODUCT_PAGES_DIR.glob("*.html")
+    )
+    results: list[dict[str, Any]] = []
+    for page in pages:
+        recorded = page.read_bytes()
+        variants = [("", recorded)]
+        if page_kb * 1024 > len(recorded):
+            variants.append((f" @{page_kb}KB", _pad(recorded, page_kb * 1024)))
+        for suffix, content in variants:
+            for parser, fn in [
+                ("json_ld", json_ld.blocks),
+                ("beautifulsoup", _soup_blocks),
+            ]:
+                stats, found = measure(lambda: fn(content), repeat)
+                results.append(
+                    {
+                        "name": f"{parser} {page.parent.name}/{page.name}{suffix}",
+                        "bytes": len(content),
+                        "blocks": len(found),
+                        "peak_kb": peak_memory_kb(lambda: fn(content)),
+                        **stats,
+                    }
+                )
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale: Scale, repeat: int = 5, seed_value: int = 0) -> dict[str, Any]:
+    """Seed the (empty) current database and run every benchmark."""
+    started = time.perf_counter()
+    seeded = seed(scale, seed_value)
+    seconds_to_seed = time.perf_counter() - started
+    cache.clear()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "scale": asdict(scale),
+            "seed": seed_value,
+            "repeat": repeat,
+            "seconds_to_seed": round(seconds_to_seed, 3),
+        },
+        "seeded": seeded,
+        "endpoints": bench_endpoints(repeat),
+        "recipe_loader": bench_recipe_loader(repeat),
+        "matcher": bench_matcher(repeat),
+        "ingredient_lines": bench_ingredient_lines(repeat, scale.ingredient_lines),
+        "json_ld": bench_json_ld(repeat, scale.page_kb),
+    }
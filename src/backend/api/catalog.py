@@ -0,0 +1,220 @@
+"""
+Streaming loader for the food catalog fixtures (Ingredient and NutritionStats in
+Django's fixture format).
+
+Unlike `loaddata`, the JSON array is decoded one record at a time and rows are
+upserted with batched bulk_create, so memory stays bounded by the batch size
+whatever the size of the file, and re-running a load updates rows in place.
+bulk_create sends no signals, so the derived data they would maintain (search
+index, recipe rollups, cache stamps, the matcher index) is refreshed once at the end.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.color import no_style
+from django.db import connection, models as db_models, transaction
+
+from . import http_cache, models, rollups, search
+
+# rows per INSERT
+BATCH_SIZE = 1000
+# characters read from the file at a time
+READ_SIZE = 1 << 16
+
+# the models a catalog may contain, and the cached resource each one renders into
+CATALOG_MODELS: dict[type[db_models.Model], str] = {
+    models.Ingredient: http_cache.INGREDIENTS,
+    models.NutritionStats: http_cache.NUTRITION_STATS,
+}
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def iter_json_array(stream: TextIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """
+    Yield the elements of the top-level JSON array in `stream` one at a time,
+    holding at most one element plus one read in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = stream.read(read_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+        return not eof
+
+    def skip_whitespace() -> None:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if buffer[position : position + 1] != "[":
+        raise CatalogError("Expected a JSON array of fixture records")
+    position += 1
+    expect_comma = False
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise CatalogError("Unexpected end of file inside the JSON array")
+        if buffer[position] == "]":
+            return
+        if expect_comma:
+            if buffer[position] != ",":
+                raise CatalogError(
+                    f"Expected ',' or ']' near {buffer[position : position + 20]!r}"
+                )
+            position += 1
+            skip_whitespace()
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                # most likely the element continues past what has been read so far
+                if not fill():
+                    raise CatalogError(f"Invalid JSON: {exc}") from exc
+                continue
+            # a number may have been cut at the end of the buffer
+            if end == len(buffer) and fill():
+                continue
+            break
+        position = end
+        expect_comma = True
+        yield element
+
+
+@dataclass
+class LoadSummary:
+    rows: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.rows.values())
+
+
+def _build(record: dict[str, Any]) -> tuple[db_models.Model, tuple[str, ...]]:
+    """A model instance for a fixture record, and the fields the record sets."""
+    try:
+        model = apps.get_model(record["model"])
+    except (KeyError, LookupError, ValueError) as exc:
+        raise CatalogError(f"Unknown model in record {record!r}") from exc
+    if model not in CATALOG_MODELS:
+        raise CatalogError(
+            f"{model._meta.label} rows can't be loaded as part of the food catalog"
+        )
+    values: dict[str, Any] = {}
+    names: list[str] = []
+    for name, value in record.get("fields", {}).items():
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist as exc:
+            raise CatalogError(f"{model._meta.label} has no field {name!r}") from exc
+        values[model_field.attname] = model_field.to_python(value)  # type: ignore[union-attr]
+        names.append(model_field.name)
+    return model(pk=record.get("pk"), **values), tuple(names)
+
+
+def _upsert(
+    model: type[db_models.Model], batch: list[db_models.Model], fields: tuple[str, ...]
+) -> None:
+    # only the fields the records set, so columns the catalog doesn't carry
+    # (estimated_cost...) keep their values on re-runs
+    pk = model._meta.pk
+    assert pk is not None
+    manager = model._default_manager
+    if fields:
+        # columns computed from the written ones on insert (Ingredient.normalized_name)
+        # are only rewritten on conflict if listed too
+        derived = [
+            field.name
+            for field in model._meta.concrete_fields
+            if getattr(field, "derived_from", None) in fields
+        ]
+        manager.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=[pk.name],
+            update_fields=[*fields, *derived],
+        )
+    else:
+        manager.bulk_create(batch, ignore_conflicts=True)
+
+
+def load_records(
+    records: Iterable[dict[str, Any]],
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[Callable[[LoadSummary], None]] = None,
+) -> LoadSummary:
+    """
+    Upsert fixture `records` ({"model", "pk", "fields"}) in batches of consecutive
+    records of the same shape, then refresh what the skipped signals would have.
+    Runs in one transaction.
+    """
+    summary = LoadSummary()
+    with transaction.atomic():
+        shape: Optional[tuple[type[db_models.Model], tuple[str, ...]]] = None
+        batch: list[db_models.Model] = []
+
+        def flush() -> None:
+            if shape is None or not batch:
+                return
+            model, fields = shape
+            _upsert(model, batch, fields)
+            label = model._meta.label_lower
+            summary.rows[label] = summary.rows.get(label, 0) + len(batch)
+            batch.clear()
+            if on_batch is not None:
+                on_batch(summary)
+
+        for record in records:
+            obj, fields = _build(record)
+            if (type(obj), fields) != shape or len(batch) >= batch_size:
+                flush()
+                shape = (type(obj), fields)
+            batch.append(obj)
+        flush()
+
+        loaded = [m for m in CATALOG_MODELS if m._meta.label_lower in summary.rows]
+        if loaded:
+            _after_load(loaded)
+    return summary
+
+
+def _after_load(loaded: list[type[db_models.Model]]) -> None:
+    # explicit primary keys leave Postgres sequences behind
+    sequence_sql = connection.ops.sequence_reset_sql(no_style(), loaded)
+    if sequence_sql:
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+    http_cache.bump(*(CATALOG_MODELS[m] for m in loaded))
+    if models.Ingredient in loaded:
+        from scraper.recipe_loader import IngredientMatcher
+
+        search.rebuild()
+        IngredientMatcher.bump_catalog_version()  # matchers resync on next use
+    rollups.rebuild_all()
+
+
+def load_file(
+    stream: TextIO,
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[Callable[[LoadSummary], None]] = None,
+) -> LoadSummary:
+    return load_records(iter_json_array(stream), batch_size, on_batch)
@@ -0,0 +1,133 @@
+"""
+Conditional GETs and server-side response caching for catalog endpoints.
+
+Every cached resource has a ResourceVersion row whose stamp is replaced by the
+signal handlers in api.signals / scraper.signals whenever a row it is rendered
+from changes (bulk writes that bypass signals call `bump` themselves). A response's
+ETag is derived from the request and the stamps of the resources it renders, so:
+
+- a client sending a matching If-None-Match gets a 304 after one query;
+- otherwise the rendered data is looked up in Django's cache under the ETag,
+  and only serialized from the database on a miss.
+
+Stale entries are never served, since a changed stamp changes the key; the
+cache timeout only bounds how long unused entries take up space. Resources that
+render something computed from the clock (a scraper's `is_stale`) also put the
+current CLOCK_BUCKETS period in their ETag, so those responses are re-rendered
+at least once per period.
+"""
+
+import hashlib
+import time
+import uuid
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from . import models
+
+# resource names, one per model family that cached responses render
+INGREDIENTS = "ingredient"
+NUTRITION_STATS = "nutrition_stats"
+ON_HAND = "on_hand"
+SCRAPERS = (
+    "scraper"  # sources are rendered inside scrapers and saving one saves its scraper
+)
+
+# seconds a rendering of these resources stays valid without a bump, because
+# they show values that change with time alone (`is_stale` after PRICE_TTL)
+CLOCK_BUCKETS = {SCRAPERS: 60}
+
+# stamp of a resource that was never bumped
+INITIAL_VERSION = "0"
+CACHE_KEY_PREFIX = "api-response:"
+
+
+def bump(*resources: str) -> None:
+    """
+    Give `resources` new version stamps, invalidating every ETag and cached response
+    that depends on them. Runs in the caller's transaction, so a rollback restores
+    the old stamps along with the old data.
+    """
+    if not resources:
+        return
+    version = uuid.uuid4().hex
+    models.ResourceVersion.objects.bulk_create(
+        [models.ResourceVersion(name=name, version=version) for name in set(resources)],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["version", "updated_at"],
+    )
+
+
+def current_versions(resources: Iterable[str]) -> dict[str, str]:
+    names = sorted(set(resources))
+    versions = dict(
+        models.ResourceVersion.objects.filter(name__in=names).values_list(
+            "name", "version"
+        )
+    )
+    return {name: versions.get(name, INITIAL_VERSION) for name in names}
+
+
+def etag_for(request: Request, resources: Iterable[str]) -> str:
+    """Strong ETag for `request`: its path, query and rendered media type plus the resource stamps (and clock periods)."""
+    renderer = getattr(request, "accepted_media_type", "")
+    parts = [request.get_full_path(), renderer]
+    versions = current_versions(resources)
+    parts.extend(f"{name}={version}" for name, version in versions.items())
+    now = time.time()
+    parts.extend(
+        f"{name}@{int(now // CLOCK_BUCKETS[name])}"
+        for name in versions
+        if name in CLOCK_BUCKETS
+    )
+    return '"{}"'.format(hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32])
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering list/retrieve with ETags, 304s and cached data.
+    `cache_resources` names every resource the serializer renders.
+    """
+
+    cache_resources: tuple[str, ...] = ()
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.conditional_response(super().list, request, *args, **kwargs)  # type: ignore[misc]
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)  # type: ignore[misc]
+
+    def conditional_response(
+        self,
+        handler: Callable[..., Response],
+        request: Request,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Response:
+        etag = etag_for(request, self.cache_resources)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        # weak comparison, proxies that compress responses weaken the ETag
+        if_none_match = {
+            tag.removeprefix("W/")
+            for tag in parse_etags(request.headers.get("If-None-Match", ""))
+        }
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = CACHE_KEY_PREFIX + etag
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers=headers)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+            for header, value in headers.items():
+                response[header] = value
+        return response
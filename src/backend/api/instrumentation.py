@@ -0,0 +1,234 @@
+"""
+Per-request timing: how long a request spent in SQL, in serializers and in
+outbound HTTP (scraping), reported as a Server-Timing header and a structured
+log line by `ServerTimingMiddleware`. Serializers are timed per view through
+`TimedSerializerMixin` (DRF has no hook around serializer output, and replacing
+its `.data` property process-wide would reach every serializer in the process).
+
+With API_DEBUG_STATS on, timings are also kept per view (the last STATS_SAMPLES
+requests of each) and served as percentiles by `/api/_debug/stats/`. Requests that didn't resolve to a view
+share one UNRESOLVED bucket, so scanners probing random paths can't grow the
+stats without bound.
+"""
+
+import json
+import logging
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S", bound=serializers.BaseSerializer[Any])
+
+# requests kept per view for the debug percentiles
+STATS_SAMPLES = 1000
+STATS_URL_NAME = "debug-stats"
+UNRESOLVED = "<unresolved>"
+# the timed phases, in Server-Timing order
+PHASES = ("db", "serialize", "http")
+
+
+@dataclass
+class RequestTimings:
+    ms: dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+    counts: dict[str, int] = field(default_factory=lambda: dict.fromkeys(PHASES, 0))
+    # outbound HTTP may run on fetching's thread pool
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, phase: str, ms: float) -> None:
+        with self.lock:
+            self.ms[phase] += ms
+            self.counts[phase] += 1
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+# phases being timed in this context, so nested blocks of a phase count once
+_active: ContextVar[frozenset[str]] = ContextVar("timed_phases", default=frozenset())
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to `phase` of the current request, if any."""
+    timings = _current.get()
+    active = _active.get()
+    if timings is None or phase in active:
+        yield
+        return
+    token = _active.set(active | {phase})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _active.reset(token)
+        timings.add(phase, (time.perf_counter() - started) * 1000)
+
+
+def _track_queries(sender: Any, connection: Any, **kwargs: Any) -> None:
+    # on every connection rather than per request, so queries run from other
+    # threads serving the request (fetching's pool) count too
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _time_query(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any
+) -> Any:
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+def install() -> None:
+    """Hook the query timer in, once at startup, as an execute wrapper on every database connection."""
+    connection_created.connect(_track_queries, dispatch_uid=__name__)
+    for connection in connections.all(initialized_only=True):
+        _track_queries(None, connection)
+
+
+class _TimedData:
+    @property
+    def data(self) -> Any:
+        with timed("serialize"):
+            return super().data  # type: ignore[misc]
+
+
+@cache
+def _timed_class(cls: type) -> type:
+    return type(
+        cls.__name__,
+        (_TimedData, cls),
+        {"__module__": cls.__module__, "__qualname__": cls.__qualname__},
+    )
+
+
+def timed_serializer(serializer: S) -> S:
+    """Count `serializer.data` towards the serialize phase. Only this instance is affected."""
+    serializer.__class__ = _timed_class(type(serializer))
+    return serializer
+
+
+class TimedSerializerMixin:
+    """ViewSet mixin counting the output of `get_serializer()` towards the serialize phase."""
+
+    def get_serializer(self, *args: Any, **kwargs: Any) -> Any:
+        serializer = super().get_serializer(*args, **kwargs)  # type: ignore[misc]
+        if getattr(self, "swagger_fake_view", False):  # schema generation
+            return serializer
+        return timed_serializer(serializer)
+
+
+class _ViewStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.samples: dict[str, deque[dict[str, float]]] = defaultdict(
+            lambda: deque(maxlen=STATS_SAMPLES)
+        )
+
+    def record(self, view: str, sample: dict[str, float]) -> None:
+        with self.lock:
+            self.samples[view].append(sample)
+
+    def summary(self) -> dict[str, Any]:
+        with self.lock:
+            snapshot = {view: list(samples) for view, samples in self.samples.items()}
+        return {
+            view: {
+                "requests": len(samples),
+                **{
+                    metric: _percentiles([sample[metric] for sample in samples])
+                    for metric in samples[0]
+                },
+            }
+            for view, samples in sorted(snapshot.items())
+        }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.samples.clear()
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) == 1:
+        return {"p50": values[0], "p90": values[0], "p99": values[0], "max": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 3),
+        "p90": round(cuts[89], 3),
+        "p99": round(cuts[98], 3),
+        "max": round(max(values), 3),
+    }
+
+
+view_stats = _ViewStats()
+
+
+def stats_enabled() -> bool:
+    return bool(getattr(settings, "API_DEBUG_STATS", False))
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timings, started)
+
+    def report(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timings: RequestTimings,
+        started: float,
+    ) -> HttpResponse:
+        total = (time.perf_counter() - started) * 1000
+        response["Server-Timing"] = ", ".join(
+            [
+                f'{phase};dur={timings.ms[phase]:.1f};desc="{timings.counts[phase]}"'
+                for phase in PHASES
+            ]
+            + [f"total;dur={total:.1f}"]
+        )
+        match = request.resolver_match
+        view = f"{request.method} {match.view_name}" if match else UNRESOLVED
+        record = {
+            "view": view,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total, 1),
+            **{f"{phase}_ms": round(timings.ms[phase], 1) for phase in PHASES},
+            "queries": timings.counts["db"],
+            "http_requests": timings.counts["http"],
+        }
+        logger.info(json.dumps(record))
+        # reading the stats shouldn't show up in them
+        if stats_enabled() and not (match and match.url_name == STATS_URL_NAME):
+            view_stats.record(
+                view,
+                {
+                    "total_ms": total,
+                    **{f"{phase}_ms": timings.ms[phase] for phase in PHASES},
+                    "queries": timings.counts["db"],
+                },
+            )
+        return response
@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from api import catalog
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "fixtures"
+# ingredients first, nutrition stats reference them
+DEFAULT_FILES = [
+    FIXTURES_DIR / "food_fixture.json",
+    FIXTURES_DIR / "nutritionstats_fixture.json",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream food catalog fixtures (ingredients, nutrition stats) into the database "
+        "with batched upserts. Safe to re-run; defaults to the bundled fixtures."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "files", nargs="*", type=Path, help="Fixture files, loaded in order"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=catalog.BATCH_SIZE,
+            help=f"Rows per INSERT (default {catalog.BATCH_SIZE})",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        files: list[Path] = options["files"] or DEFAULT_FILES
+        batch_size: int = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        for path in files:
+            started = time.monotonic()
+
+            def progress(summary: catalog.LoadSummary) -> None:
+                if options["verbosity"] > 1:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"  {summary.total} rows ({summary.total / max(elapsed, 1e-9):.0f} rows/s)"
+                    )
+
+            try:
+                with path.open(encoding="utf-8") as stream:
+                    summary = catalog.load_file(stream, batch_size, progress)
+            except OSError as exc:
+                raise CommandError(f"Could not read {path}: {exc}") from exc
+            except catalog.CatalogError as exc:
+                raise CommandError(f"{path}: {exc}") from exc
+
+            elapsed = time.monotonic() - started
+            counts = ", ".join(f"{n} {label}" for label, n in summary.rows.items())
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{path.name}: {summary.total} rows ({counts or 'nothing'}) in "
+                    f"{elapsed:.2f}s, {summary.total / max(elapsed, 1e-9):.0f} rows/s"
+                )
+            )
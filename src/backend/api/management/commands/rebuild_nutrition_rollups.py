@@ -0,0 +1,13 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the nutrition/cost rollup of every recipe (after bulk imports or data fixes)."
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        written = rollups.rebuild_all()
+        self.stdout.write(f"Rebuilt {written} recipe rollup(s)")
@@ -0,0 +1,69 @@
+import json
+from dataclasses import fields
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data and benchmark every API "
+        "endpoint, the recipe_loader stages, the ingredient matcher, ingredient-line "
+        "parsing and JSON-LD extraction. Writes JSON."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        defaults = benchmarks.Scale()
+        for field in fields(benchmarks.Scale):
+            parser.add_argument(
+                f"--{field.name.replace('_', '-')}",
+                type=int,
+                default=getattr(defaults, field.name),
+                help=f"default {getattr(defaults, field.name)}",
+            )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timed runs per case (default 5)"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed for the synthetic data"
+        )
+        parser.add_argument(
+            "--output", type=Path, help="Write the results here instead of stdout"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        scale = benchmarks.Scale(
+            **{field.name: options[field.name] for field in fields(benchmarks.Scale)}
+        )
+        if options["repeat"] < 1 or any(
+            getattr(scale, field.name) < 0 for field in fields(benchmarks.Scale)
+        ):
+            raise CommandError("--repeat must be positive and scales non-negative")
+
+        # the same throwaway database and environment `manage.py test` uses, never the real one
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = benchmarks.run(scale, options["repeat"], options["seed"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = json.dumps(results, indent=2)
+        if options["output"]:
+            options["output"].write_text(report + "\n")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {len(results['endpoints'])} endpoint and "
+                    f"{sum(len(rows) for key, rows in results.items() if key not in ('meta', 'seeded', 'endpoints'))} "
+                    f"other results to {options['output']}"
+                )
+            )
+        else:
+            self.stdout.write(report)
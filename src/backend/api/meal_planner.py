@@ -0,0 +1,244 @@
+"""
+Fills the weekly meal plan from daily nutrient targets and a weekly budget.
+
+Candidates come from RecipeNutritionRollup, which already holds every recipe's
+nutrition (from RecipeIngredient x NutritionStats) and cost (scraped price, else
+the estimate), in one query laid out column-wise in typed arrays: one array per
+nutrient, one entry per recipe. The arrays only keep the candidates compact;
+the scoring is a plain Python loop over them (NumPy isn't a dependency here).
+The open cells of the week are filled greedily, day by day: each cell scores
+every candidate against what is left of the day's targets, and places the best
+one that keeps the rest of the week affordable. That is O(cells x candidates x
+targets), about 0.1s for a full week over 5000 candidates.
+
+A candidate's score adds, for each targeted nutrient, its squared miss of the
+meal's share of the day's target as a fraction of the target: a meal that
+misses by the whole daily target scores 1 per nutrient. With a budget, it also
+adds cost_weight x (cost / per-meal share of the budget)^2. The budget itself is
+a hard limit enforced separately, so this term only steers towards cheaper meals.
+At the default COST_WEIGHT, a meal costing its full share of the budget weighs as
+much as missing one nutrient by about a third of the daily target (0.1 = 0.32^2):
+small enough that targets still come first, large enough to prefer a cheaper meal
+that is nutritionally almost as good.
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from django.db import transaction
+
+from . import aggregates, models
+
+# how much an expensive meal is penalized against missing a nutrient target, when
+# a budget is set; see the module docstring for the scale
+COST_WEIGHT = 0.1
+
+
+@dataclass
+class Candidates:
+    """Per-serving nutrition and cost of candidate recipes, column-wise."""
+
+    recipe_ids: "array[int]" = field(default_factory=lambda: array("q"))
+    cost: "array[float]" = field(default_factory=lambda: array("d"))
+    nutrients: dict[str, "array[float]"] = field(
+        default_factory=lambda: {
+            name: array("d") for name in aggregates.NUTRITION_FIELDS
+        }
+    )
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    def row(self, index: int) -> dict[str, float]:
+        return {name: column[index] for name, column in self.nutrients.items()}
+
+
+def load_candidates(recipe_ids: Optional[Iterable[int]] = None) -> Candidates:
+    """Candidates for `recipe_ids` (every recipe by default), in one query."""
+    rows = models.RecipeNutritionRollup.objects.values_list(
+        "recipe_id", "recipe__servings", "cost_per_serving", "nutrition_total"
+    ).order_by("recipe_id")
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=list(recipe_ids))
+    candidates = Candidates()
+    for recipe_id, servings, cost, totals in rows.iterator(chunk_size=2000):
+        per = servings or 1  # like aggregates.recipe_totals
+        candidates.recipe_ids.append(recipe_id)
+        candidates.cost.append(cost)
+        for name, column in candidates.nutrients.items():
+            column.append((totals.get(name) or 0.0) / per)
+    return candidates
+
+
+@dataclass
+class WeekPlan:
+    # (day, slot, recipe id), in the order they were filled
+    meals: list[tuple[str, str, int]]
+    cost: float
+    # nutrition of every planned day, including entries that were kept
+    daily_totals: dict[str, dict[str, float]]
+    # cells no affordable candidate was left for
+    unfilled: list[tuple[str, str]]
+
+
+def plan_week(
+    candidates: Candidates,
+    cells: list[tuple[str, str]],
+    targets: dict[str, float],
+    budget: Optional[float] = None,
+    servings: int = 1,
+    max_repeats: int = 2,
+    planned: Optional[dict[str, dict[str, float]]] = None,
+    spent: float = 0.0,
+    cost_weight: float = COST_WEIGHT,
+) -> WeekPlan:
+    """
+    Fill `cells` ((day, slot) pairs, grouped by day) with candidates. `planned` and
+    `spent` are the nutrition per day and the cost of entries already on the plan.
+    Without targets the cheapest meals are picked.
+    """
+    n = len(candidates)
+    daily_totals = {day: dict(totals) for day, totals in (planned or {}).items()}
+    for day, _ in cells:
+        daily_totals.setdefault(day, dict.fromkeys(aggregates.NUTRITION_FIELDS, 0.0))
+    targeted = [
+        (candidates.nutrients[name], target, name)
+        for name, target in targets.items()
+        if target > 0
+    ]
+    costs = [servings * cost for cost in candidates.cost]
+    cheapest = min(costs, default=0.0)
+    per_meal_budget = (budget - spent) / len(cells) if budget and cells else None
+    uses = [0] * n
+    meals: list[tuple[str, str, int]] = []
+    unfilled: list[tuple[str, str]] = []
+
+    for position, (day, slot) in enumerate(cells):
+        totals = daily_totals[day]
+        meals_left_today = sum(1 for d, _ in cells[position:] if d == day)
+
+        if targeted:
+            scores = [0.0] * n
+            for column, target, name in targeted:
+                wanted = (target - totals[name]) / meals_left_today
+                scores = [
+                    score + ((servings * value - wanted) / target) ** 2
+                    for score, value in zip(scores, column)
+                ]
+            if per_meal_budget:
+                scores = [
+                    score + cost_weight * (cost / per_meal_budget) ** 2
+                    for score, cost in zip(scores, costs)
+                ]
+        else:
+            scores = costs
+
+        # keep enough money for the cheapest meal in every cell after this one
+        allowance = (
+            budget - spent - cheapest * (len(cells) - position - 1)
+            if budget is not None
+            else None
+        )
+        best: Optional[int] = None
+        for index in range(n):
+            if uses[index] >= max_repeats:
+                continue
+            if allowance is not None and costs[index] > allowance + 1e-9:
+                continue
+            if best is None or scores[index] < scores[best]:
+                best = index
+        if best is None:
+            unfilled.append((day, slot))
+            continue
+
+        uses[best] += 1
+        spent += costs[best]
+        for name, value in candidates.row(best).items():
+            totals[name] += servings * value
+        meals.append((day, slot, candidates.recipe_ids[best]))
+
+    return WeekPlan(
+        meals=meals, cost=spent, daily_totals=daily_totals, unfilled=unfilled
+    )
+
+
+def optimize(
+    targets: dict[str, float],
+    budget: Optional[float] = None,
+    days: Optional[list[str]] = None,
+    slots: Optional[list[str]] = None,
+    servings: int = 1,
+    recipes: Optional[list[int]] = None,
+    max_repeats: int = 2,
+    replace: bool = True,
+    save: bool = True,
+    cost_weight: float = COST_WEIGHT,
+) -> tuple[WeekPlan, list[models.MealPlanEntry]]:
+    """
+    Plan `days` x `slots` (the whole week by default). With `replace` the entries in
+    those cells are replaced, otherwise only empty cells are filled and existing
+    entries count towards the targets and the budget. Returns the plan and the new
+    entries (saved unless `save` is False).
+    """
+    days = days or list(models.DayOfWeek.values)
+    slots = slots or list(models.MealSlot.values)
+    # day by day in week order, so daily targets are spread over a day's meals
+    day_order = [day for day in models.DayOfWeek.values if day in days]
+    slot_order = [slot for slot in models.MealSlot.values if slot in slots]
+
+    existing = list(
+        models.MealPlanEntry.objects.filter(day__in=day_order).values_list(
+            "id", "day", "slot", "recipe_id", "servings"
+        )
+    )
+    replaced = {
+        entry_id
+        for entry_id, day, slot, _, _ in existing
+        if replace and slot in slot_order
+    }
+    kept = [entry for entry in existing if entry[0] not in replaced]
+    taken = {(day, slot) for _, day, slot, _, _ in kept}
+    cells = [
+        (day, slot)
+        for day in day_order
+        for slot in slot_order
+        if (day, slot) not in taken
+    ]
+
+    planned: dict[str, dict[str, float]] = {}
+    spent = 0.0
+    if kept:
+        kept_candidates = load_candidates({entry[3] for entry in kept})
+        index = {recipe_id: i for i, recipe_id in enumerate(kept_candidates.recipe_ids)}
+        for _, day, _, recipe_id, entry_servings in kept:
+            totals = planned.setdefault(
+                day, dict.fromkeys(aggregates.NUTRITION_FIELDS, 0.0)
+            )
+            if recipe_id not in index:
+                continue
+            i = index[recipe_id]
+            spent += entry_servings * kept_candidates.cost[i]
+            for name, value in kept_candidates.row(i).items():
+                totals[name] += entry_servings * value
+
+    plan = plan_week(
+        load_candidates(recipes),
+        cells,
+        targets,
+        budget=budget,
+        servings=servings,
+        max_repeats=max_repeats,
+        planned=planned,
+        spent=spent,
+        cost_weight=cost_weight,
+    )
+    entries = [
+        models.MealPlanEntry(recipe_id=recipe_id, day=day, slot=slot, servings=servings)
+        for day, slot, recipe_id in plan.meals
+    ]
+    if save:
+        with transaction.atomic():
+            models.MealPlanEntry.objects.filter(pk__in=replaced).delete()
+            entries = models.MealPlanEntry.objects.bulk_create(entries)
+    return plan, entries
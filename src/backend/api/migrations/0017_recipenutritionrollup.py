@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_alter_recipe_image_url"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeNutritionRollup",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="nutrition_rollup",
+                        serialize=False,
+                        to="api.recipe",
+                    ),
+                ),
+                ("kcal_per_serving", models.FloatField(db_index=True)),
+                ("protein_grams_per_serving", models.FloatField(db_index=True)),
+                ("cost_per_serving", models.FloatField(db_index=True)),
+                ("cost_total", models.FloatField()),
+                (
+                    "cost_partially_unknown",
+                    models.BooleanField(
+                        help_text="Some ingredients have neither a scraped price nor an estimate"
+                    ),
+                ),
+                (
+                    "nutrition_total",
+                    models.JSONField(
+                        help_text="Every NutritionStats column summed over the recipe"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
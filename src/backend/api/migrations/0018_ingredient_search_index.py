@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS api_ingredient_name_trgm "
+            "ON api_ingredient USING gin (lower(name) gin_trgm_ops)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS api_ingredient_fts "
+            "USING fts5(name, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            "INSERT INTO api_ingredient_fts (rowid, name) "
+            "SELECT id, name FROM api_ingredient"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS api_ingredient_name_trgm")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS api_ingredient_fts")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0017_recipenutritionrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-17 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import api.models
+
+
+def fill_normalized_names(apps, schema_editor):
+    Ingredient = apps.get_model("api", "Ingredient")
+    ingredients = list(Ingredient.objects.only("id", "name"))
+    for ingredient in ingredients:
+        ingredient.normalized_name = api.models.normalize_name(ingredient.name)
+    Ingredient.objects.bulk_update(ingredients, ["normalized_name"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_resourceversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="normalized_name",
+            field=api.models.NormalizedNameField(
+                db_index=True, default="", derived_from="name", max_length=256
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="IngredientAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("alias", models.CharField(max_length=256, unique=True)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="api.ingredient",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "ingredient aliases",
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from api import rollups
+
+
+def backfill_rollups(apps, schema_editor):
+    # rollups are computed by the app's own aggregate queries, which need the
+    # current schema; hence after the latest migrations rather than in 0017
+    rollups.rebuild_all()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_ingredient_normalized_name_alias"),
+        ("scraper", "0016_source_backoff_hostcircuit"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
+import unicodedata
+from datetime import datetime
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 NullableFloatField = models.FloatField[Optional[float], Optional[float]]
 
@@ -108,8 +111,43 @@ class NutritionStats(models.Model):
         return f"{self.kcal_per_unit:.2f} kcal per {self.base_unit} {f'+{n} other nonzero nutrients' if n > 0 else ''}"
 
 
+def normalize_name(name: str) -> str:
+    """The form ingredient names and aliases are looked up by: NFKC, casefolded, whitespace runs as one space."""
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+class NormalizedNameField(models.CharField):  # type: ignore[type-arg]
+    """
+    `normalize_name` of another field of the row, computed in Python on every
+    save and bulk_create (like auto_now), so it means the same on every database.
+    Writes that bypass pre_save (bulk_update, QuerySet.update, upserts) must
+    list it next to `derived_from`.
+    """
+
+    def __init__(self, *args: Any, derived_from: str, **kwargs: Any) -> None:
+        self.derived_from = derived_from
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self) -> Any:
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["derived_from"] = self.derived_from
+        kwargs.pop("editable", None)
+        kwargs.pop("blank", None)
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance: models.Model, add: bool) -> str:
+        value = normalize_name(getattr(model_instance, self.derived_from))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Ingredient(models.Model):
     name: models.CharField[str, str] = models.CharField(max_length=256)
+    normalized_name: NormalizedNameField = NormalizedNameField(
+        max_length=256, derived_from="name", db_index=True
+    )
     estimated_cost: NullableFloatField = models.FloatField(
         null=True,
         blank=True,
@@ -119,13 +157,36 @@ class Ingredient(models.Model):
     )
 
     if TYPE_CHECKING:
+        from django_stubs_ext.db.models.manager import RelatedManager
+
         nutrition_stats: "models.OneToOneField[NutritionStats]"
+        aliases: "RelatedManager[IngredientAlias]"
         id: int
 
     def __str__(self) -> str:
         return f"{self.name} ({self.nutrition_stats.inline_str() if hasattr(self, 'nutrition_stats') else 'No nutrition stats'})"
 
 
+class IngredientAlias(models.Model):
+    """
+    Another name an Ingredient goes by in recipes ("extra virgin olive oil" for
+    olive oil), stored normalized. Recipe imports resolve aliases alongside
+    ingredient names, and confirming a recipe records the name each line was
+    matched from, so the next import of the same wording is an exact hit.
+    """
+
+    alias: models.CharField[str, str] = models.CharField(max_length=256, unique=True)
+    ingredient: models.ForeignKey[Ingredient] = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="aliases"
+    )
+
+    class Meta:
+        verbose_name_plural = "ingredient aliases"
+
+    def __str__(self) -> str:
+        return f"{self.alias} -> {self.ingredient.name}"
+
+
 class RecipeIngredient(models.Model):
     recipe: "models.ForeignKey[Recipe]" = models.ForeignKey(
         "Recipe",
@@ -236,3 +297,53 @@ class MealPlanEntry(models.Model):
     class Meta:
         ordering = ["day", "slot"]
         verbose_name_plural = "meal plan entries"
+
+
+class RecipeNutritionRollup(models.Model):
+    """
+    Denormalized nutrition and cost totals of a Recipe, maintained by api.rollups so
+    recipes can be sorted and filtered by per-serving values without aggregating.
+    """
+
+    recipe: models.OneToOneField[Recipe, Recipe] = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="nutrition_rollup",
+    )
+    kcal_per_serving: models.FloatField[float, float] = models.FloatField(db_index=True)
+    protein_grams_per_serving: models.FloatField[float, float] = models.FloatField(
+        db_index=True
+    )
+    cost_per_serving: models.FloatField[float, float] = models.FloatField(db_index=True)
+    cost_total: models.FloatField[float, float] = models.FloatField()
+    cost_partially_unknown: models.BooleanField[bool, bool] = models.BooleanField(
+        help_text=_("Some ingredients have neither a scraped price nor an estimate")
+    )
+    nutrition_total: models.JSONField[dict[str, float], dict[str, float]] = (
+        models.JSONField(
+            help_text=_("Every NutritionStats column summed over the recipe")
+        )
+    )
+    updated_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
+        auto_now=True
+    )
+
+    def __str__(self) -> str:
+        return f"Rollup for recipe {self.recipe_id}"  # type: ignore[attr-defined]
+
+
+class ResourceVersion(models.Model):
+    """
+    Version stamp of a cached API resource (see api.http_cache), replaced whenever
+    a row the resource is rendered from changes. Response ETags are derived from it.
+    """
+
+    name: models.CharField[str, str] = models.CharField(max_length=50, primary_key=True)
+    version: models.CharField[str, str] = models.CharField(max_length=32)
+    updated_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
+        auto_now=True
+    )
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.version}"
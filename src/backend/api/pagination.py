@@ -0,0 +1,131 @@
+"""
+Default pagination for the API.
+
+Pages are limit/offset (what the frontend uses) unless the request carries a
+`?cursor=` parameter, which switches to keyset pages: `WHERE id > last_seen`
+instead of OFFSET, so deep pages cost the same as the first and no COUNT(*) runs.
+Pass an empty `?cursor=` to start. `?count=estimate` replaces the exact count
+with the planner's row estimate on Postgres for unfiltered listings.
+"""
+
+from typing import Any, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.db.models import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+COUNT_QUERY_PARAM = "count"
+COUNT_ESTIMATE = "estimate"
+
+
+def wants_estimate(request: Request) -> bool:
+    return request.query_params.get(COUNT_QUERY_PARAM) == COUNT_ESTIMATE
+
+
+def estimated_count(queryset: "QuerySet[Any]") -> int:
+    """
+    pg_class.reltuples for an unfiltered queryset on Postgres (kept current by
+    autovacuum / ANALYZE), an exact count otherwise.
+    """
+    if connection.vendor == "postgresql" and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:  # -1 until the table was first analyzed
+            return int(row[0])
+    return queryset.count()
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pages over the primary key, or the view's ordering with the primary key
+    as tiebreaker so rows with equal values keep their order across pages. The
+    cursor stores the leading value, so orderings by columns or annotations that
+    can be NULL are rejected.
+    """
+
+    ordering = "id"
+    page_size_query_param = "limit"
+    max_page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(
+        self, queryset: "QuerySet[Any]", request: Request, view: Any = None
+    ) -> Optional[list[Any]]:
+        self.count = estimated_count(queryset) if wants_estimate(request) else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(
+        self, request: Request, queryset: "QuerySet[Any]", view: Any
+    ) -> tuple[str, ...]:
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        leading = ordering[0].removeprefix("-")
+        opts = queryset.model._meta
+        try:
+            field = opts.pk if leading == "pk" else opts.get_field(leading)
+        except FieldDoesNotExist:
+            field = None  # an annotation
+        if field is None or field.null:
+            raise ValidationError(
+                {
+                    self.cursor_query_param: f"Cursor pages can't be ordered by {leading!r}, "
+                    "which can be empty. Use offset pages."
+                }
+            )
+        if not field.unique:
+            ordering += ("-pk" if ordering[0].startswith("-") else "pk",)
+        return ordering
+
+    def get_paginated_response(self, data: Any) -> Response:
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data["count"] = self.count
+        return response
+
+
+class HybridPagination(LimitOffsetPagination):
+    keyset: Optional[KeysetPagination] = None
+
+    def paginate_queryset(
+        self, queryset: "QuerySet[Any]", request: Request, view: Any = None
+    ) -> Optional[list[Any]]:
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset: "QuerySet[Any]") -> int:  # type: ignore[override]
+        if wants_estimate(self.request):
+            return estimated_count(queryset)
+        return super().get_count(queryset)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view: Any) -> list[dict[str, Any]]:
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Keyset pagination cursor, pass an empty value for the first page. Replaces offset.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": COUNT_QUERY_PARAM,
+                "required": False,
+                "in": "query",
+                "description": "'estimate' to return an approximate count on large, unfiltered listings",
+                "schema": {"type": "string", "enum": [COUNT_ESTIMATE]},
+            },
+        ]
@@ -0,0 +1,94 @@
+"""
+Builds select_related / prefetch_related graphs by walking a serializer tree, so
+that nested representations are loaded in a fixed number of queries.
+"""
+
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+def plan_queryset(
+    queryset: "QuerySet[Any]", serializer: serializers.BaseSerializer[Any]
+) -> "QuerySet[Any]":
+    """Apply the joins and prefetches needed to render `serializer` over `queryset`."""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child  # type: ignore[assignment]
+    select, prefetch = _plan(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def _plan(
+    serializer: serializers.BaseSerializer[Any],
+    model: type[models.Model],
+    prefix: str = "",
+) -> tuple[list[str], list[Prefetch]]:
+    """
+    Returns (select_related lookups, Prefetch objects) for the readable relations
+    in `serializer`. Single-valued nested serializers are joined into the parent
+    query and their own relations are planned under the joined path; many-valued
+    ones get a Prefetch with a queryset planned for the child serializer.
+    """
+    select: list[str] = []
+    prefetch: list[Prefetch] = []
+    fields: dict[str, serializers.Field[Any, Any, Any, Any]] = getattr(
+        serializer, "fields", {}
+    )
+    for field in fields.values():
+        if field.write_only or field.source == "*" or "." in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue  # a property or method, nothing to plan
+        related_model = model_field.related_model
+        if not model_field.is_relation or not isinstance(related_model, type):
+            continue
+
+        lookup = prefix + field.source
+        if isinstance(field, serializers.ListSerializer):
+            child_qs = plan_queryset(
+                related_model._default_manager.all(),
+                field.child,  # type: ignore[arg-type]
+            )
+            prefetch.append(Prefetch(lookup, queryset=child_qs))
+        elif isinstance(field, ManyRelatedField):
+            prefetch.append(Prefetch(lookup))
+        elif isinstance(field, serializers.BaseSerializer):
+            select.append(lookup)
+            child_select, child_prefetch = _plan(
+                field, related_model, prefix=f"{lookup}__"
+            )
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+        # plain PrimaryKeyRelatedField reads the local "<field>_id" column, no query needed
+    return select, prefetch
+
+
+class QueryPlanMixin:
+    """ViewSet mixin that plans the queryset from the serializer the view will render with."""
+
+    def get_queryset(self) -> "QuerySet[Any]":
+        queryset = super().get_queryset()  # type: ignore[misc]
+        return plan_queryset(queryset, self.get_serializer())  # type: ignore[attr-defined]
+
+    def perform_create(self, serializer: serializers.BaseSerializer[Any]) -> None:
+        super().perform_create(serializer)  # type: ignore[misc]
+        self.reload_planned(serializer)
+
+    def perform_update(self, serializer: serializers.BaseSerializer[Any]) -> None:
+        super().perform_update(serializer)  # type: ignore[misc]
+        self.reload_planned(serializer)
+
+    def reload_planned(self, serializer: serializers.BaseSerializer[Any]) -> None:
+        """Render write responses from a planned fetch too, instead of lazily loading every nested row."""
+        assert serializer.instance is not None
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
@@ -0,0 +1,96 @@
+"""
+Keeps RecipeNutritionRollup in step with the rows it is computed from. Signal
+handlers (and bulk writes that bypass signals) call `schedule`; the affected
+recipes are recomputed once, with one aggregate query and one upsert, when the
+surrounding transaction commits.
+"""
+
+import threading
+from typing import Iterable
+
+from django.db import transaction
+
+from . import aggregates, models
+
+# per thread, since every thread has its own connection and transaction
+_local = threading.local()
+
+# how many recipes `rebuild_all` recomputes per query
+REBUILD_BATCH_SIZE = 500
+
+
+def _pending() -> set[int]:
+    if not hasattr(_local, "recipe_ids"):
+        _local.recipe_ids = set()
+    return _local.recipe_ids
+
+
+def schedule(recipe_ids: Iterable[int]) -> None:
+    """Recompute the rollups of `recipe_ids` after the current transaction commits."""
+    ids = set(recipe_ids)
+    if ids:
+        _pending().update(ids)
+        transaction.on_commit(_flush)
+
+
+def schedule_for_ingredients(ingredient_ids: Iterable[int]) -> None:
+    """Recompute the rollups of every recipe using one of `ingredient_ids`."""
+    ids = set(ingredient_ids)
+    if ids:
+        schedule(
+            models.RecipeIngredient.objects.filter(ingredient_id__in=ids)
+            .values_list("recipe_id", flat=True)
+            .distinct()
+        )
+
+
+def _flush() -> None:
+    # the first callback of a transaction handles everything queued in it, later ones find nothing
+    pending = _pending()
+    ids = set(pending)
+    pending.clear()
+    if ids:
+        refresh(ids)
+
+
+def refresh(recipe_ids: Iterable[int]) -> int:
+    """Recompute and upsert the rollups of `recipe_ids` now. Returns how many were written."""
+    totals = aggregates.recipe_totals(recipe_ids)
+    rollups = [
+        models.RecipeNutritionRollup(
+            recipe_id=recipe_id,
+            kcal_per_serving=row["nutrition"]["per_serving"]["kcal_per_unit"],
+            protein_grams_per_serving=row["nutrition"]["per_serving"][
+                "protein_grams_per_unit"
+            ],
+            cost_per_serving=row["cost"]["per_serving"],
+            cost_total=row["cost"]["total"],
+            cost_partially_unknown=row["cost"]["partially_unknown"],
+            nutrition_total=row["nutrition"]["total"],
+        )
+        for recipe_id, row in totals.items()
+    ]
+    models.RecipeNutritionRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["recipe"],
+        update_fields=[
+            "kcal_per_serving",
+            "protein_grams_per_serving",
+            "cost_per_serving",
+            "cost_total",
+            "cost_partially_unknown",
+            "nutrition_total",
+            "updated_at",
+        ],
+    )
+    return len(rollups)
+
+
+def rebuild_all() -> int:
+    """Recompute every recipe's rollup. Returns how many were written."""
+    recipe_ids = list(models.Recipe.objects.order_by("id").values_list("id", flat=True))
+    written = 0
+    for start in range(0, len(recipe_ids), REBUILD_BATCH_SIZE):
+        written += refresh(recipe_ids[start : start + REBUILD_BATCH_SIZE])
+    return written
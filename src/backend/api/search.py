@@ -0,0 +1,205 @@
+"""
+Indexed, ranked ingredient name search.
+
+On Postgres it uses a pg_trgm GIN index on lower(name): substring hits first, then
+by word similarity. On SQLite it uses an FTS5 shadow table with the trigram
+tokenizer, ranked by bm25. The shadow table is created by migration 0018 and
+kept in step with Ingredient by the signals in api.signals.
+"""
+
+from typing import Any, Iterable
+
+from django.db import connection
+from django.db.models import Case, IntegerField, QuerySet, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+
+from . import models
+
+FTS_TABLE = "api_ingredient_fts"
+# trigram tokenizers can't match terms shorter than this
+MIN_TRIGRAM_TERM = 3
+# matches of `?search=` put in rank order, any further ones follow by id
+SEARCH_RANKED_LIMIT = 500
+
+
+def _like_pattern(text: str, prefix: bool = False) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+
+def _postgres_where(terms: list[str], match_all: bool) -> tuple[str, list[Any]]:
+    if match_all:
+        where = " AND ".join(["lower(name) LIKE %s"] * len(terms))
+        return where, [_like_pattern(term) for term in terms]
+    query = " ".join(terms)
+    return "(lower(name) LIKE %s OR %s <%% lower(name))", [_like_pattern(query), query]
+
+
+def _postgres_search(
+    terms: list[str], limit: int, match_all: bool
+) -> list[tuple[int, float]]:
+    query = " ".join(terms)
+    where, params = _postgres_where(terms, match_all)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT id, word_similarity(%s, lower(name)) AS score
+            FROM api_ingredient
+            WHERE {where}
+            ORDER BY lower(name) LIKE %s DESC, score DESC, id
+            LIMIT %s
+            """,
+            [query, *params, _like_pattern(query), limit],
+        )
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def _sqlite_where(terms: list[str], match_all: bool) -> tuple[str, list[Any]]:
+    """Conditions on the shadow table: the trigram index for terms long enough, substring scans otherwise."""
+    long_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_TERM]
+    short_terms = [term for term in terms if len(term) < MIN_TRIGRAM_TERM]
+    joiner = " AND " if match_all else " OR "
+    like = "name LIKE %s ESCAPE '\\'"
+    if not long_terms:
+        where = f"({joiner.join([like] * len(terms))})"
+        return where, [_like_pattern(term) for term in terms]
+    conditions = [f"{FTS_TABLE} MATCH %s"]
+    params: list[Any] = [
+        joiner.join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+    ]
+    if match_all:
+        for term in short_terms:
+            conditions.append(like)
+            params.append(_like_pattern(term))
+    return " AND ".join(conditions), params
+
+
+def _sqlite_search(
+    terms: list[str], limit: int, match_all: bool
+) -> list[tuple[int, float]]:
+    where, params = _sqlite_where(terms, match_all)
+    if any(len(term) >= MIN_TRIGRAM_TERM for term in terms):
+        # OR ranks names matching more of the terms higher
+        sql = (
+            f"SELECT rowid, -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {where} ORDER BY rank, rowid LIMIT %s"
+        )
+    else:
+        # too short for trigrams, names starting with the query first
+        sql = (
+            f"SELECT rowid, 1.0 FROM {FTS_TABLE} WHERE {where} "
+            "ORDER BY NOT name LIKE %s ESCAPE '\\', length(name), rowid LIMIT %s"
+        )
+        params.append(_like_pattern(" ".join(terms), prefix=True))
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def ranked_ingredient_ids(
+    query: str, limit: int = 20, match_all: bool = False
+) -> list[tuple[int, float]]:
+    """
+    (ingredient id, score) pairs for `query`, best match first. With `match_all`
+    every term must appear in the name, otherwise any term (or, on Postgres, a
+    similar enough word) is enough.
+    """
+    terms = query.lower().split()
+    if not terms:
+        return []
+    if connection.vendor == "postgresql":
+        return _postgres_search(terms, limit, match_all)
+    return _sqlite_search(terms, limit, match_all)
+
+
+def matching_ids(query: str, match_all: bool = False) -> RawSQL:
+    """Every ingredient id `ranked_ingredient_ids` could return for `query`, as a subquery for `pk__in`."""
+    terms = query.lower().split()
+    if connection.vendor == "postgresql":
+        where, params = _postgres_where(terms, match_all)
+        return RawSQL(f"SELECT id FROM api_ingredient WHERE {where}", params)
+    where, params = _sqlite_where(terms, match_all)
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {where}", params)
+
+
+def _rank(ranked_ids: list[int]) -> Case:
+    return Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ranked_ids)],
+        default=len(ranked_ids),
+        output_field=IntegerField(),
+    )
+
+
+def order_by_rank(
+    queryset: "QuerySet[models.Ingredient]", ranked_ids: list[int]
+) -> "QuerySet[models.Ingredient]":
+    return queryset.filter(pk__in=ranked_ids).order_by(_rank(ranked_ids))
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    `?search=` for ingredients through the name index instead of an icontains scan.
+    Every ingredient whose name contains all the terms is returned, so counts and
+    pages stay exact; the best SEARCH_RANKED_LIMIT come first.
+    """
+
+    search_description = (
+        f"Names containing every term. The best {SEARCH_RANKED_LIMIT} matches come "
+        "first, best match first, any further ones follow by id."
+    )
+
+    def filter_queryset(
+        self, request: Request, queryset: "QuerySet[Any]", view: Any
+    ) -> "QuerySet[Any]":
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = " ".join(terms)
+        ranked = ranked_ingredient_ids(query, limit=SEARCH_RANKED_LIMIT, match_all=True)
+        return queryset.filter(pk__in=matching_ids(query, match_all=True)).order_by(
+            _rank([pk for pk, _ in ranked]), "pk"
+        )
+
+
+def uses_shadow_table() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def index_ingredients(ingredients: Iterable[models.Ingredient]) -> None:
+    """Add or replace ingredients in the shadow table (no-op where the database indexes names itself)."""
+    if not uses_shadow_table():
+        return
+    rows = [(ingredient.pk, ingredient.name) for ingredient in ingredients]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name) VALUES (%s, %s)", rows
+        )
+
+
+def forget_ingredients(ingredient_ids: Iterable[int]) -> None:
+    if not uses_shadow_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            [(ingredient_id,) for ingredient_id in ingredient_ids],
+        )
+
+
+def rebuild() -> None:
+    """Repopulate the shadow table from Ingredient, after writes that bypass signals."""
+    if not uses_shadow_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name) SELECT id, name FROM api_ingredient"
+        )
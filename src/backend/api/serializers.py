@@ -1,5 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from . import models
+from . import aggregates, meal_planner, models
 from ingredient_store.serializers import OnHandIngredientSerializer
 from scraper.serializers import ScraperSerializer
 from typing import Any
@@ -40,12 +41,23 @@ class RecipeIngredientSerializer(serializers.ModelSerializer[models.RecipeIngred
         )
 
 
+class IngredientPkField(serializers.PrimaryKeyRelatedField[models.Ingredient]):
+    """Only checks the pk's type, RecipeSerializer resolves the whole list in one query
+    and reports missing ingredients with this field's `does_not_exist` message."""
+
+    def to_internal_value(self, data: Any) -> int:  # type: ignore[override]
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
 class RecipeIngredientWriteSerializer(serializers.Serializer[models.RecipeIngredient]):
     """For create/update: list of {ingredient: id, quantity}."""
 
-    ingredient: serializers.PrimaryKeyRelatedField[models.Ingredient] = (  # type: ignore
-        serializers.PrimaryKeyRelatedField(queryset=models.Ingredient.objects.all())
-    )
+    ingredient = IngredientPkField(queryset=models.Ingredient.objects.all())
     quantity = serializers.FloatField(min_value=0)
 
 
@@ -89,6 +101,27 @@ class RecipeSerializer(serializers.ModelSerializer[models.Recipe]):
         model = models.Recipe
         fields = "__all__"
 
+    def validate_recipe_ingredients(
+        self, value: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        ingredients = models.Ingredient.objects.in_bulk(
+            {item["ingredient"] for item in value}
+        )
+        if any(item["ingredient"] not in ingredients for item in value):
+            # the same per-item shape a PrimaryKeyRelatedField lookup would produce
+            message = IngredientPkField.default_error_messages["does_not_exist"]
+            raise serializers.ValidationError(
+                [
+                    {}
+                    if item["ingredient"] in ingredients
+                    else {"ingredient": [message.format(pk_value=item["ingredient"])]}
+                    for item in value
+                ]
+            )
+        return [
+            {**item, "ingredient": ingredients[item["ingredient"]]} for item in value
+        ]
+
     def create(self, validated_data: dict[str, Any]):
         recipe_ingredients = validated_data.pop("recipe_ingredients", [])
         recipe_steps = validated_data.pop("recipe_steps", [])
@@ -96,20 +129,29 @@ class RecipeSerializer(serializers.ModelSerializer[models.Recipe]):
         validated_data.pop(
             "ingredients", None
         )  # M2M through RecipeIngredient; set below
-        recipe = models.Recipe.objects.create(**validated_data)
-        if tag_ids is not None:
-            recipe.tags.set(tag_ids)
-        for item in recipe_ingredients:
-            models.RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=item["ingredient"],
-                quantity=item["quantity"],
+        with transaction.atomic():
+            recipe = models.Recipe.objects.create(**validated_data)
+            if tag_ids is not None:
+                recipe.tags.set(tag_ids)
+            models.RecipeIngredient.objects.bulk_create(
+                [
+                    models.RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=item["ingredient"],
+                        quantity=item["quantity"],
+                    )
+                    for item in recipe_ingredients
+                ]
             )
-        for item in recipe_steps:
-            models.RecipeStep.objects.create(
-                recipe=recipe,
-                step_number=item["step_number"],
-                description=item["description"],
+            models.RecipeStep.objects.bulk_create(
+                [
+                    models.RecipeStep(
+                        recipe=recipe,
+                        step_number=item["step_number"],
+                        description=item["description"],
+                    )
+                    for item in recipe_steps
+                ]
             )
         return recipe
 
@@ -118,29 +160,137 @@ class RecipeSerializer(serializers.ModelSerializer[models.Recipe]):
         recipe_steps = validated_data.pop("recipe_steps", None)
         tag_ids = validated_data.pop("tag_ids", None)
         validated_data.pop("ingredients", None)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        if tag_ids is not None:
-            instance.tags.set(tag_ids)
-        if recipe_ingredients is not None:
-            instance.ingredients_list.all().delete()
-            for item in recipe_ingredients:
-                models.RecipeIngredient.objects.create(
-                    recipe=instance,
-                    ingredient=item["ingredient"],
-                    quantity=item["quantity"],
-                )
-        if recipe_steps is not None:
-            instance.steps.all().delete()
-            for item in recipe_steps:
-                models.RecipeStep.objects.create(
-                    recipe=instance,
-                    step_number=item["step_number"],
-                    description=item["description"],
-                )
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            if tag_ids is not None:
+                instance.tags.set(tag_ids)
+            if recipe_ingredients is not None:
+                self.sync_ingredients(instance, recipe_ingredients)
+            if recipe_steps is not None:
+                self.sync_steps(instance, recipe_steps)
         return instance
 
+    @staticmethod
+    def sync_ingredients(
+        recipe: "models.Recipe", recipe_ingredients: list[dict[str, Any]]
+    ) -> None:
+        """Make the recipe's ingredients match `recipe_ingredients`, only writing rows that changed.
+
+        Rows are read back in id order, so existing rows are only kept while they line up
+        with the submitted list, everything after the first difference is recreated."""
+        existing = list(
+            models.RecipeIngredient.objects.filter(recipe=recipe).order_by("id")
+        )
+        kept = 0
+        to_update: list[models.RecipeIngredient] = []
+        for row, item in zip(existing, recipe_ingredients):
+            if row.ingredient_id != item["ingredient"].pk:  # type: ignore[attr-defined]
+                break
+            if row.quantity != item["quantity"]:
+                row.quantity = item["quantity"]
+                to_update.append(row)
+            kept += 1
+
+        stale_ids = [row.pk for row in existing[kept:]]
+        if stale_ids:
+            models.RecipeIngredient.objects.filter(pk__in=stale_ids).delete()
+        if to_update:
+            models.RecipeIngredient.objects.bulk_update(to_update, ["quantity"])
+        if kept < len(recipe_ingredients):
+            models.RecipeIngredient.objects.bulk_create(
+                [
+                    models.RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=item["ingredient"],
+                        quantity=item["quantity"],
+                    )
+                    for item in recipe_ingredients[kept:]
+                ]
+            )
+
+    @staticmethod
+    def sync_steps(recipe: "models.Recipe", recipe_steps: list[dict[str, Any]]) -> None:
+        """Make the recipe's steps match `recipe_steps`, only writing rows that changed."""
+        existing = {
+            step.step_number: step
+            for step in models.RecipeStep.objects.filter(recipe=recipe)
+        }
+        to_create: list[models.RecipeStep] = []
+        to_update: list[models.RecipeStep] = []
+        for item in recipe_steps:
+            step = existing.pop(item["step_number"], None)
+            if step is None:
+                to_create.append(
+                    models.RecipeStep(
+                        recipe=recipe,
+                        step_number=item["step_number"],
+                        description=item["description"],
+                    )
+                )
+            elif step.description != item["description"]:
+                step.description = item["description"]
+                to_update.append(step)
+
+        if existing:
+            models.RecipeStep.objects.filter(
+                pk__in=[step.pk for step in existing.values()]
+            ).delete()
+        if to_update:
+            models.RecipeStep.objects.bulk_update(to_update, ["description"])
+        if to_create:
+            models.RecipeStep.objects.bulk_create(to_create)
+
+
+# response shapes of api.aggregates.recipe_totals, used for the schema
+NutritionTotalsSerializer = type(
+    "NutritionTotalsSerializer",
+    (serializers.Serializer,),
+    {name: serializers.FloatField() for name in aggregates.NUTRITION_FIELDS},
+)
+
+
+class RecipeNutritionSerializer(serializers.Serializer[dict[str, Any]]):
+    total = NutritionTotalsSerializer()
+    per_serving = NutritionTotalsSerializer()
+
+
+class RecipeCostSerializer(serializers.Serializer[dict[str, Any]]):
+    total = serializers.FloatField()
+    per_serving = serializers.FloatField()
+    partially_unknown = serializers.BooleanField(
+        help_text="Some ingredients have neither a scraped price nor an estimated cost"
+    )
+
+
+class RecipeTotalsSerializer(serializers.Serializer[dict[str, Any]]):
+    recipe = serializers.IntegerField()
+    servings = serializers.IntegerField()
+    nutrition = RecipeNutritionSerializer()
+    cost = RecipeCostSerializer()
+
+
+class ShoppingListItemSerializer(serializers.Serializer[dict[str, Any]]):
+    """One row of api.aggregates.shopping_list."""
+
+    ingredient = serializers.IntegerField()
+    name = serializers.CharField()
+    unit = serializers.ChoiceField(choices=models.IngredientUnit.choices)
+    needed = serializers.FloatField(
+        help_text="Quantity the meal plan uses, in base units"
+    )
+    on_hand = serializers.FloatField()
+    quantity = serializers.FloatField(help_text="Quantity left to buy")
+    price_per_unit = serializers.FloatField(
+        allow_null=True, help_text="Price of the cheapest source"
+    )
+    cost = serializers.FloatField(allow_null=True)
+    source = serializers.IntegerField(
+        allow_null=True, help_text="Cheapest Source for this ingredient"
+    )
+    source_url = serializers.CharField(allow_null=True)
+
 
 class MealPlanEntrySerializer(serializers.ModelSerializer[models.MealPlanEntry]):
     recipe: serializers.PrimaryKeyRelatedField[models.Recipe] = (  # type: ignore
@@ -150,3 +300,77 @@ class MealPlanEntrySerializer(serializers.ModelSerializer[models.MealPlanEntry])
     class Meta:  # type: ignore
         model = models.MealPlanEntry
         fields = ("id", "recipe", "day", "slot", "servings")
+
+
+class MealPlanOptimizeSerializer(serializers.Serializer[dict[str, Any]]):
+    """Parameters of the meal plan optimizer (api.meal_planner.optimize)."""
+
+    targets = serializers.DictField(
+        child=serializers.FloatField(min_value=0),
+        required=False,
+        default=dict,
+        help_text="Daily targets keyed by nutrient (e.g. kcal_per_unit, protein_grams_per_unit)",
+    )
+    budget = serializers.FloatField(
+        min_value=0,
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="Most the planned meals may cost over the week",
+    )
+    days = serializers.ListField(
+        child=serializers.ChoiceField(choices=models.DayOfWeek.choices),
+        required=False,
+        help_text="Days to plan, the whole week by default",
+    )
+    slots = serializers.ListField(
+        child=serializers.ChoiceField(choices=models.MealSlot.choices),
+        required=False,
+        help_text="Meal slots to fill on each day, all of them by default",
+    )
+    servings = serializers.IntegerField(min_value=1, default=1)
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="Candidate recipe ids, every recipe by default",
+    )
+    max_repeats = serializers.IntegerField(
+        min_value=1, default=2, help_text="Most times one recipe is planned"
+    )
+    replace = serializers.BooleanField(
+        default=True,
+        help_text="Replace the entries in the planned cells, otherwise only fill empty cells",
+    )
+    save = serializers.BooleanField(
+        default=True, help_text="Save the entries, otherwise only return them"
+    )
+    cost_weight = serializers.FloatField(
+        min_value=0,
+        default=meal_planner.COST_WEIGHT,
+        help_text="How much cheaper meals are preferred over closer targets when a budget is set, 0 to only enforce the budget",
+    )
+
+    def validate_targets(self, value: dict[str, float]) -> dict[str, float]:
+        unknown = sorted(set(value) - set(aggregates.NUTRITION_FIELDS))
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown nutrient(s): {', '.join(unknown)}"
+            )
+        return value
+
+
+class MealPlanCellSerializer(serializers.Serializer[dict[str, Any]]):
+    day = serializers.ChoiceField(choices=models.DayOfWeek.choices)
+    slot = serializers.ChoiceField(choices=models.MealSlot.choices)
+
+
+class MealPlanOptimizeResultSerializer(serializers.Serializer[dict[str, Any]]):
+    entries = MealPlanEntrySerializer(many=True)
+    cost = serializers.FloatField(help_text="Cost of every meal on the planned days")
+    daily_totals = serializers.DictField(
+        child=NutritionTotalsSerializer(),
+        help_text="Nutrition of each planned day, keyed by day",
+    )
+    unfilled = MealPlanCellSerializer(
+        many=True, help_text="Cells no recipe fitting the budget was left for"
+    )
@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ingredient_store.models import OnHandIngredient
+
+from . import http_cache, models, rollups, search
+
+
+@receiver(post_save, sender=models.Recipe)
+def recipe_saved(
+    sender: type[models.Recipe], instance: models.Recipe, **kwargs: object
+) -> None:
+    rollups.schedule([instance.pk])  # servings may have changed
+
+
+@receiver(post_save, sender=models.RecipeIngredient)
+@receiver(post_delete, sender=models.RecipeIngredient)
+def recipe_ingredient_changed(
+    sender: type[models.RecipeIngredient],
+    instance: models.RecipeIngredient,
+    **kwargs: object,
+) -> None:
+    rollups.schedule([instance.recipe_id])  # type: ignore[attr-defined]
+
+
+@receiver(post_save, sender=models.NutritionStats)
+@receiver(post_delete, sender=models.NutritionStats)
+def nutrition_stats_changed(
+    sender: type[models.NutritionStats],
+    instance: models.NutritionStats,
+    **kwargs: object,
+) -> None:
+    http_cache.bump(http_cache.NUTRITION_STATS)
+    if instance.ingredient_id is not None:  # type: ignore[attr-defined]
+        rollups.schedule_for_ingredients([instance.ingredient_id])  # type: ignore[attr-defined]
+
+
+@receiver(post_save, sender=models.Ingredient)
+def ingredient_saved(
+    sender: type[models.Ingredient],
+    instance: models.Ingredient,
+    created: bool,
+    **kwargs: object,
+) -> None:
+    http_cache.bump(http_cache.INGREDIENTS)
+    search.index_ingredients([instance])
+    if not created:  # estimated_cost may have changed
+        rollups.schedule_for_ingredients([instance.pk])
+
+
+@receiver(post_delete, sender=models.Ingredient)
+def ingredient_deleted(
+    sender: type[models.Ingredient], instance: models.Ingredient, **kwargs: object
+) -> None:
+    http_cache.bump(http_cache.INGREDIENTS)
+    search.forget_ingredients([instance.pk])
+
+
+@receiver(post_save, sender=OnHandIngredient)
+@receiver(post_delete, sender=OnHandIngredient)
+def on_hand_changed(
+    sender: type[OnHandIngredient], instance: OnHandIngredient, **kwargs: object
+) -> None:
+    http_cache.bump(http_cache.ON_HAND)
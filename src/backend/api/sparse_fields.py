@@ -0,0 +1,75 @@
+"""
+Sparse fieldsets for read endpoints.
+
+    ?fields=id,name,scraper.cached_price   only these fields (dotted paths reach into nested objects)
+    ?expand=nutrition_stats,scraper.sources only these nested objects, every other one is left out
+
+Without either parameter responses are unchanged. Pruning happens on the
+serializer's field tree, so combined with QueryPlanMixin the joins and
+prefetches shrink to what was asked for.
+"""
+
+from typing import Any, Optional
+
+from rest_framework import serializers
+
+FieldTree = dict[str, "FieldTree"]
+
+# always rendered, so clients can tell objects apart whatever they asked for
+ALWAYS_INCLUDED = ("id",)
+
+
+def parse_field_tree(spec: Optional[str]) -> Optional[FieldTree]:
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}. None if the parameter is absent."""
+    if spec is None:
+        return None
+    tree: FieldTree = {}
+    for path in spec.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def prune_fields(
+    serializer: serializers.BaseSerializer[Any],
+    fields: Optional[FieldTree],
+    expand: Optional[FieldTree],
+) -> None:
+    """Drop the readable fields of `serializer` that `fields` / `expand` don't ask for."""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child  # type: ignore[assignment]
+    declared: dict[str, serializers.Field[Any, Any, Any, Any]] = getattr(
+        serializer, "fields", {}
+    )
+    for name, field in list(declared.items()):
+        if field.write_only or name in ALWAYS_INCLUDED:
+            continue
+        nested = isinstance(field, serializers.BaseSerializer)
+        requested = fields is not None and name in fields
+        if fields is not None and not requested:
+            del declared[name]
+        elif nested and expand is not None and name not in expand and not requested:
+            del declared[name]
+        elif nested:
+            prune_fields(
+                field,  # type: ignore[arg-type]
+                (fields or {}).get(name) or None,
+                expand.get(name, {}) if expand is not None else None,
+            )
+
+
+class SparseFieldsMixin:
+    """ViewSet mixin applying `?fields=` / `?expand=` to the serializer of safe (read) requests."""
+
+    def get_serializer(self, *args: Any, **kwargs: Any) -> Any:
+        serializer = super().get_serializer(*args, **kwargs)  # type: ignore[misc]
+        request = getattr(self, "request", None)
+        if request is None or request.method not in ("GET", "HEAD", "OPTIONS"):
+            return serializer
+        fields = parse_field_tree(request.query_params.get("fields"))
+        expand = parse_field_tree(request.query_params.get("expand"))
+        if fields is not None or expand is not None:
+            prune_fields(serializer, fields, expand)
+        return serializer
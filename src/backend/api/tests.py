@@ -1,3 +1,907 @@
-from django.test import TestCase
+import json
+import logging
+import time
+from io import StringIO
+from typing import Any
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from ingredient_store.models import OnHandIngredient
+from scraper import fetching, worker
+from scraper.models import Scraper, Source
+
+from . import (
+    benchmarks,
+    catalog,
+    http_cache,
+    instrumentation,
+    meal_planner,
+    models,
+    rollups,
+    search,
+)
+from .urls import router
+
+
+def make_ingredient(name: str) -> models.Ingredient:
+    ingredient = models.Ingredient.objects.create(name=name, estimated_cost=2.0)
+    models.NutritionStats.objects.create(
+        ingredient=ingredient, kcal_per_unit=1000, protein_grams_per_unit=50
+    )
+    OnHandIngredient.objects.create(ingredient=ingredient, quantity=1)
+    scraper = Scraper.objects.create(ingredient=ingredient)
+    # cached prices keep the Source post_save signal away from the network
+    Source.objects.create(
+        scraper=scraper, url="https://example.com/a", quantity=1, cached_price=3.0
+    )
+    Source.objects.create(
+        scraper=scraper, url="https://example.com/b", quantity=2, cached_price=4.0
+    )
+    return ingredient
+
+
+def make_recipe(name: str, n_ingredients: int) -> models.Recipe:
+    recipe = models.Recipe.objects.create(name=name, servings=2)
+    tag = models.RecipeTag.objects.create(name=f"{name} tag")
+    recipe.tags.add(tag)
+    for i in range(n_ingredients):
+        models.RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=make_ingredient(f"{name} {i}"), quantity=0.1
+        )
+    for i in range(1, 3):
+        models.RecipeStep.objects.create(
+            recipe=recipe, step_number=i, description=f"step {i}"
+        )
+    return recipe
+
+
+class RecipeListQueryCountTests(TestCase):
+    # count, recipes, ingredients_list (+ingredient joins), scraper sources,
+    # ingredients M2M, tags, steps
+    EXPECTED_QUERIES = 7
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def assert_list_query_count(self) -> None:
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_is_constant(self) -> None:
+        make_recipe("small", 1)
+        self.assert_list_query_count()
+
+        for i in range(5):
+            make_recipe(f"big {i}", 6)
+        self.assert_list_query_count()
+
+    def test_nested_payload_is_complete(self) -> None:
+        make_recipe("soup", 2)
+        response = self.client.get("/api/recipes/")
+        recipe = response.json()["results"][0]
+        ingredient = recipe["ingredients_list"][0]["ingredient"]
+        self.assertEqual(len(recipe["steps"]), 2)
+        self.assertEqual(len(recipe["tags"]), 1)
+        self.assertEqual(ingredient["nutrition_stats"]["kcal_per_unit"], 1000)
+        self.assertEqual(ingredient["on_hand"]["quantity"], 1)
+        self.assertEqual(len(ingredient["scraper"]["sources"]), 2)
+
+    def test_ingredient_without_relations(self) -> None:
+        models.Ingredient.objects.create(name="bare")
+        # version stamps, count, ingredients: no scrapers to prefetch sources for
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/ingredients/")
+        ingredient = response.json()["results"][0]
+        self.assertIsNone(ingredient["on_hand"])
+        self.assertIsNone(ingredient["scraper"])
+
+
+class RecipeSaveQueryCountTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.ingredients = [
+            models.Ingredient.objects.create(name=f"ingredient {i}") for i in range(30)
+        ]
+
+    def payload(self, n: int, quantity: float = 0.1) -> dict[str, object]:
+        return {
+            "name": f"recipe with {n}",
+            "recipe_ingredients": [
+                {"ingredient": ingredient.id, "quantity": quantity}
+                for ingredient in self.ingredients[:n]
+            ],
+            "recipe_steps": [
+                {"step_number": i, "description": f"step {i}"} for i in range(1, n + 1)
+            ],
+        }
+
+    def count_queries(self, method: str, url: str, payload: object) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, payload, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries)
+
+    def test_create_round_trips_are_constant(self) -> None:
+        small = self.count_queries("post", "/api/recipes/", self.payload(3))
+        large = self.count_queries("post", "/api/recipes/", self.payload(30))
+        self.assertEqual(small, large)
+
+    def test_update_only_touches_changed_rows(self) -> None:
+        response = self.client.post("/api/recipes/", self.payload(30), format="json")
+        recipe = models.Recipe.objects.get(pk=response.json()["id"])
+        before = set(recipe.ingredients_list.values_list("id", flat=True))
+        step_ids = set(recipe.steps.values_list("id", flat=True))
+
+        payload = self.payload(30)
+        payload["recipe_ingredients"][0]["quantity"] = 2.0  # type: ignore[index]
+        payload["recipe_ingredients"].pop()  # type: ignore[union-attr]
+        small_change = self.count_queries("put", f"/api/recipes/{recipe.id}/", payload)
+
+        self.assertEqual(
+            set(recipe.ingredients_list.values_list("id", flat=True)),
+            before - {max(before)},
+        )
+        self.assertEqual(set(recipe.steps.values_list("id", flat=True)), step_ids)
+        self.assertEqual(
+            recipe.ingredients_list.get(ingredient=self.ingredients[0]).quantity, 2.0
+        )
+
+        every_row_changed = self.count_queries(
+            "put", f"/api/recipes/{recipe.id}/", self.payload(30, quantity=0.5)
+        )
+        self.assertLessEqual(every_row_changed, small_change + 1)  # + one insert
+
+    def test_update_keeps_the_submitted_order(self) -> None:
+        response = self.client.post("/api/recipes/", self.payload(5), format="json")
+        recipe_id = response.json()["id"]
+
+        payload = self.payload(5)
+        payload["recipe_ingredients"].reverse()  # type: ignore[union-attr]
+        self.count_queries("put", f"/api/recipes/{recipe_id}/", payload)
+
+        response = self.client.get(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(
+            [row["ingredient"]["id"] for row in response.json()["ingredients_list"]],
+            [ingredient.id for ingredient in reversed(self.ingredients[:5])],
+        )
+
+    def test_unknown_ingredient_is_reported_on_its_item(self) -> None:
+        payload = self.payload(2)
+        payload["recipe_ingredients"].append({"ingredient": 999999, "quantity": 1})  # type: ignore[union-attr]
+        response = self.client.post("/api/recipes/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {
+                "recipe_ingredients": [
+                    {},
+                    {},
+                    {"ingredient": ['Invalid pk "999999" - object does not exist.']},
+                ]
+            },
+        )
+
+        payload["recipe_ingredients"][2]["ingredient"] = "abc"  # type: ignore[index]
+        response = self.client.post("/api/recipes/", payload, format="json")
+        self.assertEqual(
+            response.json()["recipe_ingredients"][2],
+            {"ingredient": ["Incorrect type. Expected pk value, received str."]},
+        )
+
+
+class RecipeTotalsTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.recipe = models.Recipe.objects.create(name="stew", servings=2)
+        priced = make_ingredient("beef")  # scraper price is 3.0 per unit
+        models.RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=priced, quantity=0.1
+        )
+        unknown = models.Ingredient.objects.create(name="mystery")
+        models.RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=unknown, quantity=0.5
+        )
+
+    def test_nutrition_endpoint(self) -> None:
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/recipes/{self.recipe.id}/nutrition/")
+        self.assertEqual(response.status_code, 200)
+        totals = response.json()
+        self.assertAlmostEqual(totals["nutrition"]["total"]["kcal_per_unit"], 100)
+        self.assertAlmostEqual(
+            totals["nutrition"]["per_serving"]["protein_grams_per_unit"], 2.5
+        )
+        self.assertEqual(totals["nutrition"]["total"]["sodium_milligrams_per_unit"], 0)
+        self.assertAlmostEqual(totals["cost"]["total"], 0.3)
+        self.assertAlmostEqual(totals["cost"]["per_serving"], 0.15)
+        self.assertTrue(totals["cost"]["partially_unknown"])
+
+        self.assertEqual(
+            self.client.get("/api/recipes/999/nutrition/").status_code, 404
+        )
+
+    def test_list_with_totals_costs_one_query(self) -> None:
+        models.Recipe.objects.create(name="empty", servings=0)
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get("/api/recipes/")
+        with CaptureQueriesContext(connection) as with_totals:
+            response = self.client.get("/api/recipes/?with=nutrition,cost")
+        self.assertEqual(len(with_totals), len(plain) + 1)
+
+        stew, empty = response.json()["results"]
+        self.assertAlmostEqual(stew["nutrition"]["total"]["kcal_per_unit"], 100)
+        self.assertAlmostEqual(stew["cost"]["total"], 0.3)
+        self.assertEqual(
+            empty["cost"], {"total": 0, "per_serving": 0, "partially_unknown": False}
+        )
+
+        self.assertNotIn(
+            "cost", self.client.get("/api/recipes/?with=nutrition").json()["results"][0]
+        )
+        self.assertEqual(self.client.get("/api/recipes/?with=price").status_code, 400)
+
+
+class ShoppingListTests(TestCase):
+    def test_merges_scales_and_subtracts_on_hand(self) -> None:
+        recipe = models.Recipe.objects.create(name="stew", servings=2)
+        beef = make_ingredient("beef")  # 1 on hand, scraper price 3.0
+        OnHandIngredient.objects.filter(ingredient=beef).update(quantity=0.05)
+        salt = make_ingredient("salt")  # plenty on hand
+        mystery = models.Ingredient.objects.create(name="mystery")
+        for ingredient, quantity in ((beef, 0.1), (salt, 0.01), (mystery, 0.5)):
+            models.RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, quantity=quantity
+            )
+        models.MealPlanEntry.objects.create(
+            recipe=recipe, day="monday", slot="dinner", servings=4
+        )
+        models.MealPlanEntry.objects.create(
+            recipe=recipe, day="tuesday", slot="lunch", servings=2
+        )
+
+        with self.assertNumQueries(1):
+            response = APIClient().get("/api/meal-plan-entries/shopping-list/")
+
+        beef_row, mystery_row = response.json()
+        self.assertEqual(beef_row["ingredient"], beef.id)
+        self.assertAlmostEqual(beef_row["needed"], 0.3)
+        self.assertAlmostEqual(beef_row["quantity"], 0.25)
+        self.assertAlmostEqual(beef_row["cost"], 0.75)
+        self.assertEqual(beef_row["source_url"], "https://example.com/a")
+        self.assertEqual(mystery_row["unit"], "kg")
+        self.assertAlmostEqual(mystery_row["quantity"], 1.5)
+        self.assertIsNone(mystery_row["cost"])
+
+
+class NutritionRollupTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light = make_recipe(
+                "light", 1
+            )  # 0.1 of a 1000 kcal, 3.0/unit ingredient
+            self.heavy = make_recipe("heavy", 3)
+
+    def rollup(self, recipe: models.Recipe) -> models.RecipeNutritionRollup:
+        return models.RecipeNutritionRollup.objects.get(recipe=recipe)
+
+    def test_kept_current_by_signals(self) -> None:
+        self.assertAlmostEqual(self.rollup(self.light).kcal_per_serving, 50)
+        self.assertAlmostEqual(self.rollup(self.heavy).cost_per_serving, 0.45)
+
+        ingredient = self.light.ingredients_list.get().ingredient
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = ingredient.nutrition_stats
+            stats.kcal_per_unit = 2000
+            stats.save()
+        self.assertAlmostEqual(self.rollup(self.light).kcal_per_serving, 100)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.scraper.cached_price = 10.0
+            ingredient.scraper.save()
+        self.assertAlmostEqual(self.rollup(self.light).cost_per_serving, 0.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light.servings = 1
+            self.light.save()
+            self.light.ingredients_list.all().delete()
+        self.assertEqual(self.rollup(self.light).kcal_per_serving, 0)
+        self.assertEqual(self.rollup(self.heavy).kcal_per_serving, 150)  # untouched
+
+    def test_sort_and_filter_by_rollup(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/recipes/?ordering=-kcal_per_serving&cost_per_serving_max=1"
+            )
+        self.assertNotIn("SUM(", " ".join(q["sql"] for q in queries.captured_queries))
+        self.assertEqual(
+            [recipe["name"] for recipe in response.json()["results"]],
+            ["heavy", "light"],
+        )
+        response = self.client.get("/api/recipes/?kcal_per_serving_min=100")
+        self.assertEqual([r["name"] for r in response.json()["results"]], ["heavy"])
+
+    def test_rebuild_command(self) -> None:
+        models.RecipeNutritionRollup.objects.all().delete()
+        call_command("rebuild_nutrition_rollups", stdout=StringIO())
+        self.assertEqual(models.RecipeNutritionRollup.objects.count(), 2)
+        self.assertAlmostEqual(self.rollup(self.heavy).protein_grams_per_serving, 7.5)
+
+
+class IngredientSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        for name in (
+            "Olive oil",
+            "Extra virgin olive oil",
+            "Sesame oil",
+            "Chicken breast",
+            "Chickpeas",
+            "Egg",
+        ):
+            models.Ingredient.objects.create(name=name)
+
+    def names(self, url: str) -> list[str]:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        rows = body["results"] if isinstance(body, dict) else body
+        return [row["name"] for row in rows]
+
+    def test_ranked_search_endpoint(self) -> None:
+        names = self.names("/api/ingredients/search/?q=olive oil")
+        self.assertEqual(set(names[:2]), {"Olive oil", "Extra virgin olive oil"})
+        self.assertIn("Sesame oil", names)  # shares a term, ranked below
+        self.assertEqual(
+            self.names("/api/ingredients/search/?q=chick&limit=1"), ["Chickpeas"]
+        )
+        self.assertEqual(self.names("/api/ingredients/search/?q=eg"), ["Egg"])
+        self.assertEqual(self.names("/api/ingredients/search/?q="), [])
+
+    def test_list_search_requires_every_term(self) -> None:
+        self.assertEqual(
+            set(self.names("/api/ingredients/?search=oil olive")),
+            {"Olive oil", "Extra virgin olive oil"},
+        )
+        self.assertEqual(
+            self.names("/api/ingredients/?search=breast"), ["Chicken breast"]
+        )
+
+    def test_short_terms_match_anywhere_in_the_name(self) -> None:
+        models.Ingredient.objects.create(name="Large egg")
+        self.assertEqual(
+            self.names("/api/ingredients/search/?q=eg"), ["Egg", "Large egg"]
+        )
+        self.assertEqual(
+            set(self.names("/api/ingredients/?search=eg")), {"Egg", "Large egg"}
+        )
+        self.assertEqual(self.names("/api/ingredients/?search=eg la"), ["Large egg"])
+
+    def test_list_search_returns_every_match(self) -> None:
+        with mock.patch.object(search, "SEARCH_RANKED_LIMIT", 1):
+            body = self.client.get("/api/ingredients/?search=oil").json()
+        self.assertEqual(body["count"], 3)
+        names = [row["name"] for row in body["results"]]
+        self.assertEqual(
+            set(names), {"Olive oil", "Extra virgin olive oil", "Sesame oil"}
+        )
+        # the ranked match first, then the rest by id
+        self.assertEqual(names[1:], ["Extra virgin olive oil", "Sesame oil"])
+
+    def test_index_follows_renames_and_deletes(self) -> None:
+        egg = models.Ingredient.objects.get(name="Egg")
+        egg.name = "Duck egg"
+        egg.save()
+        self.assertEqual(self.names("/api/ingredients/search/?q=duck"), ["Duck egg"])
+        egg.delete()
+        self.assertEqual(self.names("/api/ingredients/search/?q=duck"), [])
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        make_recipe("soup", 3)
+
+    def get(self, url: str, queries: int) -> list[dict[str, object]]:
+        # ingredients, scrapers and on-hand lists also look up their version stamps
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_picker_payload_skips_nested_objects_and_joins(self) -> None:
+        rows = self.get("/api/ingredients/?fields=id,name", queries=3)
+        self.assertEqual(set(rows[0]), {"id", "name"})
+
+    def test_expand_only_renders_requested_relations(self) -> None:
+        rows = self.get("/api/ingredients/?expand=nutrition_stats", queries=3)
+        self.assertEqual(
+            set(rows[0]), {"id", "name", "estimated_cost", "nutrition_stats"}
+        )
+        self.assertEqual(rows[0]["nutrition_stats"]["kcal_per_unit"], 1000)  # type: ignore[index]
+
+        rows = self.get("/api/ingredients/?expand=scraper.sources", queries=4)
+        self.assertEqual(len(rows[0]["scraper"]["sources"]), 2)  # type: ignore[index]
+        self.assertNotIn("cached_source", rows[0]["scraper"])  # type: ignore[operator]
+
+    def test_dotted_fields_reach_into_nested_lists(self) -> None:
+        # count, recipes, ingredients_list: no ingredient, tag or step queries
+        rows = self.get(
+            "/api/recipes/?fields=name,ingredients_list.quantity", queries=3
+        )
+        self.assertEqual(set(rows[0]), {"id", "name", "ingredients_list"})
+        self.assertEqual(
+            set(rows[0]["ingredients_list"][0]),  # type: ignore[index]
+            {"id", "quantity"},
+        )
+
+    def test_other_apps_and_writes(self) -> None:
+        rows = self.get("/api/scrapers/?fields=cached_price", queries=3)
+        self.assertEqual(set(rows[0]), {"id", "cached_price"})
+        rows = self.get("/api/ingredient-store/?fields=quantity", queries=3)
+        self.assertEqual(set(rows[0]), {"id", "quantity"})
+
+        response = self.client.post(
+            "/api/tags/?fields=id", {"name": "quick"}, format="json"
+        )
+        self.assertEqual(response.json()["name"], "quick")  # writes ignore ?fields=
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        for i in range(7):
+            models.Ingredient.objects.create(name=f"ingredient {i}")
+
+    def walk(self, url: str, queries: int) -> list[int]:
+        ids: list[int] = []
+        while url:
+            with self.assertNumQueries(queries):  # no COUNT(*), no OFFSET
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertNotIn("count", body)
+            ids.extend(row["id"] for row in body["results"])
+            url = body["next"]
+        return ids
+
+    def test_cursor_pages_cover_the_collection_once(self) -> None:
+        ids = self.walk("/api/ingredients/?cursor=&limit=3&fields=id", queries=2)
+        self.assertEqual(
+            ids,
+            list(models.Ingredient.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+    def test_cursor_follows_view_ordering(self) -> None:
+        for i in range(3):
+            make_recipe(f"recipe {i}", 0)
+        ids = self.walk(
+            "/api/recipes/?cursor=&limit=2&ordering=-name&fields=id", queries=1
+        )
+        self.assertEqual(
+            ids,
+            list(models.Recipe.objects.order_by("-name").values_list("id", flat=True)),
+        )
+
+    def test_duplicate_values_cross_page_boundaries(self) -> None:
+        for name in ["b", "a", "b", "b", "a", "b"]:
+            make_recipe(name, 0)
+        for ordering in ("name", "-name"):
+            ids = self.walk(
+                f"/api/recipes/?cursor=&limit=2&ordering={ordering}&fields=id",
+                queries=1,
+            )
+            self.assertEqual(
+                ids,
+                list(
+                    models.Recipe.objects.order_by(
+                        ordering, ordering.replace("name", "pk")
+                    ).values_list("id", flat=True)
+                ),
+            )
+
+    def test_nullable_orderings_are_rejected(self) -> None:
+        response = self.client.get("/api/recipes/?cursor=&ordering=cost_per_serving")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", response.json())
+
+    def test_estimated_count(self) -> None:
+        response = self.client.get("/api/ingredients/?cursor=&limit=2&count=estimate")
+        self.assertEqual(response.json()["count"], 7)  # exact outside Postgres
+        response = self.client.get("/api/ingredients/?limit=2&count=estimate")
+        self.assertEqual(response.json()["count"], 7)
+
+    def test_offset_pages_are_unchanged(self) -> None:
+        body = self.client.get("/api/ingredients/?limit=2&offset=6").json()
+        self.assertEqual(body["count"], 7)
+        self.assertEqual(len(body["results"]), 1)
+        self.assertIsNone(body["next"])
+
+
+class HttpCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.ingredient = make_ingredient("flour")
+
+    def test_conditional_get(self) -> None:
+        response = self.client.get("/api/ingredients/")
+        etag = response["ETag"]
+        with self.assertNumQueries(1):  # the version stamps only
+            response = self.client.get("/api/ingredients/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(f"/api/ingredients/{self.ingredient.pk}/")
+        self.assertNotEqual(response["ETag"], etag)  # per request, not per resource
+
+    def test_cached_response_until_a_dependency_changes(self) -> None:
+        first = self.client.get("/api/ingredients/").json()
+        with self.assertNumQueries(1):
+            cached = self.client.get("/api/ingredients/")
+        self.assertEqual(cached.json(), first)
+
+        source = self.ingredient.scraper.sources.first()  # type: ignore[union-attr]
+        source.cached_price = 1.0  # type: ignore[union-attr]
+        source.save()  # type: ignore[union-attr]
+        rows = self.client.get("/api/ingredients/").json()["results"]
+        self.assertEqual(rows[0]["scraper"]["cached_price"], 1.0)
+
+        on_hand = OnHandIngredient.objects.get(ingredient=self.ingredient)
+        on_hand.quantity = 2
+        on_hand.save()
+        rows = self.client.get("/api/ingredients/").json()["results"]
+        self.assertEqual(rows[0]["on_hand"]["quantity"], 2)
+
+    def test_clock_dependent_responses_are_rerendered(self) -> None:
+        def etag_at(path: str, seconds: float) -> str:
+            with mock.patch.object(http_cache.time, "time", return_value=seconds):
+                return self.client.get(path)["ETag"]
+
+        scrapers = "/api/scrapers/"
+        self.assertEqual(etag_at(scrapers, 1200), etag_at(scrapers, 1259))
+        # is_stale may have flipped
+        self.assertNotEqual(etag_at(scrapers, 1259), etag_at(scrapers, 1260))
+        on_hand = "/api/ingredient-store/"
+        self.assertEqual(etag_at(on_hand, 1200), etag_at(on_hand, 1260))
+
+    def test_refresh_only_invalidates_on_changes(self) -> None:
+        prices = {"https://example.com/a": 3.0, "https://example.com/b": 8.0}
+        sources = Source.objects.all()
+        etag = self.client.get("/api/scrapers/")["ETag"]
+        with mock.patch(
+            "scraper.scraping.from_url", side_effect=lambda url: (prices[url], None)
+        ):
+            worker.refresh_sources(sources)
+            self.assertEqual(self.client.get("/api/scrapers/")["ETag"], etag)
+
+            prices["https://example.com/b"] = 4.0
+            worker.refresh_sources(sources)
+        response = self.client.get("/api/scrapers/")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["results"][0]["cached_price"], 2.0)
+
+    def test_rollback_restores_stamps(self) -> None:
+        etag = self.client.get("/api/ingredients/")["ETag"]
+        try:
+            with transaction.atomic():
+                models.Ingredient.objects.create(name="sugar")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.client.get("/api/ingredients/")["ETag"], etag)
+
+    def test_writes_are_not_cached(self) -> None:
+        response = self.client.post(
+            "/api/ingredients/", {"name": "salt"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("ETag", response)
+
+
+class CatalogLoaderTests(TestCase):
+    FIXTURE = """[
+        {"model": "api.ingredient", "pk": 7, "fields": {"name": "Rolled oats"}},
+        {"model": "api.ingredient", "pk": 8, "fields": {"name": "Oat milk"}},
+        {"model": "api.NutritionStats", "pk": 7,
+         "fields": {"ingredient": 7, "base_unit": "kg", "kcal_per_unit": 3790.0}}
+    ]"""
+
+    def load(self, text: str) -> "catalog.LoadSummary":
+        return catalog.load_records(
+            catalog.iter_json_array(StringIO(text), read_size=7), batch_size=1
+        )
+
+    def test_streams_elements(self) -> None:
+        text = '[ {"a": [1, 2, {"b": "x, ]"}]}, 12345, "s" ,null ]'
+        self.assertEqual(
+            list(catalog.iter_json_array(StringIO(text), read_size=3)),
+            [{"a": [1, 2, {"b": "x, ]"}]}, 12345, "s", None],
+        )
+        for broken in ("", "{}", "[1, 2", "[1 2]"):
+            with self.assertRaises(catalog.CatalogError):
+                list(catalog.iter_json_array(StringIO(broken), read_size=2))
+
+    def test_upserts_and_refreshes_derived_data(self) -> None:
+        etag = self.client.get("/api/ingredients/")["ETag"]
+        summary = self.load(self.FIXTURE)
+        self.assertEqual(summary.rows, {"api.ingredient": 2, "api.nutritionstats": 1})
+        self.assertEqual(
+            models.NutritionStats.objects.get(ingredient=7).kcal_per_unit, 3790
+        )
+        self.assertNotEqual(self.client.get("/api/ingredients/")["ETag"], etag)
+        self.assertEqual(
+            {pk for pk, _ in search.ranked_ingredient_ids("oat", match_all=True)},
+            {7, 8},
+        )
+
+        models.Ingredient.objects.filter(pk=7).update(estimated_cost=1.5)
+        self.load(self.FIXTURE.replace("Rolled oats", "Rolled oats, dry"))
+        oats = models.Ingredient.objects.get(pk=7)
+        self.assertEqual(oats.name, "Rolled oats, dry")
+        self.assertEqual(oats.normalized_name, "rolled oats, dry")
+        self.assertEqual(oats.estimated_cost, 1.5)  # not in the catalog, kept
+        self.assertEqual(models.Ingredient.objects.count(), 2)
+
+    def test_rejects_other_models(self) -> None:
+        with self.assertRaises(catalog.CatalogError):
+            self.load('[{"model": "api.recipe", "pk": 1, "fields": {"name": "x"}}]')
+        self.assertFalse(models.Recipe.objects.exists())
+
+    def test_command_reports_throughput(self) -> None:
+        out = StringIO()
+        call_command("load_food_catalog", stdout=out)
+        self.assertEqual(models.Ingredient.objects.count(), 5595)
+        self.assertIn("rows/s", out.getvalue())
+
+
+class MealPlanOptimizerTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.recipes = {
+            kcal: self.make_meal(kcal, cost)
+            for kcal, cost in [(300, 1.0), (500, 2.0), (700, 6.0), (1000, 3.0)]
+        }
+        rollups.rebuild_all()
+
+    def make_meal(self, kcal: float, cost: float) -> models.Recipe:
+        ingredient = models.Ingredient.objects.create(
+            name=f"{kcal} kcal", estimated_cost=cost
+        )
+        models.NutritionStats.objects.create(ingredient=ingredient, kcal_per_unit=kcal)
+        recipe = models.Recipe.objects.create(name=f"{kcal} kcal meal", servings=1)
+        models.RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, quantity=1
+        )
+        return recipe
+
+    def optimize(self, **params: object) -> dict[str, Any]:
+        response = self.client.post(
+            "/api/meal-plan-entries/optimize/", params, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_hits_daily_targets(self) -> None:
+        body = self.optimize(
+            targets={"kcal_per_unit": 2000},
+            days=["monday", "tuesday"],
+            slots=["breakfast", "lunch", "dinner"],
+        )
+        self.assertEqual(len(body["entries"]), 6)
+        self.assertEqual(models.MealPlanEntry.objects.count(), 6)
+        for day in ("monday", "tuesday"):
+            self.assertAlmostEqual(
+                body["daily_totals"][day]["kcal_per_unit"], 2000, delta=300
+            )
+        # max_repeats defaults to 2
+        planned = models.MealPlanEntry.objects.values_list("recipe_id", flat=True)
+        self.assertLessEqual(max(list(planned).count(pk) for pk in planned), 2)
+
+    def test_budget_and_dry_run(self) -> None:
+        body = self.optimize(
+            targets={"kcal_per_unit": 2000},
+            budget=8,
+            days=["monday"],
+            slots=["breakfast", "lunch", "dinner"],
+            save=False,
+        )
+        self.assertLessEqual(body["cost"], 8)
+        self.assertEqual(len(body["entries"]), 3)
+        self.assertIsNone(body["entries"][0]["id"])
+        self.assertFalse(models.MealPlanEntry.objects.exists())
+
+        body = self.optimize(budget=2, days=["monday"], slots=["lunch", "dinner"])
+        self.assertEqual(body["cost"], 2)  # cheapest meal twice
+        self.assertEqual(body["unfilled"], [])
+        body = self.optimize(budget=0.5, days=["monday"], slots=["lunch"])
+        self.assertEqual(body["unfilled"], [{"day": "monday", "slot": "lunch"}])
+
+    def test_cost_weight_trades_targets_for_price(self) -> None:
+        params = dict(
+            targets={"kcal_per_unit": 700},
+            budget=6,
+            days=["monday"],
+            slots=["dinner"],
+            save=False,
+        )
+        body = self.optimize(**params, cost_weight=0)
+        self.assertEqual(body["entries"][0]["recipe"], self.recipes[700].pk)
+        body = self.optimize(**params, cost_weight=1)
+        self.assertEqual(body["entries"][0]["recipe"], self.recipes[500].pk)
+
+    def test_fills_empty_cells_around_kept_entries(self) -> None:
+        models.MealPlanEntry.objects.create(
+            recipe=self.recipes[1000], day="monday", slot="lunch"
+        )
+        body = self.optimize(
+            targets={"kcal_per_unit": 1500},
+            days=["monday"],
+            slots=["lunch", "dinner"],
+            replace=False,
+        )
+        self.assertEqual(
+            [(e["slot"], e["recipe"]) for e in body["entries"]],
+            [("dinner", self.recipes[500].pk)],
+        )
+        self.assertEqual(body["daily_totals"]["monday"]["kcal_per_unit"], 1500)
+        self.assertEqual(models.MealPlanEntry.objects.count(), 2)
+
+    def test_rejects_unknown_nutrients(self) -> None:
+        response = self.client.post(
+            "/api/meal-plan-entries/optimize/",
+            {"targets": {"vitamin_z": 1}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_scales_to_thousands_of_candidates(self) -> None:
+        candidates = meal_planner.Candidates()
+        for i in range(5000):
+            candidates.recipe_ids.append(i)
+            candidates.cost.append(1 + i % 13)
+            for name, column in candidates.nutrients.items():
+                column.append((i * 7919 + len(name)) % 1200)
+        cells = [
+            (day, slot)
+            for day in models.DayOfWeek.values
+            for slot in models.MealSlot.values
+        ]
+        started = time.perf_counter()
+        plan = meal_planner.plan_week(
+            candidates,
+            cells,
+            {
+                "kcal_per_unit": 2200,
+                "protein_grams_per_unit": 90,
+                "sodium_milligrams_per_unit": 2000,
+            },
+            budget=150,
+        )
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(len(plan.meals), 28)
+        self.assertLessEqual(plan.cost, 150)
+
+
+class BenchmarkTests(TestCase):
+    def test_seeds_and_measures_every_endpoint(self) -> None:
+        scale = benchmarks.Scale(
+            ingredients=30,
+            recipes=10,
+            ingredients_per_recipe=3,
+            sources_per_ingredient=1,
+            plan_entries=5,
+            confirmable_recipes=2,
+            page_kb=40,
+            ingredient_lines=200,
+        )
+        results = benchmarks.run(scale, repeat=1)
+        json.dumps(results)  # the report is plain JSON
+        self.assertEqual(results["seeded"]["recipe_ingredients"], 30)
+        self.assertEqual(models.RecipeNutritionRollup.objects.count(), 10)
+
+        names = {row["name"] for row in results["endpoints"]}
+        for prefix, _, _ in router.registry:
+            self.assertIn(f"GET /api/{prefix}/", names)
+        for row in results["endpoints"]:
+            self.assertLess(row["status"], 300, row["name"])
+            self.assertGreater(row["bytes"], 0)
+        stage_one = [
+            row
+            for row in results["recipe_loader"]
+            if row["name"].startswith("stage_one")
+        ]
+        self.assertEqual(len(stage_one), 2)
+        self.assertEqual(stage_one[0]["queries"], 0)
+
+        self.assertEqual(results["ingredient_lines"][0]["lines"], 200)
+        extraction = {row["name"]: row for row in results["json_ld"]}
+        padded = extraction["json_ld product_pages/rice_breadcrumbs_first.html @40KB"]
+        self.assertEqual(padded["blocks"], 3)
+        self.assertGreaterEqual(padded["bytes"], 40 * 1024)
+        self.assertGreater(padded["peak_kb"], 0)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        make_recipe("stew", 2)
+        instrumentation.view_stats.clear()
+
+    def timings(self, response: Any) -> dict[str, str]:
+        return {
+            metric.split(";")[0]: metric
+            for metric in response["Server-Timing"].split(", ")
+        }
+
+    def test_server_timing_header(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/")
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {"db", "serialize", "http", "total"})
+        self.assertIn(f'desc="{len(queries)}"', timings["db"])
+        self.assertIn('desc="1"', timings["serialize"])  # nested serializers count once
+        self.assertIn('desc="0"', timings["http"])
+
+    def test_serializers_are_timed_per_view(self) -> None:
+        # DRF's own classes are left alone
+        data = serializers.Serializer.__dict__["data"]
+        self.assertEqual(data.fget.__module__, "rest_framework.serializers")
+
+        timings = self.timings(
+            self.client.post(
+                "/api/meal-plan-entries/optimize/", {"save": False}, format="json"
+            )
+        )
+        self.assertIn('desc="1"', timings["serialize"])
+
+    def test_unresolved_paths_share_a_bucket(self) -> None:
+        with override_settings(API_DEBUG_STATS=True):
+            for path in ("/wp-login.php", "/.env", "/api/nope/"):
+                self.assertEqual(self.client.get(path).status_code, 404)
+            stats = self.client.get("/api/_debug/stats/").json()
+        self.assertEqual(stats[instrumentation.UNRESOLVED]["requests"], 3)
+        self.assertFalse([view for view in stats if "/" in view])
+
+    def test_request_line_is_logged(self) -> None:
+        logger = logging.getLogger(instrumentation.__name__)
+        self.assertTrue(logger.isEnabledFor(logging.INFO))  # not left to lastResort
+        self.assertTrue(logging.getLogger("api").handlers)
+        with self.assertLogs(logger, "INFO") as logs:
+            self.client.get("/api/recipes/")
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "GET recipe-list")
+        self.assertEqual(record["status"], 200)
+
+    def test_fetches_on_the_pool_count_towards_the_request(self) -> None:
+        def fetch(url: str) -> str:
+            with instrumentation.timed("http"):
+                return url
+
+        timings = instrumentation.RequestTimings()
+        token = instrumentation._current.set(timings)
+        try:
+            urls = [f"https://{host}.example.com/" for host in "abc"]
+            self.assertEqual(fetching.map_concurrently(fetch, urls, str), urls)
+        finally:
+            instrumentation._current.reset(token)
+        self.assertEqual(timings.counts["http"], 3)
+
+    def test_stats_are_opt_in(self) -> None:
+        self.assertEqual(self.client.get("/api/_debug/stats/").status_code, 404)
+
+        with override_settings(API_DEBUG_STATS=True):
+            for _ in range(3):
+                self.client.get("/api/recipes/")
+            stats = self.client.get("/api/_debug/stats/").json()
+            recipes = stats["GET recipe-list"]
+            self.assertEqual(recipes["requests"], 3)
+            self.assertLessEqual(recipes["total_ms"]["p50"], recipes["total_ms"]["max"])
+            self.assertEqual(self.client.delete("/api/_debug/stats/").status_code, 204)
+            self.assertEqual(instrumentation.view_stats.summary(), {})
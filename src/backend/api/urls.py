@@ -1,6 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, MealPlanEntryViewSet
+from .instrumentation import STATS_URL_NAME
+from .views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    MealPlanEntryViewSet,
+    debug_stats,
+)
 from ingredient_store.views import OnHandIngredientViewSet
 from scraper.views import (
     ScraperViewSet,
@@ -8,6 +15,8 @@ from scraper.views import (
     ConfirmableRecipeViewSet,
     ConfirmableRecipeIngredientViewSet,
     ConfirmableRecipeStepViewSet,
+    RecipeImportJobViewSet,
+    ScrapeJobViewSet,
 )
 
 router = DefaultRouter()
@@ -33,6 +42,11 @@ router.register(
     ConfirmableRecipeStepViewSet,
     basename="confirmable-recipe-step",
 )
+router.register(r"scrape-jobs", ScrapeJobViewSet, basename="scrape-job")
+router.register(
+    r"recipe-import-jobs", RecipeImportJobViewSet, basename="recipe-import-job"
+)
 urlpatterns = [
+    path("_debug/stats/", debug_stats, name=STATS_URL_NAME),
     path("", include(router.urls)),
 ]
@@ -1,34 +1,238 @@
+from typing import Any
+
+from django.db.models import F, QuerySet
+from django.http import Http404
 from rest_framework import viewsets
-from rest_framework.filters import SearchFilter
-from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.request import Request
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet, NumberFilter
+from drf_spectacular.utils import OpenApiParameter, extend_schema  # type: ignore
+
+from . import (
+    aggregates,
+    http_cache,
+    instrumentation,
+    meal_planner,
+    models,
+    search,
+    serializers,
+)
+from .http_cache import ConditionalGetMixin
+from .instrumentation import TimedSerializerMixin
+from .query_planning import QueryPlanMixin
+from .sparse_fields import SparseFieldsMixin
 
-from . import models, serializers
+# upper bound on `limit` for ingredient name search
+MAX_SEARCH_RESULTS = 100
 
 
-class IngredientViewSet(viewsets.ModelViewSet[models.Ingredient]):
+class IngredientViewSet(
+    ConditionalGetMixin,
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ModelViewSet[models.Ingredient],
+):
     queryset = models.Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
-    filter_backends = [SearchFilter]
+    cache_resources = (
+        http_cache.INGREDIENTS,
+        http_cache.NUTRITION_STATS,
+        http_cache.ON_HAND,
+        http_cache.SCRAPERS,
+    )
     search_fields = ["name"]
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, search.IndexedSearchFilter]
     filterset_fields = {
         "on_hand": ["isnull"],
     }
 
+    @extend_schema(
+        summary="Ranked fuzzy search over ingredient names",
+        parameters=[
+            OpenApiParameter("q", str, required=True, description="Search text"),
+            OpenApiParameter(
+                "limit",
+                int,
+                description=f"Max results (default 20, max {MAX_SEARCH_RESULTS})",
+            ),
+        ],
+        responses={200: serializers.IngredientSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="search", filter_backends=[])
+    def search_names(self, request: Request) -> Response:
+        """Best matches first. Names containing the text rank above merely similar ones."""
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), MAX_SEARCH_RESULTS)
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer"})
+        ranked = search.ranked_ingredient_ids(
+            request.query_params.get("q", ""), limit=max(limit, 1)
+        )
+        ingredients = search.order_by_rank(
+            self.get_queryset(), [pk for pk, _ in ranked]
+        )
+        return Response(self.get_serializer(ingredients, many=True).data)
+
+
+# per-serving columns of RecipeNutritionRollup that recipes can be sorted and filtered by
+ROLLUP_COLUMNS = ("kcal_per_serving", "protein_grams_per_serving", "cost_per_serving")
+
+
+class RecipeFilter(FilterSet):
+    kcal_per_serving_min = NumberFilter("kcal_per_serving", lookup_expr="gte")
+    kcal_per_serving_max = NumberFilter("kcal_per_serving", lookup_expr="lte")
+    protein_grams_per_serving_min = NumberFilter(
+        "protein_grams_per_serving", lookup_expr="gte"
+    )
+    protein_grams_per_serving_max = NumberFilter(
+        "protein_grams_per_serving", lookup_expr="lte"
+    )
+    cost_per_serving_min = NumberFilter("cost_per_serving", lookup_expr="gte")
+    cost_per_serving_max = NumberFilter("cost_per_serving", lookup_expr="lte")
+
 
-class RecipeViewSet(viewsets.ModelViewSet[models.Recipe]):
+class RecipeViewSet(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ModelViewSet[models.Recipe],
+):
     queryset = models.Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = RecipeFilter
+    ordering_fields = ["id", "name", *ROLLUP_COLUMNS]
 
+    def get_queryset(self) -> "QuerySet[models.Recipe]":
+        # read straight from the indexed rollup columns, no aggregation
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                **{
+                    column: F(f"nutrition_rollup__{column}")
+                    for column in ROLLUP_COLUMNS
+                }
+            )
+        )
 
-class TagViewSet(viewsets.ModelViewSet[models.RecipeTag]):
+    def requested_totals(self) -> list[str]:
+        requested = [
+            value.strip()
+            for value in self.request.query_params.get("with", "").split(",")
+            if value.strip()
+        ]
+        unknown = sorted(set(requested) - set(aggregates.TOTALS))
+        if unknown:
+            raise ValidationError(
+                {
+                    "with": f"Unknown value(s) {unknown}, expected {list(aggregates.TOTALS)}"
+                }
+            )
+        return requested
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "with",
+                str,
+                description="Comma separated totals to add to each recipe: nutrition, cost",
+            )
+        ]
+    )
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        requested = self.requested_totals()
+        response = super().list(request, *args, **kwargs)
+        if requested:
+            recipes = (
+                response.data["results"]
+                if isinstance(response.data, dict)
+                else response.data
+            )
+            totals = aggregates.recipe_totals(recipe["id"] for recipe in recipes)
+            for recipe in recipes:
+                for key in requested:
+                    recipe[key] = totals[recipe["id"]][key]
+        return response
+
+    @extend_schema(
+        summary="Nutrition and cost totals for a recipe, aggregated in SQL",
+        responses={200: serializers.RecipeTotalsSerializer},
+    )
+    @action(detail=True, methods=["get"])
+    def nutrition(self, request: Request, pk: str | None = None) -> Response:
+        """Totals and per-serving values, without loading the nested ingredients."""
+        try:
+            totals = aggregates.recipe_totals([int(pk or "")])
+        except ValueError:
+            raise Http404
+        if not totals:
+            raise Http404
+        return Response(next(iter(totals.values())))
+
+
+class TagViewSet(
+    SparseFieldsMixin, TimedSerializerMixin, viewsets.ModelViewSet[models.RecipeTag]
+):
     queryset = models.RecipeTag.objects.all()
     serializer_class = serializers.TagSerializer
     filter_backends = [SearchFilter]
     search_fields = ["name"]
 
 
-class MealPlanEntryViewSet(viewsets.ModelViewSet[models.MealPlanEntry]):
+class MealPlanEntryViewSet(
+    SparseFieldsMixin, TimedSerializerMixin, viewsets.ModelViewSet[models.MealPlanEntry]
+):
     queryset = models.MealPlanEntry.objects.all()
     serializer_class = serializers.MealPlanEntrySerializer
     http_method_names = ["get", "post", "delete", "head", "options"]
+
+    @extend_schema(
+        summary="What to buy for the meal plan, after subtracting what is on hand",
+        responses={200: serializers.ShoppingListItemSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="shopping-list")
+    def shopping_list(self, request: Request) -> Response:
+        """Ingredients of every planned meal, scaled by servings and merged, minus on-hand stock."""
+        return Response(aggregates.shopping_list())
+
+    @extend_schema(
+        summary="Fill the week's meal plan from nutrient targets and a budget",
+        request=serializers.MealPlanOptimizeSerializer,
+        responses={200: serializers.MealPlanOptimizeResultSerializer},
+    )
+    @action(detail=False, methods=["post"])
+    def optimize(self, request: Request) -> Response:
+        """
+        Greedily pick a recipe for every open day/slot so each day's totals land
+        close to the targets, without going over the budget.
+        """
+        params = serializers.MealPlanOptimizeSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        plan, entries = meal_planner.optimize(**params.validated_data)
+        return Response(
+            {
+                "entries": instrumentation.timed_serializer(
+                    serializers.MealPlanEntrySerializer(entries, many=True)
+                ).data,
+                "cost": plan.cost,
+                "daily_totals": plan.daily_totals,
+                "unfilled": [{"day": day, "slot": slot} for day, slot in plan.unfilled],
+            }
+        )
+
+
+@extend_schema(exclude=True)
+@api_view(["GET", "DELETE"])
+def debug_stats(request: Request) -> Response:
+    """Per-view timing percentiles, only served with API_DEBUG_STATS on. DELETE resets them."""
+    if not instrumentation.stats_enabled():
+        raise Http404
+    if request.method == "DELETE":
+        instrumentation.view_stats.clear()
+        return Response(status=204)
+    return Response(instrumentation.view_stats.summary())
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover every other middleware
+    "api.instrumentation.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -157,7 +159,7 @@ STORAGES: dict[str, Any] = {
 
 # DRF
 REST_FRAMEWORK: dict[str, Any] = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.HybridPagination",
     "PAGE_SIZE": 500,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
@@ -170,9 +172,82 @@ SPECTACULAR_SETTINGS: dict[str, Any] = {
     "TITLE": "Mealmode API",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
+    # the optimizer's day/slot lists reuse the meal plan entry enums
+    "ENUM_NAME_OVERRIDES": {
+        "DayEnum": "api.models.DayOfWeek",
+        "SlotEnum": "api.models.MealSlot",
+    },
     # OTHER SETTINGS
 }
 
+# Caching
+# API responses are cached by api.http_cache, keyed by resource version stamps.
+# Local memory per process by default; CACHE_DIR shares a file cache between
+# processes, REDIS_URL uses Redis (needs the redis package).
+if os.environ.get("REDIS_URL"):
+    CACHES: dict[str, Any] = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+elif os.environ.get("CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# seconds an unused cached API response is kept, stale ones are never served
+API_RESPONSE_CACHE_TIMEOUT = int(os.environ.get("API_RESPONSE_CACHE_TIMEOUT", "600"))
+
+# per-view timing percentiles at /api/_debug/stats/ (Server-Timing headers are always sent)
+API_DEBUG_STATS = os.environ.get("API_DEBUG_STATS", "").lower() in ("1", "true", "yes")
+
+# Logging
+# the app's own loggers (per-request timing lines from api.instrumentation, worker
+# progress) go to stderr; Django's defaults stay as they are
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOGGING: dict[str, Any] = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": LOG_LEVEL},
+        "scraper": {"handlers": ["console"], "level": LOG_LEVEL},
+    },
+}
+# keeps the console handler quiet while tests run
+TEST_RUNNER = "backend.test_runner.QuietLogsRunner"
+
+# Scraping
+# on-disk cache of scraped pages, revalidated with ETag/Last-Modified. Setting it to
+# an empty value disables it
+SCRAPER_HTTP_CACHE_DIR = (
+    os.environ.get("SCRAPER_HTTP_CACHE_DIR", str(BASE_DIR / ".cache" / "http")) or None
+)
+
+# pickled snapshot of the ingredient matching index, an empty value disables it
+INGREDIENT_INDEX_CACHE_PATH = (
+    os.environ.get(
+        "INGREDIENT_INDEX_CACHE_PATH",
+        str(BASE_DIR / ".cache" / "ingredient_index.pickle"),
+    )
+    or None
+)
+
+# NLTK models for ingredient matching, filled by `manage.py prepare_nlp`
+NLTK_DATA_DIR = os.environ.get("NLTK_DATA_DIR", str(BASE_DIR / "nltk_data"))
+
 # CORS
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
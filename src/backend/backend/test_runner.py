@@ -0,0 +1,28 @@
+import logging
+from typing import Any
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QuietLogsRunner(DiscoverRunner):
+    """
+    The default runner with the app's console logging muted: tests make failing
+    scrapes and imports on purpose, and their log lines would bury the results.
+    Records still reach `assertLogs`, which attaches its own handler.
+    """
+
+    def setup_test_environment(self, **kwargs: Any) -> None:
+        super().setup_test_environment(**kwargs)
+        self.muted = {
+            handler: handler.level
+            for name in settings.LOGGING.get("loggers", {})
+            for handler in logging.getLogger(name).handlers
+        }
+        for handler in self.muted:
+            handler.setLevel(logging.CRITICAL + 1)
+
+    def teardown_test_environment(self, **kwargs: Any) -> None:
+        for handler, level in self.muted.items():
+            handler.setLevel(level)
+        super().teardown_test_environment(**kwargs)
@@ -1,8 +1,19 @@
 from rest_framework import viewsets
 
+from api import http_cache
+from api.http_cache import ConditionalGetMixin
+from api.instrumentation import TimedSerializerMixin
+from api.sparse_fields import SparseFieldsMixin
+
 from . import models, serializers
 
 
-class OnHandIngredientViewSet(viewsets.ModelViewSet[models.OnHandIngredient]):
+class OnHandIngredientViewSet(
+    ConditionalGetMixin,
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    viewsets.ModelViewSet[models.OnHandIngredient],
+):
     queryset = models.OnHandIngredient.objects.all()
     serializer_class = serializers.OnHandIngredientSerializer
+    cache_resources = (http_cache.ON_HAND,)
@@ -32,13 +32,41 @@ class SourceAdmin(admin.ModelAdmin[models.Source]):
         "updated_at",
         "cached_price",
         "cached_error",
+        "failure_count",
+        "retry_after",
         "quantity",
         "quantity_unit",
     )
     search_fields = ("url",)
 
 
+@admin.register(models.HostCircuit)
+class HostCircuitAdmin(admin.ModelAdmin[models.HostCircuit]):
+    list_display = ("host", "failure_count", "open_until", "updated_at")
+    search_fields = ("host",)
+
+
 @admin.register(models.Scraper)
 class ScraperAdmin(admin.ModelAdmin[models.Scraper]):
     list_display = ("id", "ingredient", "cached_price", "cached_source", "updated_at")
     search_fields = ("ingredient__name",)
+
+
+@admin.register(models.ScrapeJob)
+class ScrapeJobAdmin(admin.ModelAdmin[models.ScrapeJob]):
+    list_display = ("id", "source", "status", "created_at", "finished_at", "error")
+    list_filter = ("status",)
+
+
+class RecipeImportItemInline(
+    admin.TabularInline[models.RecipeImportItem, models.RecipeImportJob]
+):
+    model = models.RecipeImportItem
+    extra = 0
+
+
+@admin.register(models.RecipeImportJob)
+class RecipeImportJobAdmin(admin.ModelAdmin[models.RecipeImportJob]):
+    inlines = (RecipeImportItemInline,)
+    list_display = ("id", "status", "created_at", "finished_at")
+    list_filter = ("status",)
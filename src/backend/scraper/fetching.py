@@ -0,0 +1,308 @@
+"""
+Outbound HTTP for scraping. Keeps one pooled requests.Session per host
+(keep-alive and compression come for free), and caches response bodies on disk
+so unchanged pages are revalidated with ETag / Last-Modified instead of downloaded again.
+
+Failing hosts are not retried here beyond one short, capped wait on 429/5xx:
+a host that doesn't answer fails after CONNECT_TIMEOUT, and repeated failures
+are backed off by the scrape worker (models.Source.retry_after, models.HostCircuit).
+The disk cache is pruned to HTTP_CACHE_MAX_BYTES and HTTP_CACHE_MAX_AGE as it grows.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from itertools import chain, zip_longest
+from pathlib import Path
+from typing import Any, Callable, Mapping, Optional, Sequence, TypeVar
+from urllib.parse import urlencode, urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# seconds to connect, and to wait for the response
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+# longest Retry-After a 429/503 answer can make a fetch wait
+MAX_RETRY_AFTER = 5
+# disk cache bounds, checked every HTTP_CACHE_PRUNE_EVERY writes per process
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HTTP_CACHE_MAX_AGE = timedelta(days=30)
+HTTP_CACHE_PRUNE_EVERY = 100
+# total concurrent fetches, and concurrent fetches against any one host
+MAX_CONCURRENT_FETCHES = 8
+MAX_CONCURRENT_FETCHES_PER_HOST = 2
+# connections kept alive per host, at least the per-host fetch limit
+POOL_MAXSIZE = 4
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class _CappedRetry(Retry):
+    def get_retry_after(self, response: Any) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+
+def _build_session() -> requests.Session:
+    # connection errors and timeouts fail at once, the worker backs off the source/host
+    retry = _CappedRetry(
+        total=1,
+        connect=0,
+        read=0,
+        status=1,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def session_for(url: str) -> requests.Session:
+    """The shared session for the url's host, created on first use."""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _build_session()
+        return session
+
+
+def _cache_dir() -> Optional[Path]:
+    directory = getattr(settings, "SCRAPER_HTTP_CACHE_DIR", None)
+    return Path(directory) if directory else None
+
+
+def _cache_paths(
+    url: str, params: Optional[Mapping[str, str]]
+) -> Optional[tuple[Path, Path]]:
+    directory = _cache_dir()
+    if directory is None:
+        return None
+    full_url = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+    key = hashlib.sha256(full_url.encode()).hexdigest()
+    return directory / f"{key}.json", directory / f"{key}.body"
+
+
+def _read_cache(paths: tuple[Path, Path]) -> Optional[tuple[dict[str, Any], bytes]]:
+    meta_path, body_path = paths
+    try:
+        return json.loads(meta_path.read_text()), body_path.read_bytes()
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+_writes_since_prune = 0
+_prune_lock = threading.Lock()
+
+
+def prune_cache(
+    directory: Path,
+    max_bytes: int = HTTP_CACHE_MAX_BYTES,
+    max_age: timedelta = HTTP_CACHE_MAX_AGE,
+) -> int:
+    """
+    Delete cached responses last used longer than `max_age` ago, then the least
+    recently used ones until the cache fits in `max_bytes`. Returns how many were deleted.
+    """
+    entries = []
+    for meta_path in directory.glob("*.json"):
+        body_path = meta_path.with_suffix(".body")
+        try:
+            used = meta_path.stat().st_mtime
+            size = meta_path.stat().st_size + body_path.stat().st_size
+        except OSError:
+            continue
+        entries.append((used, size, meta_path, body_path))
+    entries.sort()
+
+    cutoff = time.time() - max_age.total_seconds()
+    total = sum(size for _, size, _, _ in entries)
+    deleted = 0
+    for used, size, meta_path, body_path in entries:
+        if used >= cutoff and total <= max_bytes:
+            break
+        for path in (meta_path, body_path):
+            path.unlink(missing_ok=True)
+        total -= size
+        deleted += 1
+    return deleted
+
+
+def _maybe_prune(directory: Path) -> None:
+    global _writes_since_prune
+    with _prune_lock:
+        _writes_since_prune += 1
+        if _writes_since_prune < HTTP_CACHE_PRUNE_EVERY:
+            return
+        _writes_since_prune = 0
+    try:
+        prune_cache(directory)
+    except OSError as exc:
+        logger.warning("Could not prune the HTTP cache in %s: %s", directory, exc)
+
+
+def _write_cache(paths: tuple[Path, Path], response: requests.Response) -> None:
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return  # nothing to revalidate with, not worth keeping
+    meta_path, body_path = paths
+    try:
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(body_path, response.content)
+        _atomic_write(
+            meta_path,
+            json.dumps(
+                {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "encoding": response.encoding,
+                    "content_type": response.headers.get("Content-Type"),
+                }
+            ).encode(),
+        )
+    except OSError as exc:
+        logger.warning("Could not cache response for %s: %s", response.url, exc)
+        return
+    _maybe_prune(meta_path.parent)
+
+
+def get(
+    url: str,
+    *,
+    headers: Optional[Mapping[str, str]] = None,
+    params: Optional[Mapping[str, str]] = None,
+    cookies: Optional[Mapping[str, str]] = None,
+    timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+) -> requests.Response:
+    """
+    GET through the host's pooled session. If a cached copy exists the request is
+    made conditional, and a 304 answer is turned into a 200 carrying the cached body.
+    Responses served that way have `from_cache = True`.
+    """
+    request_headers = dict(headers or {})
+    paths = _cache_paths(url, params)
+    cached = _read_cache(paths) if paths else None
+    if cached:
+        meta, _ = cached
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    with instrumentation.timed("http"):
+        response = session_for(url).get(
+            url,
+            headers=request_headers,
+            params=params,
+            cookies=cookies,
+            timeout=timeout,
+        )
+    response.from_cache = False  # type: ignore[attr-defined]
+
+    if response.status_code == 304 and cached:
+        meta, body = cached
+        assert paths is not None
+        try:
+            os.utime(paths[0])  # recently used, kept longest by prune_cache
+        except OSError:
+            pass
+        response.status_code = 200
+        response._content = body  # type: ignore[attr-defined]
+        response.encoding = meta.get("encoding")
+        for header, key in (
+            ("ETag", "etag"),
+            ("Last-Modified", "last_modified"),
+            ("Content-Type", "content_type"),
+        ):
+            if meta.get(key) and header not in response.headers:
+                response.headers[header] = meta[key]
+        response.from_cache = True  # type: ignore[attr-defined]
+    elif response.status_code == 200 and paths:
+        _write_cache(paths, response)
+    return response
+
+
+def validator(response: requests.Response) -> Optional[str]:
+    """The ETag (or Last-Modified) that identifies this version of the resource."""
+    return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+
+def map_concurrently(
+    fn: Callable[[T], R],
+    items: Sequence[T],
+    url_of: Callable[[T], str],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> list[R]:
+    """
+    Apply `fn` to every item on a thread pool, bounded overall and per host of
+    `url_of(item)`, and return the results in input order. Items are interleaved
+    by host so one slow site doesn't occupy the whole pool.
+    """
+    if not items:
+        return []
+    by_host: dict[str, list[int]] = defaultdict(list)
+    for position, item in enumerate(items):
+        by_host[urlparse(url_of(item)).netloc].append(position)
+    order = [
+        position
+        for position in chain.from_iterable(zip_longest(*by_host.values()))
+        if position is not None
+    ]
+    host_slots = {
+        host: threading.BoundedSemaphore(MAX_CONCURRENT_FETCHES_PER_HOST)
+        for host in by_host
+    }
+
+    def call(position: int) -> R:
+        with host_slots[urlparse(url_of(items[position])).netloc]:
+            return fn(items[position])
+
+    results: dict[int, R] = {}
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_CONCURRENT_FETCHES, len(items))
+    ) as pool:
+        # each task runs in a copy of the caller's context, so fetches are
+        # timed against the request that started them
+        futures = {
+            pool.submit(contextvars.copy_context().run, call, position): position
+            for position in order
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(items))
+    return [results[position] for position in range(len(items))]
@@ -0,0 +1,129 @@
+"""
+Schema.org JSON-LD from HTML pages, without parsing the page.
+
+Product and recipe pages are routinely 1-3 MB of markup, of which we only want
+the `<script type="application/ld+json">` blocks. `scripts` finds them with a
+regex scan over the raw page (bytes or text) and decodes only their contents,
+so no DOM tree or decoded copy of the whole page is built. Markup the scan can't
+read (say a `>` inside an attribute of the script tag) makes it fall back to
+BeautifulSoup, but only when the page mentions ld+json and the scan found nothing.
+"""
+
+import json
+import re
+from typing import Any, AnyStr, Callable, Iterator, Optional, cast
+
+LD_JSON = "application/ld+json"
+
+_SCRIPT_OPEN = r"<script\b([^>]*)>"
+_SCRIPT_CLOSE = r"</script\s*>"
+_LD_JSON_TYPE = r"""\btype\s*=\s*["']?\s*application/ld\+json\b"""
+# wrappers some CMSs put around the JSON inside the script tag
+_WRAPPER = r"^\s*(?:<!--|//\s*<!\[CDATA\[|<!\[CDATA\[)|(?:-->|//\s*\]\]>|\]\]>)\s*$"
+
+_PATTERNS = {
+    kind: tuple(
+        re.compile(pattern.encode() if kind is bytes else pattern, re.IGNORECASE)
+        for pattern in (_SCRIPT_OPEN, _SCRIPT_CLOSE, _LD_JSON_TYPE)
+    )
+    for kind in (str, bytes)
+}
+_WRAPPER_RE = re.compile(_WRAPPER)
+
+
+def _scan(page: AnyStr) -> Iterator[str]:
+    script_open, script_close, ld_json_type = _PATTERNS[type(page)]
+    position = 0
+    while match := script_open.search(page, position):
+        close = script_close.search(page, match.end())
+        if close is None:
+            return
+        if ld_json_type.search(match.group(1)):
+            body = page[match.end() : close.start()]
+            yield body.decode("utf-8", "replace") if isinstance(body, bytes) else body
+        position = close.end()
+
+
+def _fallback_blocks(page: str | bytes) -> Iterator[str]:
+    from bs4 import BeautifulSoup
+
+    for script in BeautifulSoup(page, "html.parser").find_all("script"):
+        kind = script.get("type")
+        if isinstance(kind, str) and kind.strip().lower().startswith(LD_JSON):
+            yield script.get_text()
+
+
+def scripts(page: str | bytes) -> list[str]:
+    """The text of every ld+json script on the page, in page order."""
+    found = list(_scan(page))
+    if not found:
+        needle: str | bytes = LD_JSON.encode() if isinstance(page, bytes) else LD_JSON
+        if needle in page:
+            found = list(_fallback_blocks(page))
+    return found
+
+
+def decode(text: str) -> Any:
+    """Decode one ld+json script, raising ValueError if it isn't JSON."""
+    # control characters inside strings are common in hand-written JSON-LD
+    return json.loads(_WRAPPER_RE.sub("", text), strict=False)
+
+
+def blocks(page: str | bytes) -> list[Any]:
+    """The decoded JSON of every ld+json script, in page order. Scripts that aren't valid JSON are skipped."""
+    decoded = []
+    for text in scripts(page):
+        try:
+            decoded.append(decode(text))
+        except ValueError:
+            continue
+    return decoded
+
+
+def flatten(data: Any) -> list[dict[str, Any]]:
+    """The objects of one JSON-LD block: the block itself, its `@graph` entries, or the entries of a list."""
+    if isinstance(data, dict):
+        data_dict = cast(dict[str, Any], data)
+        items: list[dict[str, Any]] = [data_dict]
+        graph_items = data_dict.get("@graph")
+        if isinstance(graph_items, list):
+            items.extend(
+                cast(dict[str, Any], item)
+                for item in cast(list[Any], graph_items)
+                if isinstance(item, dict)
+            )
+        return items
+    if isinstance(data, list):
+        return [
+            cast(dict[str, Any], item)
+            for item in cast(list[Any], data)
+            if isinstance(item, dict)
+        ]
+    return []
+
+
+def items(page: str | bytes) -> Iterator[dict[str, Any]]:
+    """Every JSON-LD object on the page, in page order. Scripts are decoded as they are reached."""
+    for text in scripts(page):
+        try:
+            data = decode(text)
+        except ValueError:
+            continue
+        yield from flatten(data)
+
+
+def find(
+    page: str | bytes, predicate: Callable[[dict[str, Any]], bool]
+) -> Optional[dict[str, Any]]:
+    """The first JSON-LD object on the page `predicate` accepts."""
+    return next((item for item in items(page) if predicate(item)), None)
+
+
+def has_type(item: dict[str, Any], schema_type: str) -> bool:
+    """Whether `@type` (a string or a list of them) includes `schema_type`."""
+    declared = item.get("@type")
+    if isinstance(declared, str):
+        return declared == schema_type
+    if isinstance(declared, list):
+        return schema_type in declared
+    return False
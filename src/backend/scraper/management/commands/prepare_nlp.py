@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper import nlp
+
+
+class Command(BaseCommand):
+    help = "Download the NLTK models used for ingredient matching into NLTK_DATA_DIR (run at build time)."
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            fetched = nlp.prepare()
+        except LookupError as exc:
+            raise CommandError(str(exc)) from exc
+        if fetched:
+            self.stdout.write(f"Downloaded {', '.join(fetched)} to {nlp.data_dir()}")
+        else:
+            self.stdout.write(f"NLTK models already present in {nlp.data_dir()}")
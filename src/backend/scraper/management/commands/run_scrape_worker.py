@@ -0,0 +1,44 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from scraper import worker
+
+
+class Command(BaseCommand):
+    help = "Refresh stale Source prices and import queued recipe urls in the background, processing ScrapeJobs and RecipeImportJobs."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Number of jobs to claim per iteration",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep when there is nothing to do",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the current queue once and exit",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size: int = options["batch_size"]
+        while True:
+            worker.enqueue_stale_sources()
+            processed = 0
+            while ran := worker.run_once(batch_size):
+                processed += ran
+            if processed:
+                self.stdout.write(f"Refreshed {processed} source(s)")
+            if imported := worker.run_import_jobs_once():
+                self.stdout.write(f"Ran {imported} recipe import job(s)")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0015_recipeimportjob_recipeimportitem"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HostCircuit",
+            fields=[
+                (
+                    "host",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("failure_count", models.PositiveIntegerField(default=0)),
+                ("open_until", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="failure_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Consecutive failed scrapes"
+            ),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="retry_after",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="While failing, when the source is next worth scraping",
+                null=True,
+            ),
+        ),
+    ]
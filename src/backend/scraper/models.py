@@ -1,16 +1,29 @@
+import logging
+
 from django.db import models
 from scraper import scraping
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 
 from django.utils.translation import gettext_lazy as _
 
 from api.models import IngredientUnit, Ingredient
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Iterable, Optional
 
 if TYPE_CHECKING:
     from api.models import NullableFloatField, Ingredient
 
+logger = logging.getLogger(__name__)
+
+# how long a scraped price is trusted before it is refreshed in the background
+PRICE_TTL = timedelta(hours=1)
+# a failing source is retried after PRICE_TTL, doubling per consecutive failure up to this
+MAX_RETRY_BACKOFF = timedelta(days=1)
+# consecutive failures to reach a host before its circuit opens, and for how long
+CIRCUIT_FAILURES = 5
+CIRCUIT_OPEN_FOR = timedelta(minutes=30)
+
 
 class Scraper(models.Model):
     ingredient: "models.OneToOneField[Optional[Ingredient], Optional[Ingredient]]" = (
@@ -42,31 +55,38 @@ class Scraper(models.Model):
         sources: RelatedManager["Source"]
 
     @property
-    def min_price_per_unit(self):
-        if self.cached_price and datetime.now(
-            timezone.utc
-        ) - self.updated_at <= timedelta(hours=1):
-            return self.cached_price
-        self.update()
+    def is_stale(self) -> bool:
+        return (
+            self.cached_price is None
+            or datetime.now(timezone.utc) - self.updated_at > PRICE_TTL
+        )
+
+    def enqueue_stale_sources(self) -> None:
+        # only the stale ones, a failing source waits out its backoff
+        ScrapeJob.enqueue(src for src in self.sources.all() if src.is_stale)
+
+    @property
+    def min_price_per_unit(self) -> Optional[float]:
+        """Last known cheapest price, never scrapes. Stale sources are queued for the worker."""
+        if self.is_stale:
+            self.enqueue_stale_sources()
         return self.cached_price
 
     @property
     def min_url(self) -> Optional[str]:
-        if self.cached_source and datetime.now(
-            timezone.utc
-        ) - self.updated_at <= timedelta(hours=1):
-            return self.cached_source.url
-        self.update()
+        if self.is_stale:
+            self.enqueue_stale_sources()
         return self.cached_source.url if self.cached_source else None
 
     def update(self):
+        """Pick the cheapest source from the cached source prices (no network I/O)."""
         min_source, min_price = None, None
         for src in self.sources.all():
-            if min_price is None or (
-                src.min_price_per_unit and src.min_price_per_unit < min_price
-            ):
+            # not min_price_per_unit, recomputing must not queue scrapes
+            price = src.cached_price
+            if price is not None and (min_price is None or price < min_price):
                 min_source = src
-                min_price = src.min_price_per_unit
+                min_price = price
         self.cached_source = min_source
         self.cached_price = min_price
         return min_price
@@ -80,10 +100,22 @@ class Source(models.Model):
     updated_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
         auto_now=True
     )
+    # the last price scraped successfully, kept while the source is failing
     cached_price: "NullableFloatField" = models.FloatField(null=True, blank=True)
+    # the error of the last scrape, None once a scrape succeeds
     cached_error: models.CharField[Optional[str], Optional[str]] = models.CharField(
         max_length=200, null=True, blank=True
     )
+    failure_count: models.PositiveIntegerField[int, int] = models.PositiveIntegerField(
+        default=0, help_text=_("Consecutive failed scrapes")
+    )
+    retry_after: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(
+            null=True,
+            blank=True,
+            help_text=_("While failing, when the source is next worth scraping"),
+        )
+    )
     quantity_unit: models.CharField[IngredientUnit, IngredientUnit] = models.CharField(
         max_length=4,
         choices=IngredientUnit.choices,
@@ -99,35 +131,67 @@ class Source(models.Model):
         Scraper, on_delete=models.CASCADE, related_name="sources"
     )
 
-    @property
-    def min_price_per_unit(self):
-        if self.cached_price and datetime.now(
-            timezone.utc
-        ) - self.updated_at <= timedelta(hours=1):
-            return self.cached_price
+    @staticmethod
+    def stale_filter() -> models.Q:
+        """Failing sources past their backoff, and the rest if never scraped or last scraped over PRICE_TTL ago."""
+        now = datetime.now(timezone.utc)
+        return models.Q(retry_after__lte=now) | models.Q(retry_after__isnull=True) & (
+            models.Q(cached_price__isnull=True, cached_error__isnull=True)
+            | models.Q(updated_at__lt=now - PRICE_TTL)
+        )
 
-        new_price, error = scraping.from_url(self.url)
+    @property
+    def is_stale(self) -> bool:
         now = datetime.now(timezone.utc)
+        if self.retry_after is not None:
+            return now >= self.retry_after
+        if self.cached_price is None and self.cached_error is None:
+            return True
+        return now - self.updated_at > PRICE_TTL
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc
+
+    @property
+    def min_price_per_unit(self) -> Optional[float]:
+        """Last scraped price per unit, never scrapes. Stale sources are queued for the worker."""
+        if self.is_stale:
+            ScrapeJob.enqueue([self])
+        return self.cached_price
+
+    def scrape(self) -> scraping.ScrapingReturn:
+        """Fetch the current price from the url. This does network I/O, keep it off request paths."""
+        try:
+            return scraping.from_url(self.url)
+        except Exception as exc:  # a broken page must not take the worker down
+            return (None, f"Unexpected error: {exc}")
+
+    def apply_scrape_result(
+        self, result: scraping.ScrapingReturn, now: datetime
+    ) -> None:
+        """Store a scrape result on this instance without saving it."""
+        new_price, error = result
+        if error is None and new_price is None:
+            # counted as a failure so the backoff applies
+            error = "Scraping returned no price and no error"
         if error:
-            self.cached_error = error
-            self.cached_price = None
-            self.updated_at = now
-            Source.objects.filter(pk=self.pk).update(
-                cached_error=error, cached_price=None, updated_at=now
+            # cached_price stays as the last known good price
+            self.cached_error = error[:200]  # fits cached_error
+            self.failure_count += 1
+            # the exponent is capped so long-dead sources can't overflow timedelta
+            self.retry_after = now + min(
+                PRICE_TTL * 2 ** min(self.failure_count - 1, 16), MAX_RETRY_BACKOFF
             )
-            print(f"Error scraping {self.url}: {error}")
-        elif new_price is not None:
+            self.updated_at = now
+            logger.warning("Error scraping %s: %s", self.url, error)
+        else:
+            assert new_price is not None
             self.cached_price = new_price / self.quantity
             self.cached_error = None
+            self.failure_count = 0
+            self.retry_after = None
             self.updated_at = now
-            Source.objects.filter(pk=self.pk).update(
-                cached_price=self.cached_price, cached_error=None, updated_at=now
-            )
-        else:
-            print(
-                f"Scraping {self.url} had no error and no price, this should never happen"
-            )
-        return self.cached_price
 
     def __str__(self) -> str:
         detail = (
@@ -138,6 +202,127 @@ class Source(models.Model):
         return f"Source for {self.scraper.ingredient.name if self.scraper and self.scraper.ingredient else 'No Ingredient'} [{detail}] ({self.url})"
 
 
+class HostCircuit(models.Model):
+    """
+    Circuit breaker for a retailer host, shared by every worker. After
+    CIRCUIT_FAILURES scrapes in a row fail to reach the host, none of its sources
+    are scraped until `open_until`. Then one source is tried: reaching the host
+    closes the circuit, another failure opens it again.
+    """
+
+    host: models.CharField[str, str] = models.CharField(
+        max_length=255, primary_key=True
+    )
+    failure_count: models.PositiveIntegerField[int, int] = models.PositiveIntegerField(
+        default=0
+    )
+    open_until: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(null=True, blank=True)
+    )
+    updated_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
+        auto_now=True
+    )
+
+    @classmethod
+    def tripped(cls, hosts: Iterable[str]) -> dict[str, "HostCircuit"]:
+        """The circuits of `hosts` that are open or waiting for their trial scrape."""
+        return {
+            circuit.host: circuit
+            for circuit in cls.objects.filter(
+                host__in=set(hosts), failure_count__gte=CIRCUIT_FAILURES
+            )
+        }
+
+    def is_open(self, now: datetime) -> bool:
+        return self.open_until is not None and now < self.open_until
+
+    @classmethod
+    def record(
+        cls, reached: Iterable[str], failures: dict[str, int], now: datetime
+    ) -> None:
+        """Close the circuits of the `reached` hosts, count `failures` (host -> failed scrapes) against the rest."""
+        reached = set(reached)
+        cls.objects.filter(host__in=reached, failure_count__gt=0).update(
+            failure_count=0, open_until=None
+        )
+        failures = {
+            host: count for host, count in failures.items() if host not in reached
+        }
+        if not failures:
+            return
+        cls.objects.bulk_create(
+            [cls(host=host) for host in failures], ignore_conflicts=True
+        )
+        for host, count in failures.items():
+            # F() so concurrent workers don't lose each other's counts
+            cls.objects.filter(host=host).update(
+                failure_count=models.F("failure_count") + count
+            )
+        cls.objects.filter(
+            host__in=failures, failure_count__gte=CIRCUIT_FAILURES
+        ).update(open_until=now + CIRCUIT_OPEN_FOR)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.host} ({self.failure_count} failures, open until {self.open_until})"
+        )
+
+
+class ScrapeJobStatus(models.TextChoices):
+    PENDING = "pending", _("Pending")
+    RUNNING = "running", _("Running")
+    DONE = "done", _("Done")
+    FAILED = "failed", _("Failed")
+
+
+class ScrapeJob(models.Model):
+    """A queued price refresh for one Source, picked up by `manage.py run_scrape_worker`."""
+
+    ACTIVE_STATUSES = (ScrapeJobStatus.PENDING, ScrapeJobStatus.RUNNING)
+
+    source: models.ForeignKey[Source, Source] = models.ForeignKey(
+        Source, on_delete=models.CASCADE, related_name="scrape_jobs"
+    )
+    status: models.CharField[ScrapeJobStatus, ScrapeJobStatus] = models.CharField(
+        max_length=10,
+        choices=ScrapeJobStatus.choices,
+        default=ScrapeJobStatus.PENDING,
+    )
+    created_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
+        auto_now_add=True
+    )
+    started_at: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(null=True, blank=True)
+    )
+    finished_at: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(null=True, blank=True)
+    )
+    error: models.CharField[Optional[str], Optional[str]] = models.CharField(
+        max_length=200, null=True, blank=True
+    )
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+        constraints = [
+            # at most one queued/running job per source, so enqueueing is idempotent
+            models.UniqueConstraint(
+                fields=["source"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="unique_active_scrape_job_per_source",
+            )
+        ]
+
+    @classmethod
+    def enqueue(cls, sources: "Iterable[Source]") -> None:
+        jobs = [cls(source=src) for src in sources]
+        if jobs:
+            cls.objects.bulk_create(jobs, ignore_conflicts=True)
+
+    def __str__(self) -> str:
+        return f"ScrapeJob {self.pk} [{self.status}] for source {self.source_id}"  # type: ignore[attr-defined]
+
+
 # ConfirmableRecipe stuff is for recipes that need to be confirmed by the user before being added to the actual Recipe model
 # because we might be wrong in matching certain details
 
@@ -196,3 +381,59 @@ class ConfirmableRecipe(models.Model):
 
         ingredients_list: RelatedManager[ConfirmableRecipeIngredient]
         steps_list: RelatedManager[ConfirmableRecipeStep]
+
+
+class RecipeImportJob(models.Model):
+    """A batch of recipe URLs to import as ConfirmableRecipes, processed by `manage.py run_scrape_worker`."""
+
+    status: models.CharField[ScrapeJobStatus, ScrapeJobStatus] = models.CharField(
+        max_length=10,
+        choices=ScrapeJobStatus.choices,
+        default=ScrapeJobStatus.PENDING,
+    )
+    created_at: models.DateTimeField[datetime, datetime] = models.DateTimeField(
+        auto_now_add=True
+    )
+    started_at: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(null=True, blank=True)
+    )
+    finished_at: models.DateTimeField[Optional[datetime], Optional[datetime]] = (
+        models.DateTimeField(null=True, blank=True)
+    )
+
+    if TYPE_CHECKING:
+        from django_stubs_ext.db.models.manager import RelatedManager
+
+        items: RelatedManager["RecipeImportItem"]
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self) -> str:
+        return f"RecipeImportJob {self.pk} [{self.status}]"
+
+
+class RecipeImportItem(models.Model):
+    """One URL of a RecipeImportJob and the outcome of importing it."""
+
+    job: models.ForeignKey[RecipeImportJob, RecipeImportJob] = models.ForeignKey(
+        RecipeImportJob, on_delete=models.CASCADE, related_name="items"
+    )
+    url: models.URLField[str, str] = models.URLField(max_length=500)
+    status: models.CharField[ScrapeJobStatus, ScrapeJobStatus] = models.CharField(
+        max_length=10,
+        choices=ScrapeJobStatus.choices,
+        default=ScrapeJobStatus.PENDING,
+    )
+    error: models.CharField[Optional[str], Optional[str]] = models.CharField(
+        max_length=200, null=True, blank=True
+    )
+    confirmable_recipe: models.ForeignKey[
+        Optional[ConfirmableRecipe], Optional[ConfirmableRecipe]
+    ] = models.ForeignKey(
+        ConfirmableRecipe, on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    class Meta:
+        ordering = ["id"]
@@ -0,0 +1,91 @@
+"""
+Lazy access to the NLTK models used for ingredient matching.
+
+Nothing here imports nltk until a tokenizer or tagger is first used, so workers,
+management commands and tests that never match ingredients don't pay for it.
+Models are read from NLTK_DATA_DIR, which `manage.py prepare_nlp` fills at build time.
+"""
+
+import threading
+from pathlib import Path
+from types import ModuleType
+from typing import Optional
+
+from django.conf import settings
+
+# nltk package name -> resource path checked by nltk.data.find
+REQUIRED_RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+}
+
+_nltk: Optional[ModuleType] = None
+_lock = threading.Lock()
+
+
+def data_dir() -> Path:
+    return Path(settings.NLTK_DATA_DIR)
+
+
+def missing_resources() -> list[str]:
+    import nltk  # type: ignore
+
+    return [
+        package
+        for package, resource in REQUIRED_RESOURCES.items()
+        if not _has_resource(nltk, resource)
+    ]
+
+
+def _has_resource(nltk: ModuleType, resource: str) -> bool:
+    try:
+        nltk.data.find(resource)
+        return True
+    except LookupError:
+        return False
+
+
+def prepare() -> list[str]:
+    """Download any missing models into NLTK_DATA_DIR. Returns the packages that were fetched."""
+    import nltk  # type: ignore
+
+    directory = str(data_dir())
+    if directory not in nltk.data.path:
+        nltk.data.path.insert(0, directory)
+    missing = missing_resources()
+    for package in missing:
+        if not nltk.download(package, download_dir=directory, quiet=True):
+            raise LookupError(f"Could not download NLTK resource {package!r}")
+    return missing
+
+
+def _load() -> ModuleType:
+    global _nltk
+    if _nltk is not None:
+        return _nltk
+    with _lock:
+        if _nltk is None:
+            import nltk  # type: ignore
+
+            directory = str(data_dir())
+            if directory not in nltk.data.path:
+                nltk.data.path.insert(0, directory)
+            missing = missing_resources()
+            if missing:
+                # keeps local dev working, images should have run prepare_nlp already
+                print(
+                    f"NLTK resources {missing} not found, downloading to {directory}. "
+                    "Run `manage.py prepare_nlp` at build time to avoid this."
+                )
+                for package in missing:
+                    nltk.download(package, download_dir=directory, quiet=True)
+            _nltk = nltk
+    return _nltk
+
+
+def word_tokenize(text: str) -> list[str]:
+    return _load().word_tokenize(text)  # type: ignore
+
+
+def pos_tag(tokens: list[str]) -> list[tuple[str, str]]:
+    return _load().pos_tag(tokens)  # type: ignore
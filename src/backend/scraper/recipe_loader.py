@@ -1,19 +1,24 @@
 from __future__ import annotations
-from scraper import models
-from bs4 import BeautifulSoup
-import requests
+from scraper import fetching, json_ld, models, nlp
+from array import array
 from dataclasses import dataclass
-import json
+import hashlib
+import logging
+import os
+import pickle
 import re
-from typing import Any, Optional, cast
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Optional, cast
 from api import models as api_models
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Value
 from enum import Enum
-import nltk  # type: ignore
-from nltk import pos_tag, tokenize  # type: ignore
 
-nltk.download("punkt_tab")  # type: ignore
-nltk.download("averaged_perceptron_tagger_eng")  # type: ignore
+logger = logging.getLogger(__name__)
 
 
 class StageOne:
@@ -33,35 +38,9 @@ class StageOne:
         cook_time_minutes: Optional[int]
         description: Optional[str]
 
-    @staticmethod
-    def iter_json_ld_items(data: Any) -> list[dict[str, Any]]:
-        if isinstance(data, dict):
-            data_dict = cast(dict[str, Any], data)
-            items: list[dict[str, Any]] = [data_dict]
-            graph_items = data_dict.get("@graph")
-            if isinstance(graph_items, list):
-                for item in cast(list[Any], graph_items):
-                    if isinstance(item, dict):
-                        items.append(cast(dict[str, Any], item))
-            return items
-
-        if isinstance(data, list):
-            items: list[dict[str, Any]] = []
-            for item in cast(list[Any], data):
-                if isinstance(item, dict):
-                    items.append(cast(dict[str, Any], item))
-            return items
-
-        return []
-
     @staticmethod
     def is_recipe_schema(item: dict[str, Any]) -> bool:
-        schema_type = item.get("@type")
-        if isinstance(schema_type, str):
-            return schema_type == "Recipe"
-        if isinstance(schema_type, list):
-            return "Recipe" in schema_type
-        return False
+        return json_ld.has_type(item, "Recipe")
 
     @staticmethod
     def duration_to_minutes(duration_str: str) -> int:
@@ -147,29 +126,20 @@ class StageOne:
         except (ValueError, AttributeError):
             return None
 
+    HEADERS: ClassVar[dict[str, str]] = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
+    }
+
     @staticmethod
     def load_recipe_stage_one(url: str) -> RecipeLoadingStageOneResult:
         # Step 1: Scan the site for a recipe schema, and if found, extract recipe information from it.
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Look for a script tag with type "application/ld+json"
-        recipe_data = None
-        for script in soup.find_all("script", type="application/ld+json"):
-            try:
-                data = json.loads(script.get_text() or "")
-                for item in StageOne.iter_json_ld_items(data):
-                    if StageOne.is_recipe_schema(item):
-                        recipe_data = item
-                        break
+        response = fetching.get(url, headers=StageOne.HEADERS)
+        return StageOne.parse_recipe_page(response.content)
 
-                if recipe_data:
-                    break
-            except json.JSONDecodeError:
-                continue
+    @staticmethod
+    def parse_recipe_page(content: bytes | str) -> RecipeLoadingStageOneResult:
+        """Extract the recipe from a fetched page (or a recorded one)."""
+        recipe_data = json_ld.find(content, StageOne.is_recipe_schema)
 
         if not recipe_data:
             return StageOne.RecipeLoadingStageOneResult(
@@ -205,10 +175,93 @@ class StageOne:
         )
 
 
+class IngredientIndex:
+    """Inverted index from token to the ingredients whose name contains it.
+
+    Each ingredient is stored as a set of tokens, so scoring a source line is a
+    sparse dot product between the line's token weights and the postings of its
+    tokens, touching only the ingredients that share at least one token with it.
+    """
+
+    def __init__(self) -> None:
+        self.postings: dict[str, array[int]] = {}
+        # precomputed (token, weight) pairs per ingredient, their count is the precision denominator
+        self.ingredient_weights: dict[int, list[tuple[str, float]]] = {}
+
+    def __contains__(self, ingredient_id: int) -> bool:
+        return ingredient_id in self.ingredient_weights
+
+    def __len__(self) -> int:
+        return len(self.ingredient_weights)
+
+    def add(self, ingredient_id: int, weighted_tokens: list[tuple[str, float]]) -> None:
+        if ingredient_id in self.ingredient_weights:
+            self.remove(ingredient_id)
+        self.ingredient_weights[ingredient_id] = weighted_tokens
+        for token in {token for token, _ in weighted_tokens}:
+            self.postings.setdefault(token, array("q")).append(ingredient_id)
+
+    def remove(self, ingredient_id: int) -> None:
+        weighted_tokens = self.ingredient_weights.pop(ingredient_id, None)
+        if weighted_tokens is None:
+            return
+        for token in {token for token, _ in weighted_tokens}:
+            posting = self.postings[token]
+            posting.remove(ingredient_id)
+            if not posting:
+                del self.postings[token]
+
+    def scores(
+        self,
+        source_token_weights: list[tuple[str, float]],
+        restrict_to: Optional[set[int]] = None,
+    ) -> dict[int, float]:
+        """F1 of weighted token overlap for every ingredient sharing a token with the source."""
+        if not source_token_weights:
+            return {}
+
+        overlap: dict[int, float] = {}
+        for token, weight in source_token_weights:
+            for ingredient_id in self.postings.get(token, ()):
+                overlap[ingredient_id] = overlap.get(ingredient_id, 0.0) + weight
+
+        n_source = len(source_token_weights)
+        scores: dict[int, float] = {}
+        for ingredient_id, weighted_overlap_count in overlap.items():
+            if restrict_to is not None and ingredient_id not in restrict_to:
+                continue
+            precision = weighted_overlap_count / len(
+                self.ingredient_weights[ingredient_id]
+            )
+            recall = weighted_overlap_count / n_source
+            denominator = precision + recall
+            base_f1 = (2 * precision * recall / denominator) if denominator > 0 else 0.0
+            scores[ingredient_id] = max(0.0, min(1.0, base_f1))
+        return scores
+
+
 class IngredientMatcher:
+    """Matches ingredient lines against the catalog.
+
+    `IngredientMatcher.shared()` is the process-wide instance: its index is built once,
+    snapshotted to INGREDIENT_INDEX_CACHE_PATH keyed by a hash of the catalog, and kept
+    current by the Ingredient post_save/post_delete signals, so imports never re-tag
+    the whole catalog.
+    """
+
+    # bump when the pickled snapshot layout or the token weighting changes
+    SNAPSHOT_FORMAT = 1
+    # shared-cache key counting catalog edits, lets other processes notice them
+    VERSION_CACHE_KEY = "ingredient-index-version"
+
+    _shared: ClassVar[Optional[IngredientMatcher]] = None
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+
     def __init__(self) -> None:
-        self.cache_healthy = False
-        self.cached_ingredient_weights: dict[int, list[tuple[str, float]]] = {}
+        self.index = IngredientIndex()
+        # id -> name of every indexed ingredient, diffed against the catalog on sync
+        self.names: dict[int, str] = {}
+        self.synced_version: Optional[int] = None
 
     STOP_WORDS = {
         "a",
@@ -231,7 +284,7 @@ class IngredientMatcher:
 
     @staticmethod
     def tokenize(text: str) -> list[str]:
-        tokens = tokenize.word_tokenize(text.lower())  # type: ignore
+        tokens = nlp.word_tokenize(text.lower())
         return [token for token in tokens if re.match(r"[a-z0-9]+", token)]
 
     @staticmethod
@@ -240,7 +293,7 @@ class IngredientMatcher:
 
     @staticmethod
     def weigh_tokens(tokens: list[str]) -> list[tuple[str, float]]:
-        tagged_tokens: list[tuple[str, str]] = pos_tag(tokens)  # type: ignore
+        tagged_tokens = nlp.pos_tag(tokens)
         weighted_tokens: list[tuple[str, float]] = []
         for token, tag in tagged_tokens:
             if tag.startswith("NN"):  # Nouns
@@ -254,64 +307,212 @@ class IngredientMatcher:
             weighted_tokens.append((token, weight))
         return weighted_tokens
 
-    def score_match(
-        self, source_token_weights: list[tuple[str, float]], ingredient_id: int
-    ) -> float:
-        if ingredient_id not in self.cached_ingredient_weights:
-            return 0.0
-
-        ingredient_token_weights = self.cached_ingredient_weights[ingredient_id]
-        weighted_overlap_count = sum(
-            weight
-            for token, weight in source_token_weights
-            if any(token == ing_token for ing_token, _ in ingredient_token_weights)
+    @staticmethod
+    def weigh_text(text: str) -> list[tuple[str, float]]:
+        return IngredientMatcher.weigh_tokens(
+            IngredientMatcher.tokens_without_stopwords(IngredientMatcher.tokenize(text))
         )
-        if weighted_overlap_count == 0:
-            return 0.0
 
-        precision = weighted_overlap_count / len(ingredient_token_weights)
-        recall = weighted_overlap_count / len(source_token_weights)
-        denominator = precision + recall
-        base_f1 = (2 * precision * recall / denominator) if denominator > 0 else 0.0
+    def populate_cache(self, ingredients: list[models.Ingredient]) -> None:
+        for ingredient in ingredients:
+            self.index_ingredient(ingredient.id, ingredient.name)
+
+    def index_ingredient(self, ingredient_id: int, name: str) -> None:
+        if self.names.get(ingredient_id) == name and ingredient_id in self.index:
+            return
+        self.index.add(ingredient_id, IngredientMatcher.weigh_text(name))
+        self.names[ingredient_id] = name
+
+    def forget_ingredient(self, ingredient_id: int) -> None:
+        self.index.remove(ingredient_id)
+        self.names.pop(ingredient_id, None)
+
+    def sync(self, catalog: dict[int, str]) -> bool:
+        """Bring the index in line with `catalog` (id -> name), re-tagging only what changed."""
+        changed = False
+        for ingredient_id in set(self.names) - set(catalog):
+            self.forget_ingredient(ingredient_id)
+            changed = True
+        for ingredient_id, name in catalog.items():
+            if self.names.get(ingredient_id) != name:
+                self.index_ingredient(ingredient_id, name)
+                changed = True
+        return changed
 
-        score = base_f1
-        return max(0.0, min(1.0, score))
+    @staticmethod
+    def content_hash(catalog: dict[int, str]) -> str:
+        digest = hashlib.sha256()
+        for ingredient_id, name in sorted(catalog.items()):
+            digest.update(f"{ingredient_id}\x00{name}\x00".encode())
+        return digest.hexdigest()
 
-    def populate_cache(self, ingredients: list[models.Ingredient]) -> None:
-        self.cached_ingredient_weights = {
-            ingredient.id: IngredientMatcher.weigh_tokens(
-                IngredientMatcher.tokens_without_stopwords(
-                    IngredientMatcher.tokenize(ingredient.name)
+    @staticmethod
+    def snapshot_path() -> Optional[Path]:
+        path = getattr(settings, "INGREDIENT_INDEX_CACHE_PATH", None)
+        return Path(path) if path else None
+
+    @classmethod
+    def load_snapshot(cls) -> Optional[IngredientMatcher]:
+        path = cls.snapshot_path()
+        if path is None:
+            return None
+        try:
+            with path.open("rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if snapshot.get("format") != cls.SNAPSHOT_FORMAT:
+            return None
+        matcher = cls()
+        matcher.index = snapshot["index"]
+        matcher.names = snapshot["names"]
+        return matcher
+
+    def save_snapshot(self, content_hash: str) -> None:
+        path = self.snapshot_path()
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp.open("wb") as f:
+                pickle.dump(
+                    {
+                        "format": self.SNAPSHOT_FORMAT,
+                        "content_hash": content_hash,
+                        "index": self.index,
+                        "names": self.names,
+                    },
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
                 )
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning(
+                "Could not save ingredient index snapshot to %s: %s", path, exc
+            )
+
+    @classmethod
+    def catalog_version(cls) -> int:
+        return cache.get(cls.VERSION_CACHE_KEY, 0)
+
+    @classmethod
+    def bump_catalog_version(cls) -> int:
+        cache.add(cls.VERSION_CACHE_KEY, 0, timeout=None)
+        try:
+            return cache.incr(cls.VERSION_CACHE_KEY)
+        except ValueError:  # evicted between add and incr
+            cache.set(cls.VERSION_CACHE_KEY, 1, timeout=None)
+            return 1
+
+    def refresh_from_catalog(self) -> None:
+        """Diff against the database and persist a new snapshot if anything changed."""
+        version = self.catalog_version()
+        catalog: dict[int, str] = dict(
+            models.Ingredient.objects.values_list("id", "name")
+        )
+        if self.sync(catalog):
+            self.save_snapshot(self.content_hash(catalog))
+        self.synced_version = version
+
+    @classmethod
+    def shared(cls) -> IngredientMatcher:
+        """The process-wide matcher, loaded from the on-disk snapshot and synced with the catalog."""
+        with cls._shared_lock:
+            matcher = cls._shared
+            if matcher is None:
+                matcher = cls.load_snapshot() or cls()
+                matcher.refresh_from_catalog()
+                cls._shared = matcher
+            elif matcher.synced_version != cls.catalog_version():
+                # another process changed the catalog
+                matcher.refresh_from_catalog()
+            return matcher
+
+    @classmethod
+    def ingredient_saved(cls, ingredient: models.Ingredient) -> None:
+        cls._catalog_changed(
+            lambda m: m.index_ingredient(ingredient.id, ingredient.name)
+        )
+
+    @classmethod
+    def ingredient_deleted(cls, ingredient_id: int) -> None:
+        cls._catalog_changed(lambda m: m.forget_ingredient(ingredient_id))
+
+    @classmethod
+    def _catalog_changed(cls, apply: Callable[[IngredientMatcher], None]) -> None:
+        with cls._shared_lock:
+            matcher = cls._shared
+            up_to_date = (
+                matcher is not None and matcher.synced_version == cls.catalog_version()
             )
-            for ingredient in ingredients
-        }
-        self.cache_healthy = True
+            version = cls.bump_catalog_version()
+            if matcher is not None:
+                apply(matcher)
+                if up_to_date:
+                    matcher.synced_version = version
+
+    def candidate_ids(self, terms: list[str]) -> Optional[set[int]]:
+        """Ingredients whose name contains every term, None when no ingredient does (so score everything)."""
+        candidates: Optional[set[int]] = None
+        for term in terms:
+            posting = set(self.index.postings.get(term, ()))
+            candidates = posting if candidates is None else candidates & posting
+            if not candidates:
+                return None
+        return candidates
+
+    def rank(
+        self, source_text: str, restrict_to: Optional[set[int]] = None
+    ) -> list[tuple[int, float]]:
+        """(ingredient id, score) pairs with a positive score, best first. Ties go to the lowest id."""
+        scores = self.index.scores(
+            IngredientMatcher.weigh_text(source_text), restrict_to=restrict_to
+        )
+        return sorted(
+            (
+                (ingredient_id, score)
+                for ingredient_id, score in scores.items()
+                if score > 0
+            ),
+            key=lambda pair: (-pair[1], pair[0]),
+        )
 
     def find_best_match(
         self,
         source_text: str,
-        ingredients: list[models.Ingredient],
+        ingredients: Optional[list[models.Ingredient]] = None,
     ) -> tuple[Optional[models.Ingredient], float]:
-        if not self.cache_healthy:
-            self.populate_cache(ingredients)
+        """Best scoring ingredient among `ingredients`, or among the whole index if None."""
+        restrict_to: Optional[set[int]] = None
+        if ingredients is not None:
+            # only tokenize ingredients we haven't seen yet
+            self.populate_cache(
+                [
+                    ingredient
+                    for ingredient in ingredients
+                    if ingredient.id not in self.index
+                ]
+            )
+            restrict_to = {ingredient.id for ingredient in ingredients}
 
-        best_match: Optional[models.Ingredient] = None
-        best_score = 0.0
+        ranked = self.rank(source_text, restrict_to)
+        if not ranked:
+            return None, 0.0
 
-        source_weights = IngredientMatcher.weigh_tokens(
-            IngredientMatcher.tokens_without_stopwords(
-                IngredientMatcher.tokenize(source_text)
+        if ingredients is not None:
+            best_id, best_score = ranked[0]
+            best_match = next(
+                ingredient for ingredient in ingredients if ingredient.id == best_id
             )
-        )
-
-        for ingredient in ingredients:
-            score = self.score_match(source_weights, ingredient.id)
-            if score > best_score:
-                best_match = ingredient
-                best_score = score
+            return best_match, best_score
 
-        return best_match, best_score
+        # the index can briefly hold ingredients deleted by another process
+        by_id = models.Ingredient.objects.in_bulk([pair[0] for pair in ranked[:5]])
+        for ingredient_id, score in ranked[:5]:
+            if ingredient_id in by_id:
+                return by_id[ingredient_id], score
+        return None, 0.0
 
 
 class StageTwo:
@@ -347,7 +548,21 @@ class StageTwo:
         TABLESPOON = ("tbsp", "tablespoon", "tablespoons")
         CUP = ("cup", "cups")
         PIECE = ("piece", "pieces", "pc", "pcs")
-        POUND = ("lb", "pound", "pounds")
+        POUND = ("lb", "pound", "pounds", "lbs")
+        OUNCE = ("oz", "ounce", "ounces")
+
+    @dataclass
+    class ParsedLine:
+        quantity: float  # in `unit`, 0 when the line doesn't start with one
+        unit: Optional[StageTwo.CommonUnit]
+        name: str  # the rest of the line, without the quantity and unit
+
+        @property
+        def kg(self) -> float:
+            # without a unit it's probably a count
+            return StageTwo.convert_unit_to_kg(
+                self.quantity, self.unit or StageTwo.CommonUnit.PIECE
+            )
 
     @staticmethod
     def convert_unit_to_kg(quantity: float, unit: StageTwo.CommonUnit) -> float:
@@ -376,93 +591,34 @@ class StageTwo:
                 )  # just a complete guess, since we have no idea, pieces are maybe 100g?
             case StageTwo.CommonUnit.POUND:
                 return quantity * 0.453592
+            case StageTwo.CommonUnit.OUNCE:
+                return quantity * 0.0283495
             case _:
                 raise ValueError(f"Unrecognized unit: {unit}")
 
     @staticmethod
-    def parse_quantity(source_text: str) -> float:
-        text = source_text.strip()
-        if not text:
-            return 0.0
-
-        mixed_fraction_match = re.match(r"^(\d+)\s+(\d+)\s*/\s*(\d+)\b", text)
-        if mixed_fraction_match:
-            whole = float(mixed_fraction_match.group(1))
-            numerator = float(mixed_fraction_match.group(2))
-            denominator = float(mixed_fraction_match.group(3))
-            return whole + (numerator / denominator) if denominator else 0.0
-
-        fraction_match = re.match(r"^(\d+)\s*/\s*(\d+)\b", text)
-        if fraction_match:
-            numerator = float(fraction_match.group(1))
-            denominator = float(fraction_match.group(2))
-            return numerator / denominator if denominator else 0.0
-
-        decimal_match = re.match(r"^(\d+(?:\.\d+)?)\b", text)
-        if decimal_match:
-            return float(decimal_match.group(1))
-
-        return 0.0
-
-    @staticmethod
-    def find_units_with_context(source_text: str) -> Optional[StageTwo.CommonUnit]:
-        """Finds units that fit the following criteria:
-        1) They are in the source text
-        2) The preceding text contains either a quantity or is a space (avoids matching the 'l' in 'flour' as a liter unit for example)
-        3) The following text is either a space, the end of the string, or a common punctuation mark (avoids matching the 'g' in 'egg' for example)
-        """
-        for unit in StageTwo.CommonUnit:
-            for alias in unit.value:
-                pattern = rf"(?<=\d|\s){re.escape(alias)}(?=\s|[.,;:!?()\[\]{{}}]|$)"
-                if re.search(pattern, source_text, re.IGNORECASE):
-                    return unit
-        return None
-
-    @staticmethod
-    def parse_quantity_convert_unit_to_kg(source_text: str) -> float:
-        quantity = StageTwo.parse_quantity(source_text)
-        # match any found units
-        found_unit = StageTwo.find_units_with_context(source_text)
-        if found_unit:
-            # take the first :)
-            return StageTwo.convert_unit_to_kg(quantity, found_unit)
+    def parse_ingredient_line(source_text: str) -> StageTwo.ParsedLine:
+        """Split an ingredient line into quantity, unit and name in one match of the
+        precompiled INGREDIENT_LINE pattern. Understands "1 1/2", "1½" and "0.5",
+        ranges ("2-3 cups", taken as their middle) and a parenthetical size after the
+        count ("2 (400 g) cans chickpeas" is 800 g of chickpeas)."""
+        match = INGREDIENT_LINE.match(source_text)
+        assert match is not None  # every part of the pattern is optional
+        count = parse_amount(match["amount"]) if match["amount"] else None
+        if count is not None and match["amount_max"]:
+            count = (count + parse_amount(match["amount_max"])) / 2
+
+        unit_alias = match["unit"]
+        if match["size"]:
+            quantity = (1.0 if count is None else count) * parse_amount(match["size"])
+            unit_alias = match["size_unit"]
         else:
-            return StageTwo.convert_unit_to_kg(
-                quantity, StageTwo.CommonUnit.PIECE
-            )  # if there are no units, it's probably count
-
-    @staticmethod
-    def strip_leading_quantity(source_text: str) -> str:
-        text = source_text.strip()
-        text = re.sub(r"^(\d+)\s+(\d+)\s*/\s*(\d+)\b\s*", "", text)
-        text = re.sub(r"^(\d+)\s*/\s*(\d+)\b\s*", "", text)
-        text = re.sub(r"^(\d+(?:\.\d+)?)\b\s*", "", text)
-        return text.strip()
-
-    @staticmethod
-    def strip_leading_unit_alias(source_text: str) -> str:
-        aliases = sorted(
-            {
-                alias.strip().lower()
-                for unit in StageTwo.CommonUnit
-                for alias in unit.value
-                if alias.strip()
-            },
-            key=len,
-            reverse=True,
-        )
-        if not aliases:
-            return source_text.strip()
-
-        alias_pattern = "|".join(re.escape(alias) for alias in aliases)
-        text = re.sub(
-            rf"^(?:{alias_pattern})\b\s*",
-            "",
-            source_text.strip(),
-            flags=re.IGNORECASE,
+            quantity = count or 0.0
+        return StageTwo.ParsedLine(
+            quantity=quantity,
+            unit=UNIT_ALIASES[unit_alias.lower()] if unit_alias else None,
+            name=match["name"].strip(),
         )
-        text = re.sub(r"^of\b\s*", "", text, flags=re.IGNORECASE)
-        return text.strip()
 
     @staticmethod
     def build_match(
@@ -482,106 +638,263 @@ class StageTwo:
     def match_ingredient(
         ingredient_str: str, matcher: IngredientMatcher
     ) -> StageTwo.IngredientMatch:
-        source_text = ingredient_str.strip()
-        quantity = StageTwo.parse_quantity_convert_unit_to_kg(source_text)
-        normalized_source = StageTwo.strip_leading_unit_alias(
-            StageTwo.strip_leading_quantity(source_text)
+        return StageTwo.match_ingredients([ingredient_str], matcher)[0]
+
+    @staticmethod
+    def resolve_names(keys: set[str]) -> dict[str, int]:
+        """
+        Ingredient ids for the normalized `keys` that are an ingredient's name or a
+        recorded alias, in one indexed query. A name beats an alias, and of
+        duplicate names the oldest ingredient wins.
+        """
+        if not keys:
+            return {}
+        names = api_models.Ingredient.objects.filter(
+            normalized_name__in=keys
+        ).values_list("normalized_name", "id", Value(0))
+        aliases = api_models.IngredientAlias.objects.filter(alias__in=keys).values_list(
+            "alias", "ingredient_id", Value(1)
         )
-        candidate = normalized_source.lower()
-        if not candidate:
-            return StageTwo.build_match(None, source_text, quantity, 0.0)
-
-        exact_match = models.Ingredient.objects.filter(name__iexact=source_text).first()
-        if exact_match is not None:
-            return StageTwo.build_match(exact_match, source_text, quantity, 1.0)
-
-        exact_match_without_quantity = models.Ingredient.objects.filter(
-            name__iexact=normalized_source
-        ).first()
-        if exact_match_without_quantity is not None:
-            return StageTwo.build_match(
-                exact_match_without_quantity,
-                source_text,
-                quantity,
-                1.0,
-            )
+        resolved: dict[str, int] = {}
+        for key, ingredient_id, _ in sorted(
+            names.union(aliases, all=True), key=lambda row: (row[2], row[1])
+        ):
+            resolved.setdefault(key, ingredient_id)
+        return resolved
 
-        candidate_terms = [
-            term for term in IngredientMatcher.tokenize(candidate) if term
-        ]
-        candidate_queryset = models.Ingredient.objects.all()
-        for term in candidate_terms[:4]:
-            candidate_queryset = candidate_queryset.filter(name__icontains=term)
+    @staticmethod
+    def match_ingredients(
+        ingredient_strs: list[str], matcher: IngredientMatcher
+    ) -> list[StageTwo.IngredientMatch]:
+        """Match a batch of ingredient lines: one query for exact name and alias hits
+        across all lines, index scoring for the rest, and one query to load the winners."""
+        parsed: list[tuple[str, float, str]] = []
+        for ingredient_str in ingredient_strs:
+            source_text = ingredient_str.strip()
+            line = StageTwo.parse_ingredient_line(source_text)
+            parsed.append((source_text, line.kg, line.name))
+
+        exact_ids = StageTwo.resolve_names(
+            {
+                api_models.normalize_name(text)
+                for source_text, _, normalized_source in parsed
+                if normalized_source
+                for text in (source_text, normalized_source)
+            }
+        )
+        exact_matches: dict[int, int] = {}
+        for line, (source_text, _, normalized_source) in enumerate(parsed):
+            for text in (source_text, normalized_source) if normalized_source else ():
+                ingredient_id = exact_ids.get(api_models.normalize_name(text))
+                if ingredient_id is not None:
+                    exact_matches[line] = ingredient_id
+                    break
 
-        candidate_ingredients = list(candidate_queryset)
-        if not candidate_ingredients:
-            candidate_ingredients = list(models.Ingredient.objects.all())
+        fuzzy_matches: dict[int, tuple[int, float]] = {}
+        for line, (source_text, _, normalized_source) in enumerate(parsed):
+            candidate = normalized_source.lower()
+            if not candidate or line in exact_matches:
+                continue
+            candidate_terms = [
+                term for term in IngredientMatcher.tokenize(candidate) if term
+            ]
+            ranked = matcher.rank(
+                candidate, restrict_to=matcher.candidate_ids(candidate_terms[:4])
+            )
+            if ranked:
+                fuzzy_matches[line] = ranked[0]
 
-        best_match, best_confidence = matcher.find_best_match(
-            candidate,
-            candidate_ingredients,
+        winners = models.Ingredient.objects.in_bulk(
+            {*exact_matches.values()}
+            | {ingredient_id for ingredient_id, _ in fuzzy_matches.values()}
         )
 
-        if best_match is not None:
-            return StageTwo.build_match(
-                best_match,
-                source_text,
-                quantity,
-                best_confidence,
-            )
+        matches: list[StageTwo.IngredientMatch] = []
+        for line, (source_text, quantity, normalized_source) in enumerate(parsed):
+            if line in exact_matches and exact_matches[line] in winners:
+                matches.append(
+                    StageTwo.build_match(
+                        winners[exact_matches[line]], source_text, quantity, 1.0
+                    )
+                )
+            elif line in fuzzy_matches and fuzzy_matches[line][0] in winners:
+                ingredient_id, confidence = fuzzy_matches[line]
+                matches.append(
+                    StageTwo.build_match(
+                        winners[ingredient_id], source_text, quantity, confidence
+                    )
+                )
+            else:
+                matches.append(StageTwo.build_match(None, source_text, quantity, 0.0))
+        return matches
 
-        return StageTwo.build_match(None, source_text, quantity, 0.0)
+    @staticmethod
+    def build_recipe_draft(
+        stage_one_result: StageOne.RecipeLoaderInitialFetch,
+        ingredient_matches: list[StageTwo.IngredientMatch],
+    ) -> StageTwo.RecipeDraft:
+        return StageTwo.RecipeDraft(
+            name=stage_one_result.name,
+            ingredients=ingredient_matches,
+            steps=stage_one_result.steps,
+            prep_time_minutes=stage_one_result.prep_time_minutes,
+            cook_time_minutes=stage_one_result.cook_time_minutes,
+            description=stage_one_result.description,
+        )
 
     @staticmethod
     def load_recipe_stage_two(
         stage_one_result: StageOne.RecipeLoaderInitialFetch,
     ) -> RecipeLoadingStageTwoResult:
-        ingredient_matcher = IngredientMatcher()
-        ingredient_matches = [
-            StageTwo.match_ingredient(ingredient_str, ingredient_matcher)
-            for ingredient_str in stage_one_result.ingredients
-        ]
+        ingredient_matcher = IngredientMatcher.shared()
+        ingredient_matches = StageTwo.match_ingredients(
+            stage_one_result.ingredients, ingredient_matcher
+        )
 
         return StageTwo.RecipeLoadingStageTwoResult(
             error=None,
-            recipe_data=StageTwo.RecipeDraft(
-                name=stage_one_result.name,
-                ingredients=ingredient_matches,
-                steps=stage_one_result.steps,
-                prep_time_minutes=stage_one_result.prep_time_minutes,
-                cook_time_minutes=stage_one_result.cook_time_minutes,
-                description=stage_one_result.description,
+            recipe_data=StageTwo.build_recipe_draft(
+                stage_one_result, ingredient_matches
             ),
         )
 
+    @staticmethod
+    def load_recipes_stage_two(
+        stage_one_results: list[StageOne.RecipeLoaderInitialFetch],
+    ) -> list[StageTwo.RecipeDraft]:
+        """Stage two for many recipes, matching all of their ingredient lines in one batch."""
+        ingredient_matches = StageTwo.match_ingredients(
+            [line for result in stage_one_results for line in result.ingredients],
+            IngredientMatcher.shared(),
+        )
+        drafts: list[StageTwo.RecipeDraft] = []
+        offset = 0
+        for result in stage_one_results:
+            drafts.append(
+                StageTwo.build_recipe_draft(
+                    result,
+                    ingredient_matches[offset : offset + len(result.ingredients)],
+                )
+            )
+            offset += len(result.ingredients)
+        return drafts
+
     @staticmethod
     def save_recipe_draft_as_confirmable_recipe(
         recipe_draft: RecipeDraft, source_url: Optional[str]
     ) -> models.ConfirmableRecipe:
-        confirmable_recipe = models.ConfirmableRecipe.objects.create(
-            name=recipe_draft.name,
-            source_url=source_url,
-            prep_time_minutes=recipe_draft.prep_time_minutes,
-            cook_time_minutes=recipe_draft.cook_time_minutes,
-        )
+        return StageTwo.save_recipe_drafts_as_confirmable_recipes(
+            [(recipe_draft, source_url)]
+        )[0]
 
-        for ingredient_match in recipe_draft.ingredients:
-            models.ConfirmableRecipeIngredient.objects.create(
-                confirmable_recipe=confirmable_recipe,
-                best_guess_ingredient=ingredient_match.ingredient,
-                quantity=ingredient_match.quantity,
-                confidence=ingredient_match.confidence,
-                source_text=ingredient_match.source_text,
+    @staticmethod
+    def save_recipe_drafts_as_confirmable_recipes(
+        drafts: list[tuple[RecipeDraft, Optional[str]]],
+    ) -> list[models.ConfirmableRecipe]:
+        """Save (draft, source url) pairs with one bulk insert per table."""
+        with transaction.atomic():
+            confirmable_recipes = models.ConfirmableRecipe.objects.bulk_create(
+                [
+                    models.ConfirmableRecipe(
+                        name=recipe_draft.name,
+                        source_url=source_url,
+                        prep_time_minutes=recipe_draft.prep_time_minutes,
+                        cook_time_minutes=recipe_draft.cook_time_minutes,
+                    )
+                    for recipe_draft, source_url in drafts
+                ]
             )
-
-        for step_number, step_description in enumerate(recipe_draft.steps, start=1):
-            models.ConfirmableRecipeStep.objects.create(
-                confirmable_recipe=confirmable_recipe,
-                step_number=step_number,
-                description=step_description,
+            models.ConfirmableRecipeIngredient.objects.bulk_create(
+                [
+                    models.ConfirmableRecipeIngredient(
+                        confirmable_recipe=confirmable_recipe,
+                        best_guess_ingredient=ingredient_match.ingredient,
+                        quantity=ingredient_match.quantity,
+                        confidence=ingredient_match.confidence,
+                        source_text=ingredient_match.source_text,
+                    )
+                    for confirmable_recipe, (recipe_draft, _) in zip(
+                        confirmable_recipes, drafts
+                    )
+                    for ingredient_match in recipe_draft.ingredients
+                ]
             )
-
-        return confirmable_recipe
+            models.ConfirmableRecipeStep.objects.bulk_create(
+                [
+                    models.ConfirmableRecipeStep(
+                        confirmable_recipe=confirmable_recipe,
+                        step_number=step_number,
+                        description=step_description,
+                    )
+                    for confirmable_recipe, (recipe_draft, _) in zip(
+                        confirmable_recipes, drafts
+                    )
+                    for step_number, step_description in enumerate(
+                        recipe_draft.steps, start=1
+                    )
+                ]
+            )
+        return confirmable_recipes
+
+
+# vulgar fraction characters and their values
+FRACTIONS = {char: unicodedata.numeric(char) for char in "¼½¾⅐⅑⅒⅓⅔⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞"}
+UNIT_ALIASES = {alias: unit for unit in StageTwo.CommonUnit for alias in unit.value}
+# what a parenthetical size ("(14 oz) can") comes in, dropped from the name
+CONTAINERS = [
+    "can",
+    "tin",
+    "jar",
+    "package",
+    "pack",
+    "packet",
+    "bag",
+    "bottle",
+    "carton",
+    "box",
+]
+
+_AMOUNT = rf"""(?:
+    \d+\s*[{"".join(FRACTIONS)}]          # 1½, 1 ½
+  | [{"".join(FRACTIONS)}]                # ½
+  | \d+\s+\d+\s*[/⁄]\s*\d+             # 1 1/2
+  | \d+\s*[/⁄]\s*\d+                    # 1/2
+  | \d+(?:[.,]\d+)?                      # 2, 0.5, 0,5
+)"""
+# longest first, so "kg" isn't read as "k" + "g" and "cups" not as "cup"
+_UNIT = "(?:{})(?![a-z])".format(
+    "|".join(re.escape(alias) for alias in sorted(UNIT_ALIASES, key=len, reverse=True))
+)
+INGREDIENT_LINE = re.compile(
+    rf"""\s*
+    (?:(?P<amount>{_AMOUNT})                                # 2
+       (?:\s*(?:-|–|—|\bto\b)\s*(?P<amount_max>{_AMOUNT}))?  # -3
+    )?\s*
+    (?:\(\s*(?P<size>{_AMOUNT})\s*-?\s*(?P<size_unit>{_UNIT})\.?\s*\)\s*  # (400 g)
+       (?:(?:{"|".join(CONTAINERS)})(?:e?s)?\b\s*)?        # cans
+    )?
+    (?:(?P<unit>{_UNIT})\.?\s*)?                           # cups
+    (?:of\b\s*)?
+    (?P<name>.*)""",
+    re.IGNORECASE | re.VERBOSE | re.DOTALL,
+)
+
+
+def parse_amount(text: str) -> float:
+    """The value of an amount matched by INGREDIENT_LINE."""
+    text = text.strip()
+    if text[-1] in FRACTIONS:
+        whole = text[:-1].strip()
+        return (float(whole) if whole else 0.0) + FRACTIONS[text[-1]]
+    before, slash, denominator = text.replace("⁄", "/").rpartition("/")
+    if slash:
+        *whole, numerator = before.split()
+        if not float(denominator):
+            return 0.0
+        return (float(whole[0]) if whole else 0.0) + float(numerator) / float(
+            denominator
+        )
+    return float(text.replace(",", "."))
 
 
 class StageThree:
@@ -593,12 +906,52 @@ class StageThree:
         error: str | None
         recipe: Optional[api_models.Recipe] = None
 
+    @staticmethod
+    def confirmed_aliases(
+        confirmable_ingredients: list[models.ConfirmableRecipeIngredient],
+    ) -> list[api_models.IngredientAlias]:
+        """
+        The names confirmed lines were matched from that aren't already their
+        ingredient's name. Only certain matches count (exact ones, or ingredients
+        the user picked): an unedited fuzzy guess would otherwise match exactly from
+        then on, right or wrong.
+        """
+        aliases: dict[str, int] = {}
+        for confirmable_ingredient in confirmable_ingredients:
+            ingredient = confirmable_ingredient.best_guess_ingredient
+            if ingredient is None or confirmable_ingredient.confidence < 1.0:
+                continue
+            alias = api_models.normalize_name(
+                StageTwo.parse_ingredient_line(confirmable_ingredient.source_text).name
+            )
+            if (
+                alias
+                and len(alias) <= 256
+                and alias != api_models.normalize_name(ingredient.name)
+            ):
+                aliases[alias] = ingredient.id
+        return [
+            api_models.IngredientAlias(alias=alias, ingredient_id=ingredient_id)
+            for alias, ingredient_id in aliases.items()
+        ]
+
     @staticmethod
     def save_confirmable_recipe_as_actual_recipe(
         confirmable_recipe: models.ConfirmableRecipe,
     ) -> RecipeSavingResult:
         try:
             with transaction.atomic():  # so that failures don't mess stuff up, either the whole recipe is saved correctly and draft deleted, or nothign happens
+                confirmable_ingredients = list(
+                    confirmable_recipe.ingredients_list.select_related(
+                        "best_guess_ingredient"
+                    )
+                )
+                for confirmable_ingredient in confirmable_ingredients:
+                    if confirmable_ingredient.best_guess_ingredient_id is None:  # type: ignore[attr-defined]
+                        raise ValueError(
+                            f"Ingredient '{confirmable_ingredient.source_text}' could not be matched to any ingredient in the database. Cannot save recipe without valid ingredient matches."
+                        )
+
                 recipe = api_models.Recipe.objects.create(
                     name=confirmable_recipe.name,
                     prep_time_minutes=confirmable_recipe.prep_time_minutes,
@@ -606,29 +959,39 @@ class StageThree:
                     servings=confirmable_recipe.servings or 1,
                     notes=f"Source URL: {confirmable_recipe.source_url}",
                 )
-
-                for confirmable_ingredient in confirmable_recipe.ingredients_list.all():
-                    if confirmable_ingredient.best_guess_ingredient is None:
-                        raise ValueError(
-                            f"Ingredient '{confirmable_ingredient.source_text}' could not be matched to any ingredient in the database. Cannot save recipe without valid ingredient matches."
+                api_models.RecipeIngredient.objects.bulk_create(
+                    [
+                        api_models.RecipeIngredient(
+                            recipe=recipe,
+                            ingredient_id=confirmable_ingredient.best_guess_ingredient_id,  # type: ignore[attr-defined]
+                            quantity=confirmable_ingredient.quantity,
+                            notes=f"Original text: {confirmable_ingredient.source_text}, Confidence: {confirmable_ingredient.confidence:.2f}",
                         )
-                    api_models.RecipeIngredient.objects.create(
-                        recipe=recipe,
-                        ingredient=confirmable_ingredient.best_guess_ingredient,
-                        quantity=confirmable_ingredient.quantity,
-                        notes=f"Original text: {confirmable_ingredient.source_text}, Confidence: {confirmable_ingredient.confidence:.2f}",
-                    )
-                    confirmable_ingredient.delete()  # delete the confirmable ingredient after saving it to the actual recipe
-
-                for confirmable_step in confirmable_recipe.steps_list.all():
-                    api_models.RecipeStep.objects.create(
-                        recipe=recipe,
-                        step_number=confirmable_step.step_number,
-                        description=confirmable_step.description,
+                        for confirmable_ingredient in confirmable_ingredients
+                    ]
+                )
+                aliases = StageThree.confirmed_aliases(confirmable_ingredients)
+                if aliases:
+                    # the latest confirmation of a wording wins
+                    api_models.IngredientAlias.objects.bulk_create(
+                        aliases,
+                        update_conflicts=True,
+                        unique_fields=["alias"],
+                        update_fields=["ingredient"],
                     )
-                    confirmable_step.delete()  # delete the confirmable step after saving it to the actual recipe
+                api_models.RecipeStep.objects.bulk_create(
+                    [
+                        api_models.RecipeStep(
+                            recipe=recipe,
+                            step_number=confirmable_step.step_number,
+                            description=confirmable_step.description,
+                        )
+                        for confirmable_step in confirmable_recipe.steps_list.all()
+                    ]
+                )
 
-                confirmable_recipe.delete()  # delete the confirmable recipe after saving all its data to the actual recipe
+                # cascades to its ingredients and steps in one delete per table
+                confirmable_recipe.delete()
                 return StageThree.RecipeSavingResult(error=None, recipe=recipe)
         except ValueError as e:
             return StageThree.RecipeSavingResult(error=str(e), recipe=None)
@@ -646,7 +1009,14 @@ def load_recipe_from_url(url: str) -> RecipeLoadingResult:
         return RecipeLoadingResult(error=stage_one_result.error)
 
     assert stage_one_result.recipe_data is not None
-    stage_two_result = StageTwo.load_recipe_stage_two(stage_one_result.recipe_data)
+    return save_loaded_recipe(stage_one_result.recipe_data, url)
+
+
+def save_loaded_recipe(
+    recipe_data: StageOne.RecipeLoaderInitialFetch, url: str
+) -> RecipeLoadingResult:
+    """The rest of `load_recipe_from_url` once the page is parsed: match ingredients, save the draft."""
+    stage_two_result = StageTwo.load_recipe_stage_two(recipe_data)
     if stage_two_result.error:
         return RecipeLoadingResult(error=stage_two_result.error)
     assert stage_two_result.recipe_data is not None
@@ -656,6 +1026,44 @@ def load_recipe_from_url(url: str) -> RecipeLoadingResult:
     return RecipeLoadingResult(error=None, confirmable_recipe=confirmable_recipe)
 
 
+def load_recipes_from_urls(
+    urls: list[str], on_progress: Optional[Callable[[int, int], None]] = None
+) -> list[RecipeLoadingResult]:
+    """Import many recipes: fetch pages concurrently, match every ingredient line in
+    one batch, and bulk insert the ConfirmableRecipes. Results are in `urls` order."""
+
+    def fetch(url: str) -> StageOne.RecipeLoadingStageOneResult:
+        try:
+            return StageOne.load_recipe_stage_one(url)
+        except Exception as exc:  # one bad page must not sink the batch
+            return StageOne.RecipeLoadingStageOneResult(
+                error=f"Failed to load the URL: {exc}"
+            )
+
+    stage_one_results = fetching.map_concurrently(
+        fetch, urls, url_of=lambda url: url, on_progress=on_progress
+    )
+    loaded = [
+        (url, result.recipe_data)
+        for url, result in zip(urls, stage_one_results)
+        if result.recipe_data is not None
+    ]
+    drafts = StageTwo.load_recipes_stage_two([recipe_data for _, recipe_data in loaded])
+    confirmable_recipes = iter(
+        StageTwo.save_recipe_drafts_as_confirmable_recipes(
+            [(draft, url) for draft, (url, _) in zip(drafts, loaded)]
+        )
+    )
+    return [
+        RecipeLoadingResult(error=result.error)
+        if result.recipe_data is None
+        else RecipeLoadingResult(
+            error=None, confirmable_recipe=next(confirmable_recipes)
+        )
+        for result in stage_one_results
+    ]
+
+
 RecipeSavingResult = StageThree.RecipeSavingResult
 
 
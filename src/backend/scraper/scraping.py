@@ -1,13 +1,37 @@
 import requests
 from typing import Optional
-from bs4 import BeautifulSoup
-import json
+from collections import OrderedDict
 from typing import Any
 from urllib.parse import urlparse
 
+from scraper import fetching, json_ld
+
 ScrapingReturn = tuple[Optional[float], Optional[str]]
 # The above type is (price per unit, error message). Price and error are mutually exclusive
 
+# errors that start with this mean the host itself failed (see models.HostCircuit)
+UNREACHABLE = "Failed to reach the URL"
+
+
+def is_unreachable(error: Optional[str]) -> bool:
+    return error is not None and error.startswith(UNREACHABLE)
+
+
+# parsed results of revalidated (304) pages, keyed by (url, ETag/Last-Modified)
+_parsed_pages: "OrderedDict[tuple[str, str], ScrapingReturn]" = OrderedDict()
+PARSED_PAGES_MAX = 512
+
+
+def _remember_parsed(
+    key: Optional[tuple[str, str]], result: ScrapingReturn
+) -> ScrapingReturn:
+    if key is not None:
+        _parsed_pages[key] = result
+        _parsed_pages.move_to_end(key)
+        while len(_parsed_pages) > PARSED_PAGES_MAX:
+            _parsed_pages.popitem(last=False)
+    return result
+
 
 def from_url(url: str) -> ScrapingReturn:
     parsed = urlparse(url)
@@ -33,31 +57,49 @@ def try_schema_org_product(url: str) -> ScrapingReturn:
 
     # as a fallback, see if the page contains schema.org product data that we can parse
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = fetching.get(url, headers=headers)
     except requests.RequestException as exc:
-        return (None, f"Failed to reach the URL: {exc}")
+        return (None, f"{UNREACHABLE}: {exc}")
+    if response.status_code == 429 or response.status_code >= 500:
+        return (None, f"{UNREACHABLE}: {response.status_code}")
     if response.status_code != 200:
-        return (None, f"Failed to reach the URL: {response.status_code}")
-    soup = BeautifulSoup(response.text, "html.parser")
-    tag = soup.find("script", {"type": "application/ld+json"})
-    if not tag:
-        print(response.text)
+        return (None, f"Failed to load the page: {response.status_code}")
+
+    validator = fetching.validator(response)
+    memo_key = (url, validator) if validator else None
+    if getattr(response, "from_cache", False) and memo_key in _parsed_pages:
+        return _parsed_pages[memo_key]  # unchanged page, skip the parse entirely
+    return _remember_parsed(memo_key, price_from_product_page(response.content))
+
+
+def price_from_product_page(html: str | bytes) -> ScrapingReturn:
+    scripts = json_ld.scripts(html)
+    if not scripts:
         return (None, "Unsupported Source (code 1)")
+    data = []
+    for text in scripts:
+        try:
+            data.append(json_ld.decode(text))
+        except ValueError:
+            continue
+    if not data:
+        return (None, "Unsupported Source (code 3)")
 
-    try:
-        data: dict[str, Any] | list[Any] = json.loads(tag.string or "")
-        while isinstance(data, list):
-            data = data[0]
-        offers: dict[str, Any] | list[dict[str, Any]] = data.get("offers", {})
+    # the first object with a priced offer, wherever the site put it
+    for item in (item for block in data for item in json_ld.flatten(block)):
+        offers: Any = item.get("offers")
         if isinstance(offers, list):
-            offers = offers[0]
+            offers = offers[0] if offers else None
+        if not isinstance(offers, dict):
+            continue
         price = offers.get("price")
-        if price is not None:
+        if price is None:
+            continue
+        try:
             return (float(price), None)
-        else:
-            return (None, "Unsupported Source (code 2)")
-    except json.JSONDecodeError:
-        return (None, "Unsupported Source (code 3)")
+        except (TypeError, ValueError):
+            continue
+    return (None, "Unsupported Source (code 2)")
 
 
 def from_superstore(code: str) -> ScrapingReturn:
@@ -96,7 +138,7 @@ def from_superstore(code: str) -> ScrapingReturn:
         "banner": "superstore",
     }
 
-    response = requests.get(
+    response = fetching.get(
         f"https://api.pcexpress.ca/pcx-bff/api/v1/products/{code}",
         params=params,
         cookies=cookies,
@@ -1,16 +1,22 @@
+from typing import Any
+
 from rest_framework import serializers
 from . import models
 
 
 class SourceSerializer(serializers.ModelSerializer[models.Source]):
+    is_stale = serializers.BooleanField(read_only=True)
+
     class Meta:  # type: ignore
         model = models.Source
         fields = "__all__"
+        read_only_fields = ("failure_count", "retry_after")
 
 
 class ScraperSerializer(serializers.ModelSerializer[models.Scraper]):
     cached_source = SourceSerializer(read_only=True)
     sources = SourceSerializer(many=True, read_only=True)
+    is_stale = serializers.BooleanField(read_only=True)
 
     class Meta:  # type: ignore
         model = models.Scraper
@@ -23,6 +29,29 @@ class ConfirmableRecipeIngredientSerializer(
     class Meta:  # type: ignore
         model = models.ConfirmableRecipeIngredient
         fields = "__all__"
+        # how sure the match is: the matcher's score, or 1.0 once the user picked the ingredient
+        read_only_fields = ("confidence",)
+
+    def create(
+        self, validated_data: dict[str, Any]
+    ) -> models.ConfirmableRecipeIngredient:
+        picked = validated_data.get("best_guess_ingredient") is not None
+        validated_data["confidence"] = 1.0 if picked else 0.0
+        return super().create(validated_data)
+
+    def update(
+        self,
+        instance: models.ConfirmableRecipeIngredient,
+        validated_data: dict[str, Any],
+    ) -> models.ConfirmableRecipeIngredient:
+        if (
+            "best_guess_ingredient" in validated_data
+            and validated_data["best_guess_ingredient"]
+            != instance.best_guess_ingredient
+        ):
+            picked = validated_data["best_guess_ingredient"] is not None
+            validated_data["confidence"] = 1.0 if picked else 0.0
+        return super().update(instance, validated_data)
 
 
 class ConfirmableRecipeStepSerializer(
@@ -42,3 +71,23 @@ class ConfirmableRecipeSerializer(
     class Meta:  # type: ignore
         model = models.ConfirmableRecipe
         fields = "__all__"
+
+
+class ScrapeJobSerializer(serializers.ModelSerializer[models.ScrapeJob]):
+    class Meta:  # type: ignore
+        model = models.ScrapeJob
+        fields = "__all__"
+
+
+class RecipeImportItemSerializer(serializers.ModelSerializer[models.RecipeImportItem]):
+    class Meta:  # type: ignore
+        model = models.RecipeImportItem
+        fields = ["id", "url", "status", "error", "confirmable_recipe"]
+
+
+class RecipeImportJobSerializer(serializers.ModelSerializer[models.RecipeImportJob]):
+    items = RecipeImportItemSerializer(many=True, read_only=True)
+
+    class Meta:  # type: ignore
+        model = models.RecipeImportJob
+        fields = "__all__"
@@ -1,6 +1,11 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from api import http_cache, rollups
+from api.models import Ingredient
+
 from . import models
+from .recipe_loader import IngredientMatcher
 
 
 @receiver(post_save, sender=models.Source)
@@ -14,3 +19,25 @@ def source_deleted(sender: type[models.Source], instance: models.Source, **kwarg
     # instance.scraper still accessible after Source deletion (FK is on Source → Scraper)
     instance.scraper.update()
     instance.scraper.save()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender: type[Ingredient], instance: Ingredient, **kwargs: object) -> None:
+    # tagging the name is slow and the index is shared with other requests, so
+    # it is updated after the write commits, and never for a rolled back one
+    transaction.on_commit(lambda: IngredientMatcher.ingredient_saved(instance))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender: type[Ingredient], instance: Ingredient, **kwargs: object) -> None:
+    ingredient_id = instance.id  # cleared by the time the transaction commits
+    transaction.on_commit(lambda: IngredientMatcher.ingredient_deleted(ingredient_id))
+
+
+@receiver(post_save, sender=models.Scraper)
+@receiver(post_delete, sender=models.Scraper)
+def scraper_changed(sender: type[models.Scraper], instance: models.Scraper, **kwargs: object) -> None:
+    http_cache.bump(http_cache.SCRAPERS)
+    # cached_price feeds the recipe cost rollups
+    if instance.ingredient_id is not None:  # type: ignore[attr-defined]
+        rollups.schedule_for_ingredients([instance.ingredient_id])  # type: ignore[attr-defined]
@@ -1,3 +1,841 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.models import IngredientAlias, normalize_name
+
+from . import fetching, json_ld, models, recipe_loader, scraping, worker
+
+
+RECIPE_PAGES = Path(__file__).resolve().parent / "fixtures" / "recipe_pages"
+PRODUCT_PAGES = Path(__file__).resolve().parent / "fixtures" / "product_pages"
+
+
+def no_network(url: str) -> tuple[None, str]:
+    raise AssertionError(f"unexpected scrape of {url}")
+
+
+class BackgroundRefreshTests(TestCase):
+    def setUp(self) -> None:
+        self.scraper = models.Scraper.objects.create()
+
+    @mock.patch("scraper.scraping.from_url", side_effect=no_network)
+    def test_reads_never_scrape(self, _from_url: mock.Mock) -> None:
+        source = models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/p", quantity=1
+        )
+        self.assertTrue(source.is_stale)
+        self.assertIsNone(source.min_price_per_unit)
+        self.assertIsNone(self.scraper.min_price_per_unit)
+        self.assertEqual(
+            models.ScrapeJob.objects.filter(source=source).count(), 1
+        )  # queued once, however many times it is read
+
+    @mock.patch("scraper.scraping.from_url", return_value=(10.0, None))
+    def test_worker_refreshes_stale_sources(self, from_url: mock.Mock) -> None:
+        cheap = models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/cheap", quantity=4
+        )
+        models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/dear", quantity=1
+        )
+        models.Source.objects.filter(pk=cheap.pk).update(
+            cached_price=1.0,
+            updated_at=datetime.now(timezone.utc) - timedelta(hours=2),
+        )
+
+        worker.enqueue_stale_sources()
+        while worker.run_once():
+            pass
+
+        self.assertEqual(from_url.call_count, 2)
+        self.scraper.refresh_from_db()
+        self.assertEqual(self.scraper.cached_source, cheap)
+        self.assertEqual(self.scraper.cached_price, 2.5)
+        self.assertFalse(
+            models.ScrapeJob.objects.exclude(
+                status=models.ScrapeJobStatus.DONE
+            ).exists()
+        )
+
+    @mock.patch("scraper.scraping.from_url", return_value=(None, "Unsupported Source"))
+    def test_failed_scrape_is_not_requeued_until_ttl(
+        self, _from_url: mock.Mock
+    ) -> None:
+        source = models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/broken", quantity=1
+        )
+        worker.enqueue_stale_sources()
+        worker.run_once()
+
+        source.refresh_from_db()
+        self.assertEqual(source.cached_error, "Unsupported Source")
+        self.assertFalse(source.is_stale)
+        self.assertEqual(worker.enqueue_stale_sources(), 0)
+
+    @mock.patch("scraper.scraping.from_url", return_value=(None, None))
+    def test_scrape_without_price_is_not_reclaimed(self, from_url: mock.Mock) -> None:
+        source = models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/empty", quantity=1
+        )
+        worker.enqueue_stale_sources()
+        self.assertEqual(worker.run_once(), 1)
+        self.assertEqual(worker.run_once(), 0)
+
+        self.assertEqual(from_url.call_count, 1)
+        source.refresh_from_db()
+        self.assertEqual(source.failure_count, 1)
+        self.assertFalse(source.is_stale)
+        self.assertFalse(
+            models.ScrapeJob.objects.filter(
+                status__in=models.ScrapeJob.ACTIVE_STATUSES
+            ).exists()
+        )
+
+    @mock.patch("scraper.scraping.from_url", return_value=(None, "Unsupported Source"))
+    def test_failing_source_keeps_its_price_and_backs_off(
+        self, from_url: mock.Mock
+    ) -> None:
+        source = models.Source.objects.create(
+            scraper=self.scraper, url="https://example.com/p", quantity=1
+        )
+        models.Source.objects.filter(pk=source.pk).update(
+            cached_price=2.0,
+            updated_at=datetime.now(timezone.utc) - timedelta(hours=2),
+        )
+
+        backoffs = []
+        for _ in range(3):
+            worker.enqueue_stale_sources()
+            worker.run_once()
+            source.refresh_from_db()
+            backoffs.append(source.retry_after - source.updated_at)  # type: ignore[operator]
+            self.assertFalse(source.is_stale)
+            models.Source.objects.filter(pk=source.pk).update(
+                retry_after=datetime.now(timezone.utc)
+            )
+
+        self.assertEqual(from_url.call_count, 3)
+        self.assertEqual(backoffs, [timedelta(hours=1 << n) for n in range(3)])
+        self.assertEqual(source.failure_count, 3)
+        self.assertEqual(source.cached_price, 2.0)  # last known good
+        self.scraper.refresh_from_db()
+        self.assertEqual(self.scraper.cached_price, 2.0)
+
+    def test_host_circuit_opens_and_probes_once(self) -> None:
+        def from_url(url: str) -> scraping.ScrapingReturn:
+            if url.startswith("https://dead."):
+                return (None, f"{scraping.UNREACHABLE}: timed out")
+            return (3.0, None)
+
+        def add_sources(count: int) -> list[models.Source]:
+            return [
+                models.Source.objects.create(
+                    scraper=self.scraper,
+                    url=f"https://dead.example.com/{n}",
+                    quantity=1,
+                )
+                for n in range(count)
+            ]
+
+        with mock.patch("scraper.scraping.from_url", side_effect=from_url) as scrape:
+            worker.refresh_sources(add_sources(models.CIRCUIT_FAILURES))
+            circuit = models.HostCircuit.objects.get(host="dead.example.com")
+            assert circuit.open_until is not None
+
+            scrape.reset_mock()
+            skipped = add_sources(3)
+            summary = worker.refresh_sources(skipped)
+            self.assertEqual(summary.skipped, 3)
+            scrape.assert_not_called()
+            skipped[0].refresh_from_db()
+            self.assertEqual(skipped[0].retry_after, circuit.open_until)
+            self.assertFalse(skipped[0].is_stale)
+
+            # once the circuit times out, a single source tries the host again
+            models.HostCircuit.objects.update(open_until=datetime.now(timezone.utc))
+            summary = worker.refresh_sources(add_sources(3))
+            self.assertEqual((summary.failed, summary.skipped), (1, 2))
+            circuit.refresh_from_db()
+            assert circuit.open_until is not None
+            self.assertGreater(circuit.open_until, datetime.now(timezone.utc))
+
+            models.HostCircuit.objects.update(open_until=datetime.now(timezone.utc))
+            scrape.side_effect = lambda url: (3.0, None)
+            worker.refresh_sources(add_sources(1))
+            circuit.refresh_from_db()
+            self.assertEqual((circuit.failure_count, circuit.open_until), (0, None))
+
+
+class RefreshAllTests(TestCase):
+    @mock.patch("scraper.scraping.from_url", return_value=(6.0, None))
+    def test_refresh_all_scrapes_only_stale_sources(self, from_url: mock.Mock) -> None:
+        first, second = models.Scraper.objects.create(), models.Scraper.objects.create()
+        for scraper in (first, second):
+            models.Source.objects.create(
+                scraper=scraper, url="https://a.example.com/p", quantity=2
+            )
+            models.Source.objects.create(
+                scraper=scraper, url="https://b.example.com/p", quantity=3
+            )
+        fresh = models.Source.objects.create(
+            scraper=first, url="https://c.example.com/p", quantity=1, cached_price=1.0
+        )
+
+        response = self.client.post("/api/scrapers/refresh-all/")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"queued": 4})
+        from_url.assert_not_called()  # left to the worker
+        progress = "/api/scrape-jobs/progress/"
+        self.assertEqual(self.client.get(progress).json(), {"pending": 4, "running": 0})
+        self.assertEqual(
+            self.client.post("/api/scrapers/refresh-all/").json(), {"queued": 4}
+        )
+        self.assertEqual(models.ScrapeJob.objects.count(), 4)  # not queued twice
+
+        self.assertEqual(worker.run_once(), 4)
+        self.assertEqual(self.client.get(progress).json(), {"pending": 0, "running": 0})
+        jobs = self.client.get("/api/scrape-jobs/?status=done").json()
+        self.assertEqual(jobs["count"], 4)
+        self.assertNotIn(fresh.url, [c.args[0] for c in from_url.call_args_list])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.cached_source, fresh)
+        self.assertEqual(second.cached_price, 2.0)
+
+
+PRODUCT_PAGE = b"""<html><head>
+<script type="application/ld+json">{"@type": "Product", "offers": {"price": "4.99"}}</script>
+</head><body></body></html>"""
+
+
+def fake_response(status: int, body: bytes = b"", **headers: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body  # type: ignore[attr-defined]
+    response.headers.update(headers)
+    response.encoding = "utf-8"
+    return response
+
+
+class RefreshEndpointTests(TestCase):
+    @mock.patch("scraper.scraping.from_url", return_value=(6.0, None))
+    def test_refresh_endpoint(self, from_url: mock.Mock) -> None:
+        scraper = models.Scraper.objects.create()
+        for quantity in (2, 3):
+            models.Source.objects.create(
+                scraper=scraper,
+                url=f"https://example.com/{quantity}",
+                quantity=quantity,
+            )
+        path = f"/api/scrapers/{scraper.pk}/refresh/"
+
+        response = self.client.post(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(from_url.call_count, 2)
+        self.assertEqual(response.json()["cached_price"], 2.0)
+        self.assertEqual(len(response.json()["sources"]), 2)
+
+        self.assertEqual(self.client.get(path).status_code, 405)
+        self.assertEqual(
+            self.client.post(f"/api/scrapers/{scraper.pk + 1}/refresh/").status_code,
+            404,
+        )
+
+
+class ConditionalFetchTests(TestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(SCRAPER_HTTP_CACHE_DIR=cache_dir.name))
+        self.session = mock.Mock()
+        self.enterContext(
+            mock.patch.object(fetching, "session_for", return_value=self.session)
+        )
+
+    def test_unchanged_page_is_revalidated_not_reparsed(self) -> None:
+        url = "https://shop.example.com/product"
+        self.session.get.return_value = fake_response(200, PRODUCT_PAGE, ETag='"v1"')
+        self.assertEqual(scraping.try_schema_org_product(url), (4.99, None))
+        self.assertNotIn("If-None-Match", self.session.get.call_args.kwargs["headers"])
+
+        self.session.get.return_value = fake_response(304, ETag='"v1"')
+        with mock.patch.object(
+            scraping, "price_from_product_page", side_effect=AssertionError
+        ):
+            self.assertEqual(scraping.try_schema_org_product(url), (4.99, None))
+        self.assertEqual(
+            self.session.get.call_args.kwargs["headers"]["If-None-Match"], '"v1"'
+        )
+
+    def test_changed_page_replaces_cached_copy(self) -> None:
+        url = "https://shop.example.com/other"
+        self.session.get.return_value = fake_response(200, b"old", ETag='"v1"')
+        fetching.get(url)
+        self.session.get.return_value = fake_response(200, b"new", ETag='"v2"')
+        fetching.get(url)
+        self.session.get.return_value = fake_response(304)
+        response = fetching.get(url)
+        self.assertTrue(response.from_cache)  # type: ignore[attr-defined]
+        self.assertEqual(response.content, b"new")
+
+
+class FetchingLimitsTests(SimpleTestCase):
+    def test_failing_hosts_are_not_retried(self) -> None:
+        session = fetching._build_session()
+        retry = session.get_adapter("https://shop.example.com/").max_retries
+        self.assertEqual((retry.connect, retry.read), (0, 0))
+        self.assertEqual(
+            retry.get_retry_after(mock.Mock(headers={"Retry-After": "3600"})),
+            fetching.MAX_RETRY_AFTER,
+        )
+
+    def test_prune_cache_drops_old_then_least_recently_used(self) -> None:
+        with tempfile.TemporaryDirectory() as name:
+            directory = Path(name)
+            now = time.time()
+            for key, age_days in [("old", 40), ("used", 1), ("idle", 5)]:
+                (directory / f"{key}.json").write_bytes(b"{}")
+                (directory / f"{key}.body").write_bytes(b"x" * 98)
+                stamp = now - age_days * 86400
+                os.utime(directory / f"{key}.json", (stamp, stamp))
+
+            deleted = fetching.prune_cache(
+                directory, max_bytes=150, max_age=timedelta(days=30)
+            )
+            self.assertEqual(deleted, 2)
+            self.assertEqual(
+                sorted(path.name for path in directory.iterdir()),
+                ["used.body", "used.json"],
+            )
+
+
+class IngredientLineTests(SimpleTestCase):
+    def test_quantity_unit_and_name(self) -> None:
+        unit = recipe_loader.StageTwo.CommonUnit
+        cases = [
+            ("2 tbsp olive oil", 2.0, unit.TABLESPOON, "olive oil"),
+            ("200g flour", 200.0, unit.GRAM, "flour"),
+            ("1 1/2 cups milk", 1.5, unit.CUP, "milk"),
+            ("1½ cups milk", 1.5, unit.CUP, "milk"),
+            ("1 ½ cups brown lentils, rinsed", 1.5, unit.CUP, "brown lentils, rinsed"),
+            ("½ teaspoon smoked paprika", 0.5, unit.TEASPOON, "smoked paprika"),
+            ("1⁄4 cup of sugar", 0.25, unit.CUP, "sugar"),
+            ("2–3 cups water", 2.5, unit.CUP, "water"),
+            ("2 to 3 Tbsp. butter", 2.5, unit.TABLESPOON, "butter"),
+            ("0,5 kg rice", 0.5, unit.KILOGRAM, "rice"),
+            ("2 (400 g) cans chickpeas", 800.0, unit.GRAM, "chickpeas"),
+            ("1 (14 oz) can diced tomatoes", 14.0, unit.OUNCE, "diced tomatoes"),
+            ("2 large eggs", 2.0, None, "large eggs"),  # not a liter
+            ("1 tomato", 1.0, None, "tomato"),  # not a range
+            ("2 eggs (beaten)", 2.0, None, "eggs (beaten)"),
+            ("salt and pepper to taste", 0.0, None, "salt and pepper to taste"),
+        ]
+        for line, quantity, expected_unit, name in cases:
+            with self.subTest(line):
+                parsed = recipe_loader.StageTwo.parse_ingredient_line(line)
+                self.assertAlmostEqual(parsed.quantity, quantity)
+                self.assertEqual(parsed.unit, expected_unit)
+                self.assertEqual(parsed.name, name)
+
+    def test_kg(self) -> None:
+        parse = recipe_loader.StageTwo.parse_ingredient_line
+        self.assertAlmostEqual(parse("2 (400 g) cans chickpeas").kg, 0.8)
+        self.assertAlmostEqual(parse("3 lemons").kg, 0.3)  # counted in pieces
+        self.assertEqual(parse("a pinch of love").kg, 0.0)
+
+
+class JsonLdTests(SimpleTestCase):
+    def test_scan_handles_real_world_markup(self) -> None:
+        page = (
+            "<head><script>var x = '<b>application/ld+json</b>';</script>"
+            "<SCRIPT TYPE='application/ld+json' data-rh=true>"
+            '{"@type": "BreadcrumbList"}</SCRIPT >'
+            "<script type=application/ld+json>"
+            '<!-- {"@graph": [{"@type": "Product", "offers": {"price": "2"}}, 3]} -->'
+            "</script>"
+            '<script type="application/ld+json">{not json}</script>'
+            '<script type="application/ld+json">[{"@type": ["Thing", "Recipe"]}]</script>'
+            "</head>"
+        )
+        for variant in (page, page.encode()):
+            self.assertEqual(
+                [item.get("@type") for item in json_ld.items(variant)],
+                ["BreadcrumbList", None, "Product", ["Thing", "Recipe"]],
+            )
+            self.assertEqual(len(json_ld.blocks(variant)), 3)
+            recipe = json_ld.find(
+                variant, lambda item: json_ld.has_type(item, "Recipe")
+            )
+            self.assertEqual(recipe, {"@type": ["Thing", "Recipe"]})
+
+    def test_falls_back_to_full_parse(self) -> None:
+        # a ">" inside an attribute of the script tag defeats the scan
+        page = '<script data-x="a>b" type="application/ld+json">{"name": "x"}</script>'
+        with mock.patch.object(
+            json_ld, "_fallback_blocks", wraps=json_ld._fallback_blocks
+        ) as fallback:
+            self.assertEqual(json_ld.blocks(page), [{"name": "x"}])
+            self.assertEqual(json_ld.blocks("<p>no structured data</p>"), [])
+        self.assertEqual(fallback.call_count, 1)
+
+    def test_recorded_product_pages(self) -> None:
+        prices = {
+            page.name: scraping.price_from_product_page(page.read_bytes())
+            for page in PRODUCT_PAGES.glob("*.html")
+        }
+        self.assertEqual(
+            prices,
+            {
+                "olive_oil_graph_cdata.html": (12.49, None),
+                # the price is in the third block, after breadcrumbs and organization
+                "rice_breadcrumbs_first.html": (6.49, None),
+            },
+        )
+        self.assertEqual(
+            scraping.price_from_product_page("<html></html>"),
+            (None, "Unsupported Source (code 1)"),
+        )
+        self.assertEqual(
+            scraping.price_from_product_page(
+                '<script type="application/ld+json">{"@type": "Product"}</script>'
+            ),
+            (None, "Unsupported Source (code 2)"),
+        )
+
+
+class IngredientIndexTests(TestCase):
+    def brute_force_f1(
+        self, source: list[tuple[str, float]], ingredient: list[tuple[str, float]]
+    ) -> float:
+        tokens = {token for token, _ in ingredient}
+        overlap = sum(weight for token, weight in source if token in tokens)
+        if overlap == 0:
+            return 0.0
+        precision, recall = overlap / len(ingredient), overlap / len(source)
+        return 2 * precision * recall / (precision + recall)
+
+    def test_scores_match_linear_scan(self) -> None:
+        catalog = {
+            1: [("chicken", 1.0), ("breast", 1.0)],
+            2: [("chicken", 1.0), ("stock", 1.0), ("low", 0.8), ("sodium", 1.0)],
+            3: [("olive", 0.8), ("oil", 1.0)],
+            4: [("garlic", 1.0), ("garlic", 1.0), ("powder", 1.0)],
+        }
+        index = recipe_loader.IngredientIndex()
+        for ingredient_id, weights in catalog.items():
+            index.add(ingredient_id, weights)
+
+        source = [("boneless", 0.8), ("chicken", 1.0), ("breast", 1.0)]
+        scores = index.scores(source)
+        self.assertEqual(set(scores), {1, 2})  # only ingredients sharing a token
+        for ingredient_id, score in scores.items():
+            self.assertAlmostEqual(
+                score, self.brute_force_f1(source, catalog[ingredient_id])
+            )
+        self.assertAlmostEqual(
+            index.scores([("garlic", 1.0)])[4],
+            self.brute_force_f1([("garlic", 1.0)], catalog[4]),
+        )
+
+    def test_remove_and_restrict(self) -> None:
+        index = recipe_loader.IngredientIndex()
+        index.add(1, [("oil", 1.0)])
+        index.add(2, [("olive", 0.8), ("oil", 1.0)])
+        self.assertEqual(set(index.scores([("oil", 1.0)], restrict_to={2})), {2})
+
+        index.remove(2)
+        self.assertNotIn(2, index)
+        self.assertEqual(set(index.scores([("olive", 1.0), ("oil", 1.0)])), {1})
+        self.assertNotIn("olive", index.postings)
+
+
+def split_weights(text: str) -> list[tuple[str, float]]:
+    return [(token, 1.0) for token in text.lower().split()]
+
+
+class SharedMatcherTests(TestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(
+            override_settings(
+                INGREDIENT_INDEX_CACHE_PATH=f"{cache_dir.name}/index.pickle"
+            )
+        )
+        self.weigh_text = self.enterContext(
+            mock.patch.object(
+                recipe_loader.IngredientMatcher,
+                "weigh_text",
+                side_effect=split_weights,
+            )
+        )
+        self.addCleanup(setattr, recipe_loader.IngredientMatcher, "_shared", None)
+        recipe_loader.IngredientMatcher._shared = None
+        self.oil = models.Ingredient.objects.create(name="olive oil")
+        models.Ingredient.objects.create(name="chicken breast")
+
+    def test_built_once_and_kept_current_by_signals(self) -> None:
+        matcher = recipe_loader.IngredientMatcher.shared()
+        self.assertIs(recipe_loader.IngredientMatcher.shared(), matcher)
+        self.assertEqual(self.weigh_text.call_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Ingredient.objects.create(name="sesame oil")
+            self.oil.name = "extra virgin olive oil"
+            self.oil.save()
+            self.assertEqual(self.weigh_text.call_count, 2)  # not before commit
+        self.assertEqual(self.weigh_text.call_count, 4)  # only the two changes
+
+        best, _ = matcher.find_best_match("virgin olive oil")
+        self.assertEqual(best, self.oil)
+        best, _ = matcher.find_best_match("sesame oil")
+        self.assertEqual(best.name, "sesame oil")  # type: ignore[union-attr]
+
+        oil_id = self.oil.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oil.delete()
+        self.assertNotIn(oil_id, matcher.index)
+        self.assertIs(recipe_loader.IngredientMatcher.shared(), matcher)
+        # +2 for the two source lines above, re-syncing re-tagged nothing
+        self.assertEqual(self.weigh_text.call_count, 6)
+
+    def test_rolled_back_writes_leave_the_index_alone(self) -> None:
+        matcher = recipe_loader.IngredientMatcher.shared()
+        oil_id = self.oil.id
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                models.Ingredient.objects.create(name="sesame oil")
+                self.oil.delete()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(matcher.index), 2)
+        self.assertIn(oil_id, matcher.index)
+        self.assertEqual(self.weigh_text.call_count, 2)
+
+    def test_snapshot_is_reused_across_processes(self) -> None:
+        recipe_loader.IngredientMatcher.shared()
+        recipe_loader.IngredientMatcher._shared = None  # simulate a fresh process
+        self.weigh_text.reset_mock()
+
+        matcher = recipe_loader.IngredientMatcher.shared()
+        self.assertEqual(len(matcher.index), 2)
+        self.weigh_text.assert_not_called()
+
+
+def fake_stage_one(url: str) -> recipe_loader.StageOne.RecipeLoadingStageOneResult:
+    if "broken" in url:
+        return recipe_loader.StageOne.RecipeLoadingStageOneResult(
+            error="No recipe schema found on the page."
+        )
+    if "down" in url:
+        raise requests.ConnectionError("connection refused")
+    return recipe_loader.StageOne.RecipeLoadingStageOneResult(
+        error=None,
+        recipe_data=recipe_loader.StageOne.RecipeLoaderInitialFetch(
+            name=f"Recipe from {url}",
+            ingredients=["2 tbsp olive oil", "1 kg chicken breast", "a pinch of love"],
+            steps=["Cook it."],
+            prep_time_minutes=5,
+            cook_time_minutes=None,
+            description=None,
+        ),
+    )
+
+
+class BatchRecipeImportTests(TestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(
+            override_settings(
+                INGREDIENT_INDEX_CACHE_PATH=f"{cache_dir.name}/index.pickle"
+            )
+        )
+        matcher = recipe_loader.IngredientMatcher
+        self.enterContext(
+            mock.patch.object(matcher, "weigh_text", side_effect=split_weights)
+        )
+        self.enterContext(mock.patch.object(matcher, "tokenize", side_effect=str.split))
+        self.enterContext(
+            mock.patch.object(
+                recipe_loader.StageOne,
+                "load_recipe_stage_one",
+                side_effect=fake_stage_one,
+            )
+        )
+        self.addCleanup(setattr, matcher, "_shared", None)
+        matcher._shared = None
+        self.oil = models.Ingredient.objects.create(name="olive oil")
+        self.chicken = models.Ingredient.objects.create(name="chicken")
+
+    def test_matching_queries_do_not_grow_with_batch(self) -> None:
+        recipe_loader.IngredientMatcher.shared()
+        lines = ["2 tbsp olive oil", "1 kg chicken breast", "salt"]
+        with self.assertNumQueries(2):  # names and aliases, then the winners
+            matches = recipe_loader.StageTwo.match_ingredients(
+                lines * 50, recipe_loader.IngredientMatcher.shared()
+            )
+        self.assertEqual(len(matches), 150)
+        self.assertEqual(matches[0].ingredient, self.oil)
+        self.assertEqual(matches[0].confidence, 1.0)
+        self.assertEqual(matches[1].ingredient, self.chicken)
+        self.assertIsNone(matches[2].ingredient)
+
+    def test_aliases_resolve_in_the_name_lookup(self) -> None:
+        IngredientAlias.objects.create(alias="evoo", ingredient=self.oil)
+        # a name beats an alias
+        IngredientAlias.objects.create(alias="chicken", ingredient=self.oil)
+        matcher = recipe_loader.IngredientMatcher.shared()
+        with self.assertNumQueries(2):
+            matches = recipe_loader.StageTwo.match_ingredients(
+                ["1 tbsp EVOO", "  Chicken ", "200 g chicken"], matcher
+            )
+        self.assertEqual(
+            [(match.ingredient, match.confidence) for match in matches],
+            [(self.oil, 1.0), (self.chicken, 1.0), (self.chicken, 1.0)],
+        )
+
+    def test_names_match_regardless_of_case_and_spacing(self) -> None:
+        creme = models.Ingredient.objects.create(name="CRÈME Fraîche")
+        jalapeno = models.Ingredient.objects.create(name="\tJalapeño\u00a0peppers\n")
+        IngredientAlias.objects.create(
+            alias=normalize_name("Piment  JALAPEÑO"), ingredient=jalapeno
+        )
+        self.assertEqual(jalapeno.normalized_name, "jalapeño peppers")
+        matches = recipe_loader.StageTwo.match_ingredients(
+            ["2 tbsp crème fraîche", "3 JALAPEÑO PEPPERS", "1 piment jalapeño"],
+            recipe_loader.IngredientMatcher.shared(),
+        )
+        self.assertEqual(
+            [(match.ingredient, match.confidence) for match in matches],
+            [(creme, 1.0), (jalapeno, 1.0), (jalapeno, 1.0)],
+        )
+
+    def test_confirming_records_aliases_of_certain_matches(self) -> None:
+        recipe = models.ConfirmableRecipe.objects.create(name="draft")
+        lines = [
+            models.ConfirmableRecipeIngredient.objects.create(
+                confirmable_recipe=recipe,
+                source_text=source_text,
+                best_guess_ingredient=ingredient,
+                confidence=confidence,
+                quantity=1,
+            )
+            for source_text, ingredient, confidence in [
+                ("2 tbsp Extra Virgin Olive Oil", self.oil, 0.4),  # a guess, accepted
+                ("1 kg chicken", self.chicken, 1.0),  # already its name
+                ("1 cup stock", self.oil, 0.3),  # a guess, corrected below
+                ("1 tsp smoked paprika", self.chicken, 1.0),  # matched by an alias
+            ]
+        ]
+        path = "/api/confirmable-recipe-ingredients/{}/"
+        for line, ingredient in [(lines[0], self.oil), (lines[2], self.chicken)]:
+            response = self.client.patch(
+                path.format(line.pk),
+                # the review page sends every line back, confidence included
+                {"best_guess_ingredient": ingredient.pk, "confidence": 0.1},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                line["confidence"]
+                for line in self.client.get(
+                    "/api/confirmable-recipe-ingredients/"
+                ).json()["results"]
+            ],
+            [0.4, 1.0, 1.0, 1.0],
+        )
+
+        result = recipe_loader.save_confirmable_recipe_as_actual_recipe(recipe)
+        self.assertIsNone(result.error)
+        self.assertEqual(
+            dict(IngredientAlias.objects.values_list("alias", "ingredient__name")),
+            {"stock": "chicken", "smoked paprika": "chicken"},
+        )
+
+        matcher = recipe_loader.IngredientMatcher.shared()
+        match = recipe_loader.StageTwo.match_ingredient("2 cups stock", matcher)
+        self.assertEqual((match.ingredient, match.confidence), (self.chicken, 1.0))
+        match = recipe_loader.StageTwo.match_ingredient(
+            "1 tsp extra virgin olive oil", matcher
+        )
+        self.assertLess(match.confidence, 1.0)
+
+    def test_load_recipes_reports_status_per_url(self) -> None:
+        urls = [
+            "https://a.example.com/one",
+            "https://a.example.com/broken",
+            "https://b.example.com/two",
+            "https://c.example.com/down",
+        ]
+        response = self.client.post(
+            "/api/confirmable-recipes/load-recipes/",
+            {"urls": urls + urls[:1]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        self.assertEqual(
+            [item["url"] for item in response.json()["items"]], urls
+        )  # duplicates dropped
+
+        self.assertEqual(worker.run_import_jobs_once(), 1)
+
+        job = self.client.get(f"/api/recipe-import-jobs/{job_id}/").json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(
+            [item["status"] for item in job["items"]],
+            ["done", "failed", "done", "failed"],
+        )
+        self.assertIn("connection refused", job["items"][3]["error"])
+        recipe = models.ConfirmableRecipe.objects.get(
+            pk=job["items"][2]["confirmable_recipe"]
+        )
+        self.assertEqual(recipe.source_url, urls[2])
+        self.assertEqual(
+            [i.best_guess_ingredient for i in recipe.ingredients_list.order_by("id")],
+            [self.oil, self.chicken, None],
+        )
+        self.assertEqual(recipe.steps_list.count(), 1)
+
+    def test_import_chunk_that_raises_fails_its_urls_not_the_worker(self) -> None:
+        urls = [f"https://a.example.com/{i}" for i in range(3)]
+        job = worker.create_import_job(urls)
+        with (
+            mock.patch.object(worker, "IMPORT_CHUNK_SIZE", 2),
+            mock.patch.object(
+                recipe_loader,
+                "load_recipes_from_urls",
+                side_effect=[RuntimeError("matcher exploded"), mock.DEFAULT],
+                wraps=recipe_loader.load_recipes_from_urls,
+            ),
+            self.assertLogs("scraper.worker", "ERROR"),
+        ):
+            self.assertEqual(worker.run_import_jobs_once(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.ScrapeJobStatus.DONE)
+        items = list(job.items.all())
+        self.assertEqual([item.status for item in items], ["failed", "failed", "done"])
+        self.assertEqual(items[0].error, "Import failed: matcher exploded")
+        self.assertEqual(worker.run_import_jobs_once(), 0)  # nothing left to reclaim
+
+    def test_load_recipe_endpoint(self) -> None:
+        page = (RECIPE_PAGES / "butter_chicken.html").read_bytes()
+        path = "/api/confirmable-recipes/load-recipe/"
+        with mock.patch.object(
+            recipe_loader.StageOne,
+            "load_recipe_stage_one",
+            side_effect=lambda url: recipe_loader.StageOne.parse_recipe_page(page),
+        ):
+            response = self.client.post(
+                path,
+                {"url": "https://a.example.com/curry"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Butter Chicken with Rice")
+        self.assertEqual(models.ConfirmableRecipe.objects.count(), 1)
+
+        response = self.client.post(path, {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_confirming_costs_constant_round_trips(self) -> None:
+        def confirm(n_ingredients: int) -> int:
+            recipe = models.ConfirmableRecipe.objects.create(name="draft")
+            for i in range(n_ingredients):
+                models.ConfirmableRecipeIngredient.objects.create(
+                    confirmable_recipe=recipe,
+                    source_text=f"line {i}",
+                    best_guess_ingredient=self.oil,
+                    confidence=0.5,
+                    quantity=1,
+                )
+                models.ConfirmableRecipeStep.objects.create(
+                    confirmable_recipe=recipe, step_number=i + 1, description="stir"
+                )
+            with CaptureQueriesContext(connection) as queries:
+                result = recipe_loader.save_confirmable_recipe_as_actual_recipe(recipe)
+            self.assertIsNone(result.error)
+            assert result.recipe is not None
+            self.assertEqual(result.recipe.ingredients_list.count(), n_ingredients)
+            self.assertFalse(
+                models.ConfirmableRecipe.objects.filter(pk=recipe.pk).exists()
+            )
+            return len(queries)
+
+        self.assertEqual(confirm(3), confirm(30))
+
+    def test_rejects_invalid_urls(self) -> None:
+        response = self.client.post(
+            "/api/confirmable-recipes/load-recipes/",
+            {"urls": ["not a url"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.RecipeImportJob.objects.exists())
+
+    def test_rejects_urls_too_long_to_keep(self) -> None:
+        url = "https://a.example.com/" + "x" * 200
+        response = self.client.post(
+            "/api/confirmable-recipes/load-recipes/",
+            {"urls": ["https://a.example.com/ok", url]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", response.json()["error"])
+        self.assertFalse(models.RecipeImportJob.objects.exists())
+
+        response = self.client.post(
+            "/api/confirmable-recipes/load-recipe/",
+            {"url": url},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.ConfirmableRecipe.objects.exists())
+
+
+STARTUP_PROBE = """
+import json, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+start = time.perf_counter()
+import django
+django.setup()
+import backend.urls  # imports every viewset, including scraper.views -> recipe_loader
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "nltk_loaded": "nltk" in sys.modules,
+}))
+"""
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_backend_startup_does_not_load_nlp_stack(self) -> None:
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertFalse(
+            probe["nltk_loaded"],
+            f"nltk imported during startup ({probe['seconds']:.2f}s)",
+        )
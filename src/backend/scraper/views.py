@@ -3,44 +3,86 @@ from rest_framework.decorators import action
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework import serializers as drf_serializers
+from django.db.models import Count
 from django_filters.rest_framework import DjangoFilterBackend
 from . import models, serializers
-from . import recipe_loader
+from . import recipe_loader, worker
 from drf_spectacular.utils import extend_schema, inline_serializer  # type: ignore
+from api import http_cache
+from api.http_cache import ConditionalGetMixin
+from api.instrumentation import TimedSerializerMixin, timed_serializer
+from api.query_planning import QueryPlanMixin
+from api.sparse_fields import SparseFieldsMixin
 
+# upper bound on the urls accepted by one load-recipes request
+MAX_IMPORT_URLS = 1000
+# imported urls end up in ConfirmableRecipe.source_url
+MAX_IMPORT_URL_LENGTH = models.ConfirmableRecipe._meta.get_field(
+    "source_url"
+).max_length
 
-class ScraperViewSet(viewsets.ModelViewSet[models.Scraper]):
-    queryset = (
-        models.Scraper.objects.select_related("cached_source")
-        .prefetch_related("sources")
-        .all()
-    )
+
+class ScraperViewSet(
+    ConditionalGetMixin,
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ModelViewSet[models.Scraper],
+):
+    queryset = models.Scraper.objects.all()
     serializer_class = serializers.ScraperSerializer
+    cache_resources = (http_cache.SCRAPERS,)
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["ingredient"]
 
     @action(detail=True, methods=["post"])
     def refresh(self, request: Request, pk: int | None = None) -> Response:
-        """Scrape all sources, update cached_price/cached_source, return updated scraper."""
+        """Scrape all sources concurrently, update cached_price/cached_source, return updated scraper."""
         scraper: models.Scraper = self.get_object()
-        scraper.update()
-        scraper.save()
-        scraper.refresh_from_db()
+        worker.refresh_sources(scraper.sources.all())
+        scraper = self.get_object()
         serializer = self.get_serializer(scraper)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        summary="Queue a refresh of every stale Source for the scrape worker",
+        request=None,
+        responses={
+            202: inline_serializer(
+                name="RefreshAllResponse",
+                fields={
+                    "queued": drf_serializers.IntegerField(
+                        help_text="Stale sources with a refresh queued, including ones that already had one"
+                    ),
+                },
+            ),
+        },
+    )
+    @action(detail=False, methods=["post"], url_path="refresh-all")
+    def refresh_all(self, request: Request) -> Response:
+        """Queue a ScrapeJob for every stale Source. Poll /api/scrape-jobs/progress/ until none are left."""
+        return Response(
+            {"queued": worker.enqueue_stale_sources()},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
-class SourceViewSet(viewsets.ModelViewSet[models.Source]):
+class SourceViewSet(
+    SparseFieldsMixin, TimedSerializerMixin, viewsets.ModelViewSet[models.Source]
+):
     queryset = models.Source.objects.all()
     serializer_class = serializers.SourceSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["scraper"]
 
 
-class ConfirmableRecipeViewSet(viewsets.ModelViewSet[models.ConfirmableRecipe]):
-    queryset = models.ConfirmableRecipe.objects.prefetch_related(
-        "ingredients_list", "steps_list"
-    ).all()
+class ConfirmableRecipeViewSet(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ModelViewSet[models.ConfirmableRecipe],
+):
+    queryset = models.ConfirmableRecipe.objects.all()
     serializer_class = serializers.ConfirmableRecipeSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["source_url"]
@@ -118,6 +160,11 @@ class ConfirmableRecipeViewSet(viewsets.ModelViewSet[models.ConfirmableRecipe]):
             return Response(
                 {"error": "URL is required"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if len(url) > MAX_IMPORT_URL_LENGTH:
+            return Response(
+                {"error": f"URL must be at most {MAX_IMPORT_URL_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         result = recipe_loader.load_recipe_from_url(url)
         if result.error:
@@ -126,22 +173,119 @@ class ConfirmableRecipeViewSet(viewsets.ModelViewSet[models.ConfirmableRecipe]):
             serializer = self.get_serializer(result.confirmable_recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        summary="Queue many recipe URLs for import as ConfirmableRecipes",
+        request=inline_serializer(
+            name="LoadRecipesRequest",
+            fields={
+                "urls": drf_serializers.ListField(
+                    child=drf_serializers.URLField(max_length=MAX_IMPORT_URL_LENGTH),
+                    allow_empty=False,
+                    max_length=MAX_IMPORT_URLS,
+                    help_text="The URLs of the recipes to load",
+                ),
+            },
+        ),
+        responses={
+            202: serializers.RecipeImportJobSerializer,
+            400: inline_serializer(
+                name="LoadRecipesErrorResponse",
+                fields={
+                    "error": drf_serializers.JSONField(
+                        help_text="What was wrong with the submitted URLs"
+                    ),
+                },
+            ),
+        },
+    )
+    @action(detail=False, methods=["post"], url_path="load-recipes")
+    def load_recipes(self, request: Request) -> Response:
+        """Queue a RecipeImportJob for the URLs. Poll /api/recipe-import-jobs/{id}/ for per-URL status."""
+        urls = drf_serializers.ListField(
+            child=drf_serializers.URLField(max_length=MAX_IMPORT_URL_LENGTH),
+            allow_empty=False,
+            max_length=MAX_IMPORT_URLS,
+        )
+        try:
+            validated_urls = urls.run_validation(request.data.get("urls"))
+        except drf_serializers.ValidationError as exc:
+            return Response({"error": exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = worker.create_import_job(validated_urls)
+        job = models.RecipeImportJob.objects.prefetch_related("items").get(pk=job.pk)
+        return Response(
+            timed_serializer(serializers.RecipeImportJobSerializer(job)).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class ScrapeJobViewSet(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ReadOnlyModelViewSet[models.ScrapeJob],
+):
+    queryset = models.ScrapeJob.objects.all()
+    serializer_class = serializers.ScrapeJobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["status", "source"]
+
+    @extend_schema(
+        summary="How many source refreshes are queued or running",
+        responses={
+            200: inline_serializer(
+                name="ScrapeJobProgress",
+                fields={
+                    job_status.value: drf_serializers.IntegerField()
+                    for job_status in models.ScrapeJob.ACTIVE_STATUSES
+                },
+            ),
+        },
+    )
+    @action(detail=False, methods=["get"])
+    def progress(self, request: Request) -> Response:
+        """Both counts reach 0 once the worker has caught up, e.g. after refresh-all."""
+        counts = dict(
+            models.ScrapeJob.objects.filter(status__in=models.ScrapeJob.ACTIVE_STATUSES)
+            .order_by()
+            .values_list("status")
+            .annotate(Count("id"))
+        )
+        return Response(
+            {
+                job_status.value: counts.get(job_status, 0)
+                for job_status in models.ScrapeJob.ACTIVE_STATUSES
+            }
+        )
+
+
+class RecipeImportJobViewSet(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    QueryPlanMixin,
+    viewsets.ReadOnlyModelViewSet[models.RecipeImportJob],
+):
+    queryset = models.RecipeImportJob.objects.all()
+    serializer_class = serializers.RecipeImportJobSerializer
+
 
 class ConfirmableRecipeIngredientViewSet(
-    viewsets.ModelViewSet[models.ConfirmableRecipeIngredient]
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    viewsets.ModelViewSet[models.ConfirmableRecipeIngredient],
 ):
-    queryset = models.ConfirmableRecipeIngredient.objects.select_related(
-        "best_guess_ingredient", "confirmable_recipe"
-    ).all()
+    queryset = models.ConfirmableRecipeIngredient.objects.all()
     serializer_class = serializers.ConfirmableRecipeIngredientSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["confirmable_recipe"]
 
 
-class ConfirmableRecipeStepViewSet(viewsets.ModelViewSet[models.ConfirmableRecipeStep]):
-    queryset = models.ConfirmableRecipeStep.objects.select_related(
-        "confirmable_recipe"
-    ).all()
+class ConfirmableRecipeStepViewSet(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    viewsets.ModelViewSet[models.ConfirmableRecipeStep],
+):
+    queryset = models.ConfirmableRecipeStep.objects.all()
     serializer_class = serializers.ConfirmableRecipeStepSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["confirmable_recipe"]
@@ -0,0 +1,321 @@
+"""
+Background price refresh. Request handlers only read cached prices and enqueue
+ScrapeJobs, this module does the actual scraping out of band
+(see `manage.py run_scrape_worker`).
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Q
+
+from api import http_cache, rollups
+
+from . import fetching, models, recipe_loader, scraping
+
+logger = logging.getLogger(__name__)
+
+# a running job older than this is assumed to belong to a dead worker
+STUCK_JOB_TIMEOUT = timedelta(minutes=10)
+# recipe urls imported per fetch/match/insert round, bounds memory for very large jobs
+IMPORT_CHUNK_SIZE = 50
+
+
+@dataclass
+class RefreshSummary:
+    total: int
+    refreshed: int
+    failed: int
+    sources: list[models.Source]
+    # not scraped because their host's circuit is open
+    skipped: int = 0
+
+
+def refresh_sources(
+    sources: Iterable[models.Source],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> RefreshSummary:
+    """
+    Scrape `sources` concurrently (bounded overall and per host), write the results
+    back with one bulk_update, then recompute the cheapest source of every affected Scraper.
+    Sources on hosts with an open circuit are not scraped.
+    """
+    ordered = list(sources)
+    if not ordered:
+        return RefreshSummary(total=0, refreshed=0, failed=0, sources=[])
+    circuits = models.HostCircuit.tripped(src.host for src in ordered)
+    results = _scrape_all(ordered, _admitted(ordered, circuits), on_progress)
+    return store_scrape_results(ordered, results, circuits)
+
+
+def _admitted(
+    sources: list[models.Source], circuits: dict[str, models.HostCircuit]
+) -> list[bool]:
+    """Which sources to scrape: none on an open circuit, one trial per circuit due for one."""
+    now = datetime.now(timezone.utc)
+    trials: set[str] = set()
+    admitted = []
+    for src in sources:
+        circuit = circuits.get(src.host)
+        if circuit is None:
+            admitted.append(True)
+        elif circuit.is_open(now) or src.host in trials:
+            admitted.append(False)
+        else:
+            trials.add(src.host)
+            admitted.append(True)
+    return admitted
+
+
+def _scrape_all(
+    sources: list[models.Source],
+    admitted: list[bool],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> list[Optional[scraping.ScrapingReturn]]:
+    """Scrape results in the order of `sources`, None for the ones not admitted."""
+    to_scrape = [src for src, admit in zip(sources, admitted) if admit]
+    scraped = iter(
+        fetching.map_concurrently(
+            lambda src: src.scrape(),
+            to_scrape,
+            url_of=lambda src: src.url,
+            on_progress=on_progress,
+        )
+    )
+    return [next(scraped) if admit else None for admit in admitted]
+
+
+def store_scrape_results(
+    sources: list[models.Source],
+    results: list[Optional[scraping.ScrapingReturn]],
+    circuits: Optional[dict[str, models.HostCircuit]] = None,
+) -> RefreshSummary:
+    """
+    Save the scrape results of `sources` (in the same order) and update their
+    scrapers and host circuits. A None result is a source that wasn't scraped, one
+    on an open circuit waits until it closes.
+    """
+    now = datetime.now(timezone.utc)
+    before = [_rendered_state(src) for src in sources]
+    reached: set[str] = set()
+    failures: dict[str, int] = defaultdict(int)
+    for src, result in zip(sources, results):
+        if result is None:
+            circuit = (circuits or {}).get(src.host)
+            if circuit is not None and circuit.is_open(now):
+                src.retry_after = circuit.open_until
+            continue
+        src.apply_scrape_result(result, now)
+        if scraping.is_unreachable(result[1]):
+            failures[src.host] += 1
+        else:
+            reached.add(src.host)
+    models.Source.objects.bulk_update(
+        sources,
+        ["cached_price", "cached_error", "failure_count", "retry_after", "updated_at"],
+    )
+    models.HostCircuit.record(reached, failures, now)
+    # anything still queued for these sources is now redundant
+    models.ScrapeJob.objects.filter(
+        source__in=sources, status=models.ScrapeJobStatus.PENDING
+    ).update(status=models.ScrapeJobStatus.DONE, finished_at=now)
+    update_scrapers(
+        {src.scraper_id for src in sources},  # type: ignore[attr-defined]
+        now,
+        sources_changed=before != [_rendered_state(src) for src in sources],
+    )
+
+    skipped = sum(1 for result in results if result is None)
+    failed = sum(1 for result in results if result is not None and result[1])
+    return RefreshSummary(
+        total=len(sources),
+        refreshed=len(sources) - failed - skipped,
+        failed=failed,
+        sources=sources,
+        skipped=skipped,
+    )
+
+
+def _rendered_state(src: models.Source) -> tuple[Any, ...]:
+    # what a refresh can change in a source as the API shows it, besides timestamps
+    return (src.cached_price, src.cached_error, src.failure_count, src.retry_after)
+
+
+def update_scrapers(
+    scraper_ids: Iterable[int], now: datetime, sources_changed: bool = True
+) -> None:
+    """
+    Recompute cached_source/cached_price for the given scrapers from their cached
+    source prices. Cached scraper responses are only invalidated if that, or
+    `sources_changed`, changed what they show; timestamps alone catch up within
+    http_cache.CLOCK_BUCKETS.
+    """
+    scrapers = list(
+        models.Scraper.objects.filter(pk__in=list(scraper_ids)).prefetch_related(
+            "sources"
+        )
+    )
+    changed = []
+    for scraper in scrapers:
+        previous = (scraper.cached_source_id, scraper.cached_price)  # type: ignore[attr-defined]
+        scraper.update()
+        scraper.updated_at = now
+        if (scraper.cached_source_id, scraper.cached_price) != previous:  # type: ignore[attr-defined]
+            changed.append(scraper)
+    models.Scraper.objects.bulk_update(
+        scrapers, ["cached_source", "cached_price", "updated_at"]
+    )
+    # bulk_update sends no signals, so invalidate cached scrapers and refresh the cost rollups here
+    if changed or sources_changed:
+        http_cache.bump(http_cache.SCRAPERS)
+    rollups.schedule_for_ingredients(
+        scraper.ingredient_id  # type: ignore[attr-defined]
+        for scraper in changed
+        if scraper.ingredient_id is not None  # type: ignore[attr-defined]
+    )
+
+
+def enqueue_stale_sources() -> int:
+    """Queue a refresh for every stale source that doesn't already have one. Returns the number of stale sources."""
+    stale = list(models.Source.objects.filter(models.Source.stale_filter()))
+    models.ScrapeJob.enqueue(stale)
+    return len(stale)
+
+
+def claim_jobs(batch_size: int) -> list[models.ScrapeJob]:
+    """Atomically mark up to `batch_size` pending (or abandoned) jobs as running and return them."""
+    now = datetime.now(timezone.utc)
+    with transaction.atomic():
+        jobs = list(
+            models.ScrapeJob.objects.select_for_update(skip_locked=True)
+            .select_related("source")
+            .filter(
+                Q(status=models.ScrapeJobStatus.PENDING)
+                | Q(
+                    status=models.ScrapeJobStatus.RUNNING,
+                    started_at__lt=now - STUCK_JOB_TIMEOUT,
+                )
+            )
+            .order_by("created_at")[:batch_size]
+        )
+        models.ScrapeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=models.ScrapeJobStatus.RUNNING, started_at=now
+        )
+    return jobs
+
+
+def run_once(batch_size: int = 10) -> int:
+    """Process one batch of jobs concurrently. Returns how many jobs were run."""
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    refresh_sources(job.source for job in jobs)
+    now = datetime.now(timezone.utc)
+    for job in jobs:
+        job.error = job.source.cached_error
+        job.status = (
+            models.ScrapeJobStatus.FAILED if job.error else models.ScrapeJobStatus.DONE
+        )
+        job.finished_at = now
+    models.ScrapeJob.objects.bulk_update(jobs, ["status", "error", "finished_at"])
+    return len(jobs)
+
+
+def create_import_job(urls: Iterable[str]) -> models.RecipeImportJob:
+    """Queue a recipe import for `urls` (duplicates dropped, order kept)."""
+    with transaction.atomic():
+        job = models.RecipeImportJob.objects.create()
+        models.RecipeImportItem.objects.bulk_create(
+            [models.RecipeImportItem(job=job, url=url) for url in dict.fromkeys(urls)]
+        )
+    return job
+
+
+def claim_import_job() -> Optional[models.RecipeImportJob]:
+    """Atomically mark the oldest pending (or abandoned) import job as running and return it."""
+    now = datetime.now(timezone.utc)
+    with transaction.atomic():
+        job = (
+            models.RecipeImportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=models.ScrapeJobStatus.PENDING)
+                | Q(
+                    status=models.ScrapeJobStatus.RUNNING,
+                    started_at__lt=now - STUCK_JOB_TIMEOUT,
+                )
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = models.ScrapeJobStatus.RUNNING
+        job.started_at = now
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def run_import_job(job: models.RecipeImportJob) -> None:
+    """
+    Import every still-pending url of `job`, IMPORT_CHUNK_SIZE at a time. A chunk
+    that raises fails its own urls and the job moves on; the job only fails when
+    it can't record that (so a reclaimed job doesn't crash the worker again).
+    """
+    try:
+        while items := list(
+            job.items.filter(status=models.ScrapeJobStatus.PENDING)[:IMPORT_CHUNK_SIZE]
+        ):
+            try:
+                _import_chunk(items)
+            except Exception as e:
+                logger.exception(
+                    "Import job %d: chunk of %d url(s) failed", job.pk, len(items)
+                )
+                models.RecipeImportItem.objects.filter(
+                    pk__in=[item.pk for item in items]
+                ).update(
+                    status=models.ScrapeJobStatus.FAILED,
+                    error=f"Import failed: {e}"[:200],
+                )
+            else:
+                logger.info("Import job %d: imported %d url(s)", job.pk, len(items))
+            # keeps a long job from looking abandoned to other workers
+            models.RecipeImportJob.objects.filter(pk=job.pk).update(
+                started_at=datetime.now(timezone.utc)
+            )
+    except Exception:
+        logger.exception("Import job %d failed", job.pk)
+        job.status = models.ScrapeJobStatus.FAILED
+    else:
+        job.status = models.ScrapeJobStatus.DONE
+    job.finished_at = datetime.now(timezone.utc)
+    job.save(update_fields=["status", "finished_at"])
+
+
+def _import_chunk(items: list[models.RecipeImportItem]) -> None:
+    results = recipe_loader.load_recipes_from_urls([item.url for item in items])
+    for item, result in zip(items, results):
+        item.confirmable_recipe = result.confirmable_recipe
+        item.error = result.error[:200] if result.error else None
+        item.status = (
+            models.ScrapeJobStatus.FAILED
+            if result.error
+            else models.ScrapeJobStatus.DONE
+        )
+    models.RecipeImportItem.objects.bulk_update(
+        items, ["status", "error", "confirmable_recipe"]
+    )
+
+
+def run_import_jobs_once() -> int:
+    """Run queued import jobs until none are left. Returns how many were run."""
+    ran = 0
+    while job := claim_import_job():
+        run_import_job(job)
+        ran += 1
+    return ran